@@ -0,0 +1,105 @@
+"""Chat message throughput through the Unix socket backplane by worker count.
+
+Each worker is a separate process with its own ``UnixSocketBackplane``; the
+first one to win the election also hosts the broker. Every worker publishes
+``MESSAGES_PER_WORKER`` chat messages as fast as it can, from
+``SENDERS_PER_WORKER`` concurrent senders (a publish returns once the broker
+has sequenced the message, as it does for a client's message), and waits
+until it has received every message from every worker. Throughput is the number of
+messages published per second across all workers; deliveries counts each
+message once per receiving worker.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+from benchutil import emit
+
+from portfolio_backend.backplane import EVENT_MESSAGE, UnixSocketBackplane
+
+WORKER_COUNTS = (1, 2, 4, 8)
+MESSAGES_PER_WORKER = 5000
+SENDERS_PER_WORKER = 50
+
+
+async def run_worker(path: str, workers: int, barrier) -> float:
+    backplane = UnixSocketBackplane(path, reconnect_delay=0.01)
+    expected = workers * MESSAGES_PER_WORKER
+    received = 0
+    done = asyncio.Event()
+
+    async def handle(event: dict) -> None:
+        nonlocal received
+        if event.get("kind") == EVENT_MESSAGE:
+            received += len(event["messages"])
+            if received >= expected:
+                done.set()
+
+    await backplane.start(handle)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, barrier.wait)
+
+    async def send(sender: int) -> None:
+        for i in range(sender, MESSAGES_PER_WORKER, SENDERS_PER_WORKER):
+            await backplane.publish({
+                "kind": EVENT_MESSAGE,
+                "messages": [{
+                    "id": str(uuid.uuid4()),
+                    "username": f"user{os.getpid()}",
+                    "content": f"benchmark message {i}",
+                    "timestamp": time.time(),
+                    "seq": 0,
+                }],
+            })
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(sender) for sender in range(SENDERS_PER_WORKER)))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    # Keep the broker up until every worker has finished
+    await loop.run_in_executor(None, barrier.wait)
+    await backplane.close()
+    return elapsed
+
+
+def worker_main(path: str, workers: int, barrier, results) -> None:
+    results.put(asyncio.run(run_worker(path, workers, barrier)))
+
+
+def run(workers: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "backplane.sock")
+        barrier = ctx.Barrier(workers)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=worker_main, args=(path, workers, barrier, results))
+            for _ in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        elapsed = max(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+
+    published = workers * MESSAGES_PER_WORKER
+    return {
+        "workers": workers,
+        "messages": published,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(published / elapsed),
+        "deliveries_per_sec": round(published * workers / elapsed),
+    }
+
+
+def main() -> None:
+    emit("backplane", [run(workers) for workers in WORKER_COUNTS])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Per-message cost of bot keyword matching as the rule set grows.
+
+Compares the compiled ``KeywordMatcher`` with the original approach of one
+substring scan per keyword.
+"""
+
+import random
+import string
+
+from benchutil import emit, measure
+
+from portfolio_backend.bot import DEFAULT_RULES, BotRule, BotRuleEngine
+
+RULE_COUNTS = (10, 100, 1000, 5000)
+MESSAGES = (
+    "just dropping by to say the portfolio looks great",
+    "can someone explain how the carousel animation works on mobile?",
+    "websocket",
+)
+
+
+def naive_respond(rules: tuple[BotRule, ...], message: str) -> object:
+    message_lower = message.lower()
+    for rule in rules:
+        if rule.keyword in message_lower:
+            return rule.response
+    return None
+
+
+def make_rules(count: int) -> tuple[BotRule, ...]:
+    rng = random.Random(count)
+    extra = [
+        BotRule("".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))), "reply")
+        for _ in range(max(0, count - len(DEFAULT_RULES)))
+    ]
+    # Generated rules go first so the built-in keywords sit at the back
+    return tuple(extra) + DEFAULT_RULES[:count]
+
+
+def main() -> None:
+    results = []
+    for count in RULE_COUNTS:
+        rules = make_rules(count)
+        engine = BotRuleEngine(rules=rules)
+        for message in MESSAGES:
+            assert engine.respond(message) == naive_respond(rules, message)
+            results.append({
+                "rules": count,
+                "message_length": len(message),
+                "compiled": measure(lambda: engine.respond(message)),
+                "naive": measure(lambda: naive_respond(rules, message), number=200),
+            })
+    emit("bot_rules", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Wire codec cost: bytes per frame and encode/decode time for stdlib json,
+orjson and MessagePack, plus ``ChatMessage.to_dict`` versus ``asdict``.
+
+Codecs whose package is not installed are reported as unavailable.
+"""
+
+import json
+from dataclasses import asdict
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import ChatMessage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+HISTORY_SIZE = 50
+
+
+def make_message(seq: int, content: str) -> ChatMessage:
+    return ChatMessage(
+        id="0b6f3c1e-8c1d-4c5e-9f61-3a8f0f9b2d47",
+        username="john_doe",
+        content=content,
+        timestamp=1700000000.123 + seq,
+        seq=seq,
+    )
+
+
+PAYLOADS = {
+    "message": {
+        "type": "message",
+        "data": make_message(1, "hello there, how is it going?").to_dict(),
+    },
+    "user_count": {"type": "user_count", "data": {"count": 480, "joined": 12, "left": 3}},
+    "history": {
+        "type": "history",
+        "data": [
+            make_message(seq, f"message number {seq} in the backlog").to_dict()
+            for seq in range(1, HISTORY_SIZE + 1)
+        ],
+    },
+}
+
+
+def stdlib_codec():
+    return (
+        lambda payload: json.dumps(payload, separators=(",", ":"), ensure_ascii=False),
+        json.loads,
+    )
+
+
+def codecs() -> dict:
+    available = {"json": stdlib_codec()}
+    if orjson is not None:
+        available["orjson"] = (orjson.dumps, orjson.loads)
+    if msgpack is not None:
+        available["msgpack"] = (
+            lambda payload: msgpack.packb(payload, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    return available
+
+
+def main() -> None:
+    available = codecs()
+    results = {}
+    for name, payload in PAYLOADS.items():
+        number = 200 if name == "history" else 5000
+        results[name] = {}
+        for codec, (encode, decode) in available.items():
+            frame = encode(payload)
+            size = len(frame.encode("utf-8") if isinstance(frame, str) else frame)
+            results[name][codec] = {
+                "bytes": size,
+                "encode": measure(lambda: encode(payload), number=number),
+                "decode": measure(lambda: decode(frame), number=number),
+            }
+
+    message = make_message(1, "hello there, how is it going?")
+    results["to_dict"] = {
+        "asdict": measure(lambda: asdict(message), number=20000),
+        "to_dict": measure(message.to_dict, number=20000),
+    }
+    results["unavailable"] = [
+        name for name in ("orjson", "msgpack") if name not in available
+    ]
+    emit("codec", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compression tradeoffs for chat frames: bytes saved versus CPU per level,
+compressing the history frame once for every joiner versus once per
+connection, and the compressor memory a per-connection permessage-deflate
+context would hold.
+"""
+
+import zlib
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import ChatMessage
+from portfolio_backend.codec import compress_frame, encode_message
+
+HISTORY_SIZE = 50
+JOINERS = 100
+LEVELS = (1, 6, 9)
+# (window_bits, mem_level) pairs; zlib's defaults are (15, 8)
+MEMORY_SETTINGS = ((15, 8), (12, 5), (9, 1))
+
+
+def make_message(seq: int, content: str) -> dict:
+    return ChatMessage(
+        id=f"0b6f3c1e-8c1d-4c5e-9f61-{seq:012d}",
+        username=f"user{seq % 7}",
+        content=content,
+        timestamp=1700000000.123 + seq,
+        seq=seq,
+    ).to_dict()
+
+
+FRAMES = {
+    "message": encode_message({"type": "message", "data": make_message(1, "hello there!")}),
+    "history": encode_message({
+        "type": "history",
+        "data": [
+            make_message(seq, f"message number {seq}, chatting about the portfolio")
+            for seq in range(1, HISTORY_SIZE + 1)
+        ],
+    }),
+}
+
+
+def deflate_memory(window_bits: int, mem_level: int) -> int:
+    """zlib's documented deflate memory use for the given settings."""
+    return (1 << (window_bits + 2)) + (1 << (mem_level + 9))
+
+
+def main() -> None:
+    results = {}
+    for name, frame in FRAMES.items():
+        raw = len(frame.encode("utf-8"))
+        levels = {}
+        for level in LEVELS:
+            compressed = compress_frame(frame, level=level)
+            levels[level] = {
+                "bytes": len(compressed),
+                "ratio": round(len(compressed) / raw, 3),
+                "compress": measure(lambda: compress_frame(frame, level=level), number=200),
+                "decompress": measure(lambda: zlib.decompress(compressed), number=200),
+            }
+        results[name] = {"raw_bytes": raw, "levels": levels}
+
+    history = FRAMES["history"]
+    per_join = measure(lambda: compress_frame(history), number=200)["best_ns"]
+    results["history_joins"] = {
+        "joiners": JOINERS,
+        "shared_ms": round(per_join / 1e6, 3),
+        "per_connection_ms": round(per_join * JOINERS / 1e6, 3),
+    }
+    results["per_connection_memory"] = [
+        {
+            "window_bits": window_bits,
+            "mem_level": mem_level,
+            "deflate_bytes": deflate_memory(window_bits, mem_level),
+            "history_bytes": len(
+                compress_frame(history, window_bits=window_bits, mem_level=mem_level)
+            ),
+        }
+        for window_bits, mem_level in MEMORY_SETTINGS
+    ]
+    emit("compression", results)
+
+
+if __name__ == "__main__":
+    main()
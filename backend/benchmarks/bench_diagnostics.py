@@ -0,0 +1,78 @@
+"""Overhead of the diagnostics when enabled: a timed method call versus a
+plain one, a stall detector heartbeat, and one profiler sample of a deep
+stack. When disabled nothing is wrapped or scheduled, so they cost nothing.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from benchutil import emit, measure
+
+from portfolio_backend.diagnostics import StallDetector, _collapse, instrument_methods
+from portfolio_backend.metrics import MetricsRegistry
+
+STACK_DEPTH = 30
+
+
+class Target:
+    def call(self) -> int:
+        return 1
+
+    async def coroutine(self) -> int:
+        return 1
+
+
+def nested(depth: int, fn):
+    if depth == 0:
+        return fn()
+    return nested(depth - 1, fn)
+
+
+async def coroutine_costs(number: int = 100000, repeat: int = 5) -> dict:
+    plain = Target()
+    timed = Target()
+    instrument_methods(timed, ["coroutine"], MetricsRegistry())
+
+    results = {}
+    for name, target in (("plain_coroutine", plain), ("timed_coroutine", timed)):
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            for _ in range(number):
+                await target.coroutine()
+            runs.append((time.perf_counter_ns() - started) / number)
+        results[name] = {"best_ns": round(min(runs), 1)}
+    return results
+
+
+async def heartbeat_cost() -> dict:
+    detector = StallDetector(threshold=0.1)
+    detector._loop = asyncio.get_running_loop()
+
+    def beat() -> None:
+        detector._beat()
+        detector._handle.cancel()
+
+    return measure(beat, number=10000)
+
+
+def main() -> None:
+    plain = Target()
+    timed = Target()
+    instrument_methods(timed, ["call"], MetricsRegistry())
+    frame = nested(STACK_DEPTH, lambda: sys._current_frames()[threading.get_ident()])
+
+    results = {
+        "plain_call": measure(plain.call, number=100000),
+        "timed_call": measure(timed.call, number=100000),
+        "stall_heartbeat": asyncio.run(heartbeat_cost()),
+        "profile_sample": measure(lambda: _collapse(frame), number=10000),
+    }
+    results.update(asyncio.run(coroutine_costs()))
+    emit("diagnostics", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cost of routing a direct message as the number of connections grows:
+the username index versus scanning every connection for the username,
+plus delivering the message to the recipient's connections.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import ChatManager
+
+CONNECTION_COUNTS = (100, 1000, 10000)
+
+
+class NullSocket:
+    async def send_text(self, frame: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+async def routing_cost(connections: int) -> dict:
+    manager = ChatManager(
+        SimpleNamespace(heartbeat_interval=0), presence_interval=0
+    )
+    ws_manager = manager.ws_manager
+    for i in range(connections):
+        await ws_manager.connect(f"client-{i}", NullSocket(), username=f"user{i}")
+    target = f"user{connections // 2}"
+
+    def scan() -> list[str]:
+        return [
+            client_id for client_id, connection in ws_manager._connections.items()
+            if connection.username == target
+        ]
+
+    message = {"id": "id", "username": "user0", "to": target, "content": "hi", "timestamp": 0.0}
+    results = {
+        "index_lookup": measure(lambda: ws_manager.get_user_client_ids(target), number=10000),
+        "scan_lookup": measure(scan, number=max(10, 1000000 // connections)),
+    }
+    started = time.perf_counter_ns()
+    for _ in range(10000):
+        await manager._deliver_direct_message(message)
+    results["deliver_ns"] = round((time.perf_counter_ns() - started) / 10000, 1)
+    return results
+
+
+def main() -> None:
+    emit("direct", {
+        str(count): asyncio.run(routing_cost(count)) for count in CONNECTION_COUNTS
+    })
+
+
+if __name__ == "__main__":
+    main()
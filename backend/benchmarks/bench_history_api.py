@@ -0,0 +1,42 @@
+"""Cost of serving a ``/api/history`` page: revalidating with the ETag
+alone (a 304), a page from the page cache, and building a page, for a
+full 100-message history.
+"""
+
+import time
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import ChatManager, ChatMessage, new_message_id
+
+HISTORY_SIZE = 100
+PAGE_SIZE = 50
+CONTENT = "Really like the project carousel, how did you build the blob animation?"
+
+
+def main() -> None:
+    manager = ChatManager(history_size=HISTORY_SIZE)
+    for _ in range(HISTORY_SIZE):
+        manager._store(ChatMessage(new_message_id(), "john_doe", CONTENT, time.time()))
+    cursor = str(manager.message_history.last_seq - PAGE_SIZE + 1)
+
+    def build() -> None:
+        manager.history_pages.invalidate("general")
+        manager.history_page(limit=PAGE_SIZE)
+
+    manager.history_page(limit=PAGE_SIZE)
+    manager.history_page(before=cursor, limit=PAGE_SIZE)
+    results = {
+        "etag_only": measure(manager.history_etag, number=100000),
+        "cached_page": measure(lambda: manager.history_page(limit=PAGE_SIZE), number=100000),
+        "cached_older_page": measure(
+            lambda: manager.history_page(before=cursor, limit=PAGE_SIZE), number=100000
+        ),
+        "build_page": measure(build, number=2000),
+        "page_bytes": len(manager.history_page(limit=PAGE_SIZE)),
+    }
+    emit("history_api", results)
+
+
+if __name__ == "__main__":
+    main()
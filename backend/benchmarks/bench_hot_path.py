@@ -0,0 +1,69 @@
+"""Per-message cost of each step a chat message goes through on the server:
+validation, the bot keyword check, building the message, appending it to
+the history ring buffer and encoding the broadcast frame, plus rebuilding
+the history frame a join replays after each new message.
+"""
+
+import time
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import ChatManager, ChatMessage, new_message_id
+from portfolio_backend.codec import encode_message
+from portfolio_backend.history import MessageHistory
+from portfolio_backend.security import MessageValidator
+
+CONTENT = "Really like the project carousel, how did you build the blob animation?"
+HISTORY_SIZE = 100
+REPLAY_SIZE = 50
+
+
+def make_message(seq: int = 0) -> ChatMessage:
+    return ChatMessage(
+        id=new_message_id(),
+        username="john_doe",
+        content=CONTENT,
+        timestamp=time.time(),
+        seq=seq,
+    )
+
+
+def main() -> None:
+    manager = ChatManager()
+    history = MessageHistory(capacity=HISTORY_SIZE, replay_size=REPLAY_SIZE)
+    for _ in range(HISTORY_SIZE):
+        history.append(make_message())
+    message = make_message(1)
+    payload = {"type": "message", "data": message.to_dict()}
+
+    def append() -> None:
+        history.append(ChatMessage("id", "john_doe", CONTENT, 0.0))
+
+    def append_and_replay() -> None:
+        append()
+        history.history_frame()
+
+    steps = {
+        "validate_message": measure(
+            lambda: MessageValidator.validate_message(CONTENT), number=20000
+        ),
+        "bot_response": measure(lambda: manager._get_bot_response(CONTENT), number=20000),
+        "build_message": measure(make_message, number=20000),
+        "history_append": measure(append, number=20000),
+        "encode_payload": measure(
+            lambda: encode_message({"type": "message", "data": message.to_dict()}), number=20000
+        ),
+        "encode_only": measure(lambda: encode_message(payload), number=20000),
+    }
+    results = dict(steps)
+    results["total_ns"] = round(sum(
+        steps[name]["best_ns"]
+        for name in ("validate_message", "bot_response", "build_message",
+                     "history_append", "encode_payload")
+    ), 1)
+    results["history_frame_after_append"] = measure(append_and_replay, number=2000)
+    emit("hot_path", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Broadcast throughput with the old synchronous, per-recipient logging
+versus queued logging written by a background thread.
+
+Each run broadcasts chat messages to ``RECIPIENTS`` in-memory sockets with
+logging at INFO to a temporary file:
+
+- ``sync_per_recipient``: a ``StreamHandler`` on the root logger, three
+  f-string lines per message and one per recipient, as the send path used
+  to log
+- ``queued``: ``setup_logging`` with one structured record per message
+  and lazy DEBUG lines per recipient
+
+Both use the same send loop, so the difference is the logging alone.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchutil import emit
+
+from portfolio_backend.chat import SimpleWebSocketConnectionManager, encode_message
+from portfolio_backend.logconfig import setup_logging, stop_listener
+
+RECIPIENTS = 1000
+MESSAGES = 200
+
+
+class NullSocket:
+    async def send_text(self, frame: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+async def make_manager() -> SimpleWebSocketConnectionManager:
+    # Direct sends: the path that used to log once per recipient
+    manager = SimpleWebSocketConnectionManager(
+        SimpleNamespace(heartbeat_interval=0, queue_high_water=0)
+    )
+    for i in range(RECIPIENTS):
+        await manager.connect(f"client-{i}", NullSocket())
+    return manager
+
+
+def payload(i: int) -> dict:
+    return {
+        "type": "message",
+        "data": {"id": f"id-{i}", "username": "bob", "content": f"message {i}", "seq": i},
+    }
+
+
+async def fan_out(connections: list, frame: str, log_recipient) -> None:
+    for connection in connections:
+        log_recipient(connection.client_id)
+        await connection.websocket.send_text(frame)
+
+
+async def run_sync(connections: list) -> float:
+    logger = logging.getLogger("bench.sync")
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        message = payload(i)
+        content = message["data"]["content"]
+        logger.info(f"[SEND_MESSAGE] About to broadcast message from bob: {content}")
+        logger.info(f"[SEND_MESSAGE] Connection count before broadcast: {len(connections)}")
+        await fan_out(
+            connections, encode_message(message),
+            lambda client_id: logger.info(f"Sending to {client_id}: {message!r}"),
+        )
+        logger.info("[SEND_MESSAGE] Broadcast complete")
+    return time.perf_counter() - start
+
+
+async def run_queued(connections: list) -> float:
+    logger = logging.getLogger("bench.queued")
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        message = payload(i)
+        logger.info(
+            "Message from %s", "bob",
+            extra={"username": "bob", "content": message["data"]["content"], "sampled": True},
+        )
+        # Per-recipient lines are lazy DEBUG records, filtered at INFO
+        await fan_out(
+            connections, encode_message(message),
+            lambda client_id: logger.debug("Sent to %s", client_id),
+        )
+    return time.perf_counter() - start
+
+
+def result(elapsed: float) -> dict:
+    return {
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(MESSAGES / elapsed, 1),
+        "deliveries_per_sec": round(MESSAGES * RECIPIENTS / elapsed),
+    }
+
+
+async def main_async(path: str) -> dict:
+    manager = await make_manager()
+    connections = list(manager._connections.values())
+    root = logging.getLogger()
+
+    with open(path, "a") as stream:
+        handler = logging.StreamHandler(stream)
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        sync = await run_sync(connections)
+        root.removeHandler(handler)
+
+        listener = setup_logging(level="INFO", log_content=True, stream=stream)
+        queued = await run_queued(connections)
+        stop_listener(listener)
+
+    return {
+        "recipients": RECIPIENTS,
+        "messages": MESSAGES,
+        "sync_per_recipient": result(sync),
+        "queued": result(queued),
+        "speedup": round(sync / queued, 1),
+    }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(main_async(os.path.join(tmp, "bench.log")))
+    emit("logging", results)
+
+
+if __name__ == "__main__":
+    main()
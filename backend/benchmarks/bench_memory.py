@@ -0,0 +1,174 @@
+"""Memory per stored message and per registered connection, via tracemalloc.
+
+Fills a ``MessageHistory`` with ``MESSAGES`` messages and a connection
+manager with ``CONNECTIONS`` connections (queued mode: each with its
+outbound queue, writer task and heartbeat entry) and reports the bytes
+allocated per object. The content of a message is not its overhead, so
+bytes per message are reported both in total and without the content
+string.
+
+The message layout before slotting (a ``__dict__`` per message and a UUID4
+string id) is measured alongside for comparison. The script exits with
+status 1 if any figure exceeds its budget in ``BUDGETS``, so it can guard
+against regressions in CI:
+
+    python benchmarks/bench_memory.py
+"""
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from benchutil import emit
+
+from portfolio_backend.chat import (
+    DEFAULT_ROOM,
+    ChatMessage,
+    SimpleWebSocketConnectionManager,
+    new_message_id,
+)
+from portfolio_backend.history import MessageHistory
+from portfolio_backend.metrics import ChatMetrics
+
+MESSAGES = 50000
+CONNECTIONS = 20000
+USERNAMES = 500
+CONTENT = "Really like the project carousel, how did you build the blob animation? #{}"
+
+# Bytes per object; measured on CPython 3.11 x86-64 with some headroom
+BUDGETS = {
+    "message_overhead": 300,
+    "connection": 3200,
+}
+
+
+@dataclass
+class LegacyChatMessage:
+    """The message layout before slotting, for comparison."""
+
+    id: str
+    username: str
+    content: str
+    timestamp: float
+    seq: int = 0
+    room: str = DEFAULT_ROOM
+
+
+class NullSocket:
+    async def send_text(self, frame: str) -> None:
+        pass
+
+    async def send_bytes(self, frame: bytes) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+def traced(build) -> tuple:
+    """Run ``build`` and return its result and the bytes it left allocated."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def history_bytes(make) -> dict:
+    # Usernames arrive as fresh strings from the wire, as they would from
+    # the backplane or the history log
+    names = [f"user{i % USERNAMES}" for i in range(MESSAGES)]
+    contents = [CONTENT.format(i) for i in range(MESSAGES)]
+    content_bytes = sum(sys.getsizeof(content) for content in contents)
+
+    def build():
+        history = MessageHistory(capacity=MESSAGES, replay_size=50)
+        for seq in range(1, MESSAGES + 1):
+            history.append(make(names[seq - 1], contents[seq - 1], seq))
+        return history
+
+    # Contents and usernames are allocated before tracing starts, so only
+    # the messages and the history's own structures are counted
+    history, allocated = traced(build)
+    return {
+        "messages": len(history),
+        "bytes_per_message": round((allocated + content_bytes) / MESSAGES, 1),
+        "message_overhead": round(allocated / MESSAGES, 1),
+    }
+
+
+def make_message(username: str, content: str, seq: int) -> ChatMessage:
+    return ChatMessage.from_dict({
+        "id": new_message_id(),
+        "username": username,
+        "content": content,
+        "timestamp": time.time(),
+        "seq": seq,
+        "room": DEFAULT_ROOM,
+    })
+
+
+def make_legacy_message(username: str, content: str, seq: int) -> LegacyChatMessage:
+    return LegacyChatMessage(
+        id=str(uuid.uuid4()),
+        username=username,
+        content=content,
+        timestamp=time.time(),
+        seq=seq,
+    )
+
+
+async def connection_bytes() -> dict:
+    manager = SimpleWebSocketConnectionManager(
+        SimpleNamespace(heartbeat_interval=30.0, batch_window=0.005), metrics=ChatMetrics()
+    )
+    client_ids = [str(uuid.uuid4()) for _ in range(CONNECTIONS)]
+    sockets = [NullSocket() for _ in range(CONNECTIONS)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i, client_id in enumerate(client_ids):
+        await manager.connect(
+            client_id, sockets[i], username=f"user{i % USERNAMES}", room=DEFAULT_ROOM
+        )
+    # Let every writer task start and park on its queue
+    await asyncio.sleep(0)
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    await manager.graceful_shutdown(timeout=5.0)
+    return {
+        "connections": CONNECTIONS,
+        "connection": round(allocated / CONNECTIONS, 1),
+    }
+
+
+def main() -> None:
+    results = {
+        "history": history_bytes(make_message),
+        "history_legacy": history_bytes(make_legacy_message),
+        "registry": asyncio.run(connection_bytes()),
+    }
+    measured = {
+        "message_overhead": results["history"]["message_overhead"],
+        "connection": results["registry"]["connection"],
+    }
+    results["budgets"] = BUDGETS
+    results["over_budget"] = sorted(
+        name for name, budget in BUDGETS.items() if measured[name] > budget
+    )
+    emit("memory", results)
+    if results["over_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
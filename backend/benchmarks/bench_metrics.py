@@ -0,0 +1,61 @@
+"""Cost of the metrics instruments on the hot path, and of rendering
+``/metrics`` with many connections open.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchutil import emit, measure
+
+from portfolio_backend.chat import SimpleWebSocketConnectionManager
+from portfolio_backend.metrics import ChatMetrics
+
+CONNECTIONS = 1000
+
+
+class NullSocket:
+    async def send_text(self, frame: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+async def scrape_cost() -> dict:
+    metrics = ChatMetrics()
+    manager = SimpleWebSocketConnectionManager(
+        SimpleNamespace(heartbeat_interval=0), metrics=metrics
+    )
+    for i in range(CONNECTIONS):
+        await manager.connect(f"client-{i}", NullSocket())
+    for i in range(1000):
+        metrics.broadcast_seconds.observe(i / 1e5)
+    return {
+        "connections": CONNECTIONS,
+        "render": measure(metrics.registry.render, number=100),
+        "bytes": len(metrics.registry.render()),
+    }
+
+
+def main() -> None:
+    metrics = ChatMetrics()
+    histogram = metrics.broadcast_seconds
+    counter = metrics.messages_received
+
+    def timed_observe() -> None:
+        started = time.perf_counter()
+        histogram.observe(time.perf_counter() - started)
+
+    results = {
+        "counter_inc": measure(counter.inc, number=100000),
+        "histogram_observe": measure(lambda: histogram.observe(0.0042), number=100000),
+        "timed_observe": measure(timed_observe, number=100000),
+        "quantile": measure(lambda: histogram.quantile(0.99), number=10000),
+        "scrape": asyncio.run(scrape_cost()),
+    }
+    emit("metrics", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""MessageValidator cost: the original per-pattern implementation versus the
+precompiled single-pass ``validate_message`` and the batch API.
+"""
+
+import html
+import re
+from typing import Optional
+
+from benchutil import emit, measure
+
+from portfolio_backend.security import MessageValidator
+
+MESSAGES = {
+    "short": "hello there",
+    "typical": "Really like the project carousel, how did you build the blob animation? " * 2,
+    "max_length": ("lorem ipsum dolor sit amet " * 40)[:1000],
+    "dangerous": "click <a href='javascript:alert(1)'>here</a>",
+}
+BATCH_SIZE = 100
+
+
+class LegacyValidator:
+    """The validator as it was before patterns were precompiled."""
+
+    DANGEROUS_PATTERNS = MessageValidator.DANGEROUS_PATTERNS
+
+    @staticmethod
+    def sanitize_message(message: str, max_length: int = 1000) -> Optional[str]:
+        if not message or len(message) > max_length:
+            return None
+        message = message.strip()
+        if not message:
+            return None
+        return html.escape(message)
+
+    @staticmethod
+    def is_dangerous(message: str) -> bool:
+        message_lower = message.lower()
+        for pattern in LegacyValidator.DANGEROUS_PATTERNS:
+            if re.search(pattern, message_lower, re.IGNORECASE):
+                return True
+        return False
+
+    @staticmethod
+    def validate(message: str) -> Optional[str]:
+        sanitized = LegacyValidator.sanitize_message(message)
+        if not sanitized or LegacyValidator.is_dangerous(sanitized):
+            return None
+        return sanitized
+
+
+def main() -> None:
+    results = {}
+    for name, message in MESSAGES.items():
+        batch = [message] * BATCH_SIZE
+        results[name] = {
+            "length": len(message),
+            "legacy": measure(lambda: LegacyValidator.validate(message)),
+            "validate_message": measure(lambda: MessageValidator.validate_message(message)),
+            "validate_many_per_message": {
+                key: round(value / BATCH_SIZE, 1)
+                for key, value in measure(
+                    lambda: MessageValidator.validate_many(batch), number=20
+                ).items()
+            },
+        }
+    emit("validator", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Shared helpers for the micro-benchmarks.
+
+Benchmarks are plain scripts run from the ``backend`` directory, e.g.
+``python benchmarks/bench_bot_rules.py``. Each prints one JSON document to
+stdout so results can be saved and diffed between commits.
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict
+
+# Make the package importable without installing it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+
+def measure(fn: Callable[[], Any], number: int = 1000, repeat: int = 5) -> Dict[str, float]:
+    """Time ``fn`` and report nanoseconds per call.
+
+    Args:
+        fn: Zero-argument callable to time
+        number: Calls per timing run
+        repeat: Number of timing runs
+
+    Returns:
+        Best and median nanoseconds per call across runs
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter_ns() - start) / number)
+    return {"best_ns": round(min(runs), 1), "median_ns": round(statistics.median(runs), 1)}
+
+
+def emit(name: str, results: Any) -> None:
+    """Print benchmark results as a JSON document.
+
+    Args:
+        name: Benchmark name
+        results: JSON-serializable results
+    """
+    print(json.dumps({
+        "benchmark": name,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }, indent=2))
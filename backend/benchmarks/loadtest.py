@@ -0,0 +1,325 @@
+"""End-to-end load test of ``/ws/chat``.
+
+Starts the app with uvicorn in a subprocess on a free local port, fills the
+history, then opens ``--clients`` WebSocket connections spread over
+``--processes`` client processes. Every client measures how long its join
+took, from opening the socket to receiving the history replay. Then
+``--senders`` of the clients each send ``--rate`` messages per second for
+``--duration`` seconds. Every message carries its send time, so each
+receiving client records the end-to-end delivery latency.
+
+Reports join and delivery latency percentiles, message and delivery
+throughput, and server memory per connection (resident set size growth
+while the clients connect, Linux only), as one JSON document:
+
+    python benchmarks/loadtest.py --clients 2000 --processes 4 --senders 50 --rate 2
+
+Rate limits and admission control are disabled for the server under test.
+Thousands of clients need a matching open-file limit (``ulimit -n``).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Optional
+
+import websockets
+from benchutil import emit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "loadtest"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, clients: int, history: int, extra_env: dict) -> subprocess.Popen:
+    """Start uvicorn with limits raised for the test and wait until it answers."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.path.join(BACKEND_DIR, "src"),
+        "WS_MAX_CONNECTIONS": str(clients + 100),
+        "WS_SOFT_MAX_CONNECTIONS": str(clients + 100),
+        "WS_ACCEPT_RATE": "0",
+        "CHAT_RATE_LIMIT": "0",
+        "CHAT_USERNAME_RATE_LIMIT": "0",
+        "CHAT_GLOBAL_RATE_LIMIT": "0",
+        "CHAT_HISTORY_SIZE": str(max(history, 1)),
+        "CHAT_HISTORY_REPLAY_SIZE": str(history),
+        "LOG_LEVEL": "WARNING",
+    })
+    env.update(extra_env)
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "portfolio_backend.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, from /proc (None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentiles(values: list[float]) -> dict:
+    """Millisecond percentiles of latencies given in seconds."""
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+    return {
+        "count": len(values),
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p99_ms": at(0.99),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def frames_of(raw: str) -> list:
+    """Decode a frame, unpacking ``batch`` frames."""
+    payload = json.loads(raw)
+    if payload.get("type") == "batch":
+        return payload["data"]
+    return [payload]
+
+
+async def seed_history(url: str, count: int) -> None:
+    async with websockets.connect(f"{url}?username=seed", max_size=None) as ws:
+        for i in range(count):
+            await ws.send(json.dumps({
+                "type": "message",
+                "content": f"history message {i}, long enough to look like real chat",
+            }))
+        # Our own broadcasts come back once everything has been stored
+        seen = 0
+        while seen < count:
+            for frame in frames_of(await ws.recv()):
+                if frame.get("type") == "message":
+                    seen += 1
+
+
+class Client:
+    """One simulated chat user."""
+
+    def __init__(self, url: str, name: str, delivery: list[float]) -> None:
+        self.url = url
+        self.name = name
+        self.delivery = delivery
+        self.join_latency: Optional[float] = None
+        self.ws = None
+        self.received = 0
+
+    async def connect(self) -> None:
+        started = time.perf_counter()
+        self.ws = await websockets.connect(
+            f"{self.url}?username={self.name}", max_size=None, open_timeout=60
+        )
+        # Joined once the history replay (or, with empty history, the
+        # first frame) has arrived
+        while True:
+            frames = frames_of(await self.ws.recv())
+            if any(frame.get("type") in ("history", "user_count") for frame in frames):
+                break
+        self.join_latency = time.perf_counter() - started
+
+    async def receive(self) -> None:
+        try:
+            async for raw in self.ws:
+                now = time.time()
+                for frame in frames_of(raw):
+                    kind = frame.get("type")
+                    if kind == "message":
+                        content = frame["data"]["content"]
+                        if content.startswith(MARKER):
+                            self.delivery.append(now - float(content.split()[1]))
+                            self.received += 1
+                    elif kind == "ping":
+                        await self.ws.send('{"type":"pong"}')
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send(self, rate: float, duration: float) -> int:
+        interval = 1.0 / rate
+        sent = 0
+        loop = asyncio.get_running_loop()
+        next_send = loop.time()
+        end = next_send + duration
+        while next_send < end:
+            await self.ws.send(json.dumps({
+                "type": "message",
+                "content": f"{MARKER} {time.time():.6f}",
+            }))
+            sent += 1
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - loop.time()))
+        return sent
+
+
+async def run_clients(
+    url: str,
+    index: int,
+    count: int,
+    senders: int,
+    rate: float,
+    duration: float,
+    drain: float,
+    connected,
+    start_sending,
+) -> dict:
+    delivery: list[float] = []
+    clients = [Client(url, f"load{index}x{i}", delivery) for i in range(count)]
+    errors = 0
+
+    # Connect in waves so the accept backlog is not overrun
+    for offset in range(0, count, 100):
+        results = await asyncio.gather(
+            *(client.connect() for client in clients[offset:offset + 100]),
+            return_exceptions=True,
+        )
+        errors += sum(isinstance(result, Exception) for result in results)
+    live = [client for client in clients if client.join_latency is not None]
+    receivers = [asyncio.create_task(client.receive()) for client in live]
+
+    loop = asyncio.get_running_loop()
+    connected.set()
+    await loop.run_in_executor(None, start_sending.wait)
+
+    sent = await asyncio.gather(*(client.send(rate, duration) for client in live[:senders]))
+    await asyncio.sleep(drain)
+
+    for client in live:
+        await client.ws.close()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    return {
+        "join": [client.join_latency for client in live],
+        "delivery": delivery,
+        "sent": sum(sent),
+        "received": sum(client.received for client in live),
+        "connected": len(live),
+        "errors": errors,
+    }
+
+
+def client_process(args: tuple, results) -> None:
+    results.put(asyncio.run(run_clients(*args)))
+
+
+def split(total: int, parts: int) -> list[int]:
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--senders", type=int, default=10, help="clients that send messages")
+    parser.add_argument("--rate", type=float, default=1.0, help="messages per second per sender")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of sending")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for deliveries")
+    parser.add_argument("--history", type=int, default=50, help="messages replayed on join")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="NAME=VALUE",
+        help="extra server setting, e.g. --env WS_BATCH_WINDOW=0.01",
+    )
+    options = parser.parse_args()
+    extra_env = dict(item.split("=", 1) for item in options.env)
+
+    port = free_port()
+    url = f"ws://127.0.0.1:{port}/ws/chat"
+    server = start_server(port, options.clients, options.history, extra_env)
+    try:
+        asyncio.run(seed_history(url, options.history))
+        rss_before = rss_bytes(server.pid)
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        start_sending = ctx.Event()
+        counts = split(options.clients, options.processes)
+        senders = split(min(options.senders, options.clients), options.processes)
+        events = []
+        procs = []
+        for index, (count, sender_count) in enumerate(zip(counts, senders)):
+            connected = ctx.Event()
+            args = (
+                url, index, count, sender_count, options.rate,
+                options.duration, options.drain, connected, start_sending,
+            )
+            procs.append(ctx.Process(target=client_process, args=(args, results)))
+            events.append(connected)
+        for proc in procs:
+            proc.start()
+        for connected in events:
+            connected.wait()
+
+        rss_connected = rss_bytes(server.pid)
+        start_sending.set()
+        reports = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    connected = sum(report["connected"] for report in reports)
+    sent = sum(report["sent"] for report in reports)
+    received = sum(report["received"] for report in reports)
+    memory = None
+    if rss_before is not None and rss_connected is not None and connected:
+        memory = {
+            "rss_before_mb": round(rss_before / 2**20, 1),
+            "rss_connected_mb": round(rss_connected / 2**20, 1),
+            "bytes_per_connection": (rss_connected - rss_before) // connected,
+        }
+    emit("loadtest", {
+        "options": vars(options),
+        "connected": connected,
+        "connect_errors": sum(report["errors"] for report in reports),
+        "join": percentiles([latency for r in reports for latency in r["join"]]),
+        "delivery": percentiles([latency for r in reports for latency in r["delivery"]]),
+        "messages_sent": sent,
+        "messages_per_sec": round(sent / options.duration, 1),
+        "deliveries": received,
+        "deliveries_per_sec": round(received / options.duration, 1),
+        "delivery_ratio": round(received / (sent * connected), 4) if sent and connected else None,
+        "memory": memory,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Run every micro-benchmark and save the results as one JSON document.
+
+    python benchmarks/run_all.py --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/run_all.py --compare results/abc1234.json
+
+Each ``bench_*.py`` script runs in its own process. With ``--compare``,
+every ``best_ns`` timing is compared with the same timing in an earlier
+run and those that got slower by more than ``--threshold`` are listed.
+The load test (``loadtest.py``) is not included; run it separately.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Iterator, Optional
+
+from benchutil import emit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names: list[str]) -> dict:
+    results = {}
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, "bench_*.py"))):
+        name = os.path.basename(path)[len("bench_"):-len(".py")]
+        if names and name not in names:
+            continue
+        print(f"running {name}", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, path], cwd=os.path.dirname(BENCH_DIR),
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            results[name] = {"error": completed.stderr.strip().splitlines()[-1:]}
+            continue
+        results[name] = json.loads(completed.stdout)["results"]
+    return results
+
+
+def timings(results: Any, path: str = "") -> Iterator[tuple[str, float]]:
+    """Yield (path, best_ns) for every timing in a results tree."""
+    if isinstance(results, dict):
+        if "best_ns" in results:
+            yield path, results["best_ns"]
+            return
+        for key, value in results.items():
+            yield from timings(value, f"{path}.{key}" if path else str(key))
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    before = dict(timings(baseline))
+    changes = {}
+    for path, best_ns in timings(current):
+        old = before.get(path)
+        if old:
+            changes[path] = round(best_ns / old, 3)
+    return {
+        "ratios": changes,
+        "regressions": sorted(path for path, ratio in changes.items() if ratio > 1 + threshold),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run, e.g. codec (default all)")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="slowdown reported (0.1 = 10%%)"
+    )
+    options = parser.parse_args()
+
+    report = {"commit": git_commit(), "benchmarks": run_benchmarks(options.names)}
+    if options.compare:
+        with open(options.compare) as baseline:
+            previous = json.load(baseline)
+        report["compared_with"] = previous.get("commit")
+        report["comparison"] = compare(
+            report["benchmarks"], previous["benchmarks"], options.threshold
+        )
+    if options.output:
+        os.makedirs(os.path.dirname(os.path.abspath(options.output)), exist_ok=True)
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent=2)
+    emit("all", report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Admission control for new WebSocket connections."""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .ratelimit import TokenBucket
+
+# Admission outcomes
+ADMIT = "admit"
+ADMIT_DEGRADED = "degraded"
+REJECT = "reject"
+
+# Close code for rejected clients ("Try Again Later")
+REJECT_CLOSE_CODE = 1013
+
+
+@dataclass
+class AdmissionDecision:
+    """Outcome of an admission check."""
+    outcome: str
+    retry_after: float = 0.0
+    reason: str = ""
+
+    @property
+    def admitted(self) -> bool:
+        """Whether the client may connect (possibly degraded)."""
+        return self.outcome != REJECT
+
+
+class AdmissionController:
+    """Decides whether a new connection is admitted.
+
+    - At or above ``hard_cap`` connections, clients are rejected.
+    - At or above ``soft_cap``, clients are admitted in degraded mode.
+    - Accepts are rate limited by a token bucket. Clients turned away by the
+      limiter get consecutive future slots at the accept rate as their
+      retry-after hint, so a thundering herd returns spread out rather than
+      all at once.
+
+    Admitted clients hold a reservation until ``release`` is called, so
+    concurrent handshakes cannot overshoot the caps before they register.
+    """
+
+    def __init__(
+        self,
+        hard_cap: int = 1000,
+        soft_cap: int = 0,
+        accept_rate: float = 0.0,
+        accept_burst: int = 100,
+        retry_after: float = 10.0,
+        max_retry_after: float = 60.0,
+    ) -> None:
+        """Initialize the controller.
+
+        Args:
+            hard_cap: Maximum number of connections
+            soft_cap: Connections above which clients are degraded (0 disables)
+            accept_rate: Accepted connections per second (0 disables)
+            accept_burst: Accepts allowed in a burst
+            retry_after: Base retry hint when the hard cap is reached
+            max_retry_after: Upper bound on any retry hint
+        """
+        self.hard_cap = hard_cap
+        self.soft_cap = soft_cap
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.accept_rate = accept_rate
+        self._bucket: Optional[TokenBucket] = None
+        if accept_rate > 0:
+            self._bucket = TokenBucket(accept_rate, max(1, accept_burst))
+        self._next_slot = 0.0
+        self.pending = 0
+        self.rejected = 0
+
+    def try_admit(self, active: int, now: Optional[float] = None) -> AdmissionDecision:
+        """Check whether a new client may connect.
+
+        Args:
+            active: Number of registered connections
+            now: Current monotonic time
+
+        Returns:
+            Decision; when admitted, the caller must call ``release`` once
+            the client is registered or the handshake is abandoned
+        """
+        now = time.monotonic() if now is None else now
+        total = active + self.pending
+
+        if total >= self.hard_cap:
+            self.rejected += 1
+            # Jitter so rejected clients do not all come back together
+            retry_after = self.retry_after * random.uniform(0.5, 1.5)
+            return AdmissionDecision(REJECT, min(retry_after, self.max_retry_after), "full")
+
+        if self._bucket is not None and not self._bucket.consume(now=now):
+            self.rejected += 1
+            self._next_slot = max(self._next_slot, now + self._bucket.wait_time(now=now))
+            self._next_slot += 1.0 / self.accept_rate
+            retry_after = min(self._next_slot - now, self.max_retry_after)
+            return AdmissionDecision(REJECT, retry_after, "rate_limited")
+
+        self.pending += 1
+        if self.soft_cap and total >= self.soft_cap:
+            return AdmissionDecision(ADMIT_DEGRADED, reason="busy")
+        return AdmissionDecision(ADMIT)
+
+    def release(self) -> None:
+        """Release the reservation taken by an admitted client."""
+        self.pending = max(0, self.pending - 1)
@@ -0,0 +1,472 @@
+"""Pub/sub backplane connecting chat workers.
+
+Every event a worker publishes is delivered to every worker, including the
+publisher, in a single global order. The backplane also acts as the
+sequencer for chat messages: it stamps each message in an
+``EVENT_MESSAGE`` event with the next sequence number and keeps the most
+recent ones, which are replayed to workers as an ``EVENT_SYNC`` snapshot
+when they join. Workers that apply events in delivery order therefore end
+up with identical histories and sequence numbers.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import socket
+import struct
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .codec import decode_message, encode_bytes
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+EVENT_MESSAGE = "message"        # Chat messages to store and broadcast
+EVENT_SYSTEM = "system"          # System notice to broadcast
+EVENT_DIRECT = "direct"          # Direct message for a user's connections
+EVENT_KICK = "kick"              # Close every connection of a user
+EVENT_PRESENCE = "presence"      # A worker's local connection count per room
+EVENT_NODE_DOWN = "node_down"    # A worker left the backplane
+EVENT_SYNC = "sync"              # Recent messages and presence for a joining worker
+EVENT_HELLO = "hello"            # Sent by a worker when it (re)connects to a broker
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+HelloFactory = Callable[[], Dict[str, Any]]
+
+# Bytes a broker buffers for one worker before disconnecting it as too slow
+DEFAULT_MAX_PEER_BUFFER = 8 * 1024 * 1024
+
+
+def new_node_id() -> str:
+    """Generate an identifier for this worker."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class Sequencer:
+    """Orders chat messages and remembers enough state to sync new workers."""
+
+    def __init__(self, history_size: int = 100) -> None:
+        """Initialize the sequencer.
+
+        Args:
+            history_size: Number of recent messages kept for syncing
+        """
+        self.last_seq = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        # Connection counts per worker, per room
+        self.presence: Dict[str, Dict[str, int]] = {}
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Stamp and record an event before it is delivered.
+
+        Args:
+            event: Event being published; modified in place
+        """
+        kind = event.get("kind")
+        if kind == EVENT_MESSAGE:
+            for message in event["messages"]:
+                self.last_seq += 1
+                message["seq"] = self.last_seq
+                self.recent.append(message)
+        elif kind == EVENT_PRESENCE:
+            counts = self.presence.setdefault(event["node"], {})
+            for room, count in event["counts"].items():
+                if count:
+                    counts[room] = count
+                else:
+                    counts.pop(room, None)
+        elif kind == EVENT_NODE_DOWN:
+            self.presence.pop(event["node"], None)
+
+    def adopt(self, last_seq: int, messages: list[Dict[str, Any]]) -> None:
+        """Take over a worker's history if it is ahead of the sequencer.
+
+        Lets a restarted broker continue the sequence instead of restarting
+        it from zero.
+        """
+        if last_seq > self.last_seq:
+            self.last_seq = last_seq
+            self.recent.clear()
+            self.recent.extend(messages)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Build the sync event for a joining worker."""
+        return {
+            "kind": EVENT_SYNC,
+            "messages": list(self.recent),
+            "presence": {node: dict(counts) for node, counts in self.presence.items()},
+        }
+
+
+class Backplane(ABC):
+    """Delivers events between chat workers."""
+
+    def __init__(self, node_id: Optional[str] = None) -> None:
+        """Initialize the backplane.
+
+        Args:
+            node_id: Identifier of this worker (generated if omitted)
+        """
+        self.node_id = node_id or new_node_id()
+        self.handler: Optional[EventHandler] = None
+
+    @abstractmethod
+    async def start(self, handler: EventHandler, hello: Optional[HelloFactory] = None) -> None:
+        """Subscribe to events.
+
+        The first event delivered is an ``EVENT_SYNC`` snapshot.
+
+        Args:
+            handler: Coroutine function called with every event, in order
+            hello: Callable returning this worker's ``last_seq``, recent
+                ``messages`` and connection ``counts`` per room, sent
+                whenever it (re)connects to a broker
+        """
+
+    @abstractmethod
+    async def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Publish an event to every worker.
+
+        Returns:
+            The event as delivered. For ``EVENT_MESSAGE`` it carries the
+            sequence numbers the sequencer stamped, and is returned once
+            this worker has handled it.
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Unsubscribe and release resources."""
+
+
+class InProcessBackplane(Backplane):
+    """Backplane for one process; publish delivers to subscribers directly.
+
+    Several ``ChatManager`` instances may share one instance, which is how
+    multi-worker behaviour can be exercised without processes.
+    """
+
+    def __init__(self, node_id: Optional[str] = None, history_size: int = 100) -> None:
+        super().__init__(node_id)
+        self.sequencer = Sequencer(history_size)
+        self._subscribers: list[EventHandler] = []
+
+    async def start(self, handler: EventHandler, hello: Optional[HelloFactory] = None) -> None:
+        self.handler = handler
+        if hello is not None:
+            state = hello()
+            self.sequencer.adopt(state.get("last_seq", 0), state.get("messages", []))
+        await handler(self.sequencer.snapshot())
+        self._subscribers.append(handler)
+
+    async def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self.sequencer.observe(event)
+        for handler in list(self._subscribers):
+            await handler(event)
+        return event
+
+    async def close(self) -> None:
+        if self.handler in self._subscribers:
+            self._subscribers.remove(self.handler)
+        self.handler = None
+
+
+# Wire format: 4-byte big-endian length followed by a UTF-8 JSON document
+_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """Read one length-prefixed JSON frame."""
+    header = await reader.readexactly(_HEADER.size)
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Backplane frame too large: {length} bytes")
+    event: Dict[str, Any] = decode_message(await reader.readexactly(length))
+    return event
+
+
+def encode_frame(event: Dict[str, Any]) -> bytes:
+    """Encode an event as a length-prefixed JSON frame."""
+    body = encode_bytes(event)
+    return _HEADER.pack(len(body)) + body
+
+
+class UnixSocketBroker:
+    """Relays events between workers over a Unix domain socket.
+
+    Every frame received from a worker is sequenced and written to every
+    connected worker, including the sender, so all workers observe the same
+    order. When a worker disconnects, an ``EVENT_NODE_DOWN`` is published
+    for it.
+
+    A worker that reads more slowly than the others publish would make the
+    broker buffer frames for it without limit. Once more than
+    ``max_peer_buffer`` bytes are waiting for one worker, the broker
+    disconnects it instead; the worker reconnects and catches up from the
+    sync snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        history_size: int = 100,
+        max_peer_buffer: int = DEFAULT_MAX_PEER_BUFFER,
+    ) -> None:
+        """Initialize the broker.
+
+        Args:
+            path: Filesystem path of the socket
+            history_size: Number of recent messages kept for syncing
+            max_peer_buffer: Bytes buffered for a worker before it is
+                disconnected
+        """
+        self.path = path
+        self.max_peer_buffer = max_peer_buffer
+        self.sequencer = Sequencer(history_size)
+        self.slow_disconnects = 0
+        self._writers: Dict[asyncio.StreamWriter, str] = {}
+        self._handlers: set["asyncio.Task[None]"] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Bind the socket and start accepting workers."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info("Backplane broker listening on %s", self.path)
+
+    async def close(self) -> None:
+        """Stop the broker and disconnect workers."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in list(self._writers):
+            writer.transport.abort()
+        self._writers.clear()
+        # Aborted transports end the handlers with EOF; cancelling them instead
+        # trips the stream server's done callback on Python 3.11
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self._handlers.add(task)
+        try:
+            while True:
+                event = await read_frame(reader)
+                if event.get("kind") == EVENT_HELLO:
+                    # Relaying to a worker starts with its snapshot
+                    node = event["node"]
+                    self.sequencer.adopt(event.get("last_seq", 0), event.get("messages", []))
+                    writer.write(encode_frame(self.sequencer.snapshot()))
+                    self._writers[writer] = node
+                    self._relay({
+                        "kind": EVENT_PRESENCE, "node": node, "counts": event.get("counts", {}),
+                    })
+                    continue
+                self._relay(event)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            node = self._writers.pop(writer, None)
+            writer.close()
+            if node is not None:
+                self._relay({"kind": EVENT_NODE_DOWN, "node": node})
+
+    def _relay(self, event: Dict[str, Any]) -> None:
+        self.sequencer.observe(event)
+        frame = encode_frame(event)
+        for writer, node in list(self._writers.items()):
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_peer_buffer:
+                # Its handler sees the connection drop and announces it down
+                self.slow_disconnects += 1
+                logger.warning("Disconnecting slow backplane worker %s", node)
+                writer.transport.abort()
+                continue
+            writer.write(frame)
+
+
+class UnixSocketBackplane(Backplane):
+    """Backplane for several worker processes on one machine.
+
+    Workers elect a broker with an exclusive ``flock`` on ``<path>.lock``:
+    the worker holding the lock runs a ``UnixSocketBroker`` inside its own
+    event loop, and every worker (the broker host included) connects to it
+    as a client. If the connection drops, for example because the hosting
+    worker exited, workers re-run the election and reconnect, re-sending
+    ``hello`` so the new broker can continue the message sequence.
+
+    Chat messages are published with a ``ref`` unique to this worker, and
+    ``publish`` returns when the broker relays them back with their
+    sequence numbers.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        node_id: Optional[str] = None,
+        history_size: int = 100,
+        reconnect_delay: float = 0.5,
+        max_peer_buffer: int = DEFAULT_MAX_PEER_BUFFER,
+    ) -> None:
+        """Initialize the backplane.
+
+        Args:
+            path: Filesystem path of the broker socket
+            node_id: Identifier of this worker
+            history_size: Number of recent messages a hosted broker keeps
+            reconnect_delay: Seconds between reconnection attempts
+            max_peer_buffer: Bytes a hosted broker buffers for a worker
+                before disconnecting it
+        """
+        super().__init__(node_id)
+        self.path = path
+        self.history_size = history_size
+        self.reconnect_delay = reconnect_delay
+        self.max_peer_buffer = max_peer_buffer
+        self.broker: Optional[UnixSocketBroker] = None
+        self._lock_fd: Optional[int] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional["asyncio.Task[None]"] = None
+        self._hello: Optional[HelloFactory] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._connected = asyncio.Event()
+        self._closed = False
+        # Published chat messages waiting to come back sequenced, by ref
+        self._pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._next_ref = 0
+
+    async def start(self, handler: EventHandler, hello: Optional[HelloFactory] = None) -> None:
+        self.handler = handler
+        self._hello = hello
+        await self._connect()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _elect(self) -> None:
+        """Host the broker if no other worker holds the lock."""
+        if self._lock_fd is not None:
+            return
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        self.broker = UnixSocketBroker(self.path, self.history_size, self.max_peer_buffer)
+        await self.broker.start()
+
+    async def _connect(self) -> asyncio.StreamReader:
+        """Connect to the broker, hosting it first if elected.
+
+        Returns once the broker's sync snapshot has been handled, so events
+        published afterwards reach this worker.
+        """
+        while True:
+            await self._elect()
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            hello = {"kind": EVENT_HELLO, "node": self.node_id}
+            if self._hello is not None:
+                hello.update(self._hello())
+            try:
+                writer.write(encode_frame(hello))
+                await writer.drain()
+                sync = await read_frame(reader)
+                break
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                writer.close()
+                await asyncio.sleep(self.reconnect_delay)
+
+        if self.handler is not None:
+            await self.handler(sync)
+        self._writer = writer
+        self._reader = reader
+        self._connected.set()
+        return reader
+
+    async def _read_loop(self) -> None:
+        reader = self._reader
+        assert reader is not None
+        while not self._closed:
+            try:
+                event = await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                if self._closed:
+                    return
+                logger.warning("Lost backplane broker connection, reconnecting")
+                self._connected.clear()
+                self._writer = None
+                self._abandon_pending()
+                reader = await self._connect()
+                continue
+            if self.handler is not None:
+                try:
+                    await self.handler(event)
+                except Exception as e:
+                    logger.error("Backplane handler failed for %s: %s", event.get("kind"), e)
+            ref = event.get("ref")
+            if ref is not None:
+                future = self._pending.get(ref)
+                if future is not None and not future.done():
+                    future.set_result(event)
+
+    def _abandon_pending(self) -> None:
+        """Stop waiting for messages the lost broker may never relay.
+
+        Their publishers get back the events as sent, without sequence
+        numbers.
+        """
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Lost backplane broker connection"))
+
+    async def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        await self._connected.wait()
+        writer = self._writer
+        assert writer is not None
+        if event.get("kind") != EVENT_MESSAGE:
+            writer.write(encode_frame(event))
+            await writer.drain()
+            return event
+
+        self._next_ref += 1
+        ref = event["ref"] = f"{self.node_id}:{self._next_ref}"
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._pending[ref] = future
+        try:
+            writer.write(encode_frame(event))
+            await writer.drain()
+            try:
+                return await future
+            except ConnectionError:
+                return event
+        finally:
+            del self._pending[ref]
+
+    async def close(self) -> None:
+        self._closed = True
+        self._abandon_pending()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+        if self._writer is not None:
+            self._writer.close()
+        if self.broker is not None:
+            await self.broker.close()
+            self.broker = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
@@ -0,0 +1,336 @@
+"""Keyword-triggered demo bot and its background responder."""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BotRule:
+    """A keyword and the reply it triggers."""
+    keyword: str
+    response: str
+
+
+# Earlier rules win when a message contains several keywords
+DEFAULT_RULES: tuple[BotRule, ...] = (
+    BotRule("hello", "Hi there! 👋 Welcome to the WebSocket demo!"),
+    BotRule("hi", "Hello! Thanks for visiting 👋"),
+    BotRule("how are you", "I'm just a simple bot, but I'm working great! 🤖"),
+    BotRule("thanks", "You're welcome! 😊"),
+    BotRule("thank you", "Happy to help! 😊"),
+    BotRule(
+        "help",
+        "I'm a demo bot that responds to basic greetings. "
+        "Try saying 'hello', 'how are you', or 'what is websocket'!",
+    ),
+    BotRule(
+        "what is websocket",
+        "WebSockets provide full-duplex communication channels over a single TCP "
+        "connection. They enable real-time, bidirectional communication between "
+        "clients and servers! 🚀",
+    ),
+    BotRule(
+        "websocket",
+        "WebSockets are awesome for real-time applications! This chat is powered by them.",
+    ),
+    BotRule("bye", "Goodbye! Thanks for trying the demo! 👋"),
+    BotRule("good bye", "Goodbye! Thanks for trying the demo! 👋"),
+)
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a prioritized keyword list.
+
+    The automaton is built once and scans a message in a single pass, so the
+    cost per message depends on the message length rather than the number
+    of keywords. Each state records the best (lowest) priority among all
+    keywords ending there, including those reached through failure links.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        """Compile the automaton.
+
+        Args:
+            keywords: Lowercase keywords in priority order
+        """
+        keywords = list(keywords)
+        self._none = len(keywords)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._best: list[int] = [self._none]
+
+        for priority, keyword in enumerate(keywords):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(self._none)
+                state = next_state
+            self._best[state] = min(self._best[state], priority)
+
+        # Breadth-first pass to set failure links and inherit priorities
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                fail = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = fail
+                self._best[next_state] = min(self._best[next_state], self._best[fail])
+                queue.append(next_state)
+
+    def match(self, text: str) -> Optional[int]:
+        """Find the highest-priority keyword occurring in ``text``.
+
+        Args:
+            text: Lowercase text to scan
+
+        Returns:
+            Index of the matching keyword, or None if none occurs
+        """
+        goto = self._goto
+        fail = self._fail
+        best_at = self._best
+        best = self._none
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break
+        return best if best < self._none else None
+
+
+class BotRuleEngine:
+    """Matches messages against bot rules and returns the reply.
+
+    Rules come from ``DEFAULT_RULES`` or a JSON file containing a list of
+    ``{"keyword": ..., "response": ...}`` objects in priority order. When a
+    file is used, its modification time is checked at most once every
+    ``reload_interval`` seconds and the rules are recompiled if it changed;
+    a file that fails to load leaves the current rules in place.
+    """
+
+    def __init__(
+        self,
+        rules_path: Optional[str] = None,
+        reload_interval: float = 2.0,
+        rules: Iterable[BotRule] = DEFAULT_RULES,
+    ) -> None:
+        """Initialize the engine.
+
+        Args:
+            rules_path: Optional path to a JSON rules file
+            reload_interval: Minimum seconds between checks for file changes
+            rules: Rules used when no file is configured or it fails to load
+        """
+        self.rules_path = rules_path
+        self.reload_interval = reload_interval
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._compile(rules)
+        if rules_path:
+            self.reload()
+
+    def _compile(self, rules: Iterable[BotRule]) -> None:
+        self.rules = tuple(rules)
+        self._matcher = KeywordMatcher(rule.keyword.lower() for rule in self.rules)
+
+    @staticmethod
+    def load_rules(path: str) -> list[BotRule]:
+        """Load rules from a JSON file.
+
+        Args:
+            path: Path to the rules file
+
+        Returns:
+            Rules in file order
+
+        Raises:
+            ValueError: If the file is not a list of keyword/response objects
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("Bot rules file must contain a JSON list")
+        rules = []
+        for entry in data:
+            if not isinstance(entry, dict) or not entry.get("keyword") or "response" not in entry:
+                raise ValueError(f"Invalid bot rule: {entry!r}")
+            rules.append(BotRule(str(entry["keyword"]), str(entry["response"])))
+        return rules
+
+    def reload(self) -> bool:
+        """Reload rules from ``rules_path`` if the file changed.
+
+        Returns:
+            True if new rules were compiled
+        """
+        if not self.rules_path:
+            return False
+        try:
+            mtime = os.stat(self.rules_path).st_mtime
+        except OSError as e:
+            logger.error("Failed to stat bot rules file %s: %s", self.rules_path, e)
+            return False
+        if mtime == self._mtime:
+            return False
+
+        # Remember the mtime even on failure so a broken file is reported once
+        self._mtime = mtime
+        try:
+            rules = self.load_rules(self.rules_path)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to load bot rules from %s: %s", self.rules_path, e)
+            return False
+
+        self._compile(rules)
+        logger.info("Loaded %d bot rules from %s", len(rules), self.rules_path)
+        return True
+
+    def respond(self, message: str) -> Optional[str]:
+        """Get the bot reply for a message.
+
+        Args:
+            message: User message content
+
+        Returns:
+            Bot response string or None if no rule matches
+        """
+        if self.rules_path:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.reload_interval
+                self.reload()
+
+        index = self._matcher.match(message.lower())
+        return self.rules[index].response if index is not None else None
+
+
+@dataclass(frozen=True, slots=True)
+class PendingReply:
+    """A bot reply waiting to be delivered."""
+    client_id: str
+    content: str
+    # Loop time the triggering message was handled
+    scheduled_at: float = 0.0
+
+
+class BotResponder:
+    """Delivers bot replies after a delay without blocking the sender.
+
+    Replies are grouped into time buckets ``batch_window`` seconds wide.
+    Each bucket has a single ``loop.call_later`` timer, and all replies in a
+    bucket are handed to ``deliver`` together so they go out in one
+    broadcast. Pending replies can be cancelled per client (on disconnect)
+    or all at once (on shutdown).
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[list[PendingReply]], Coroutine[Any, Any, None]],
+        delay: float = 0.5,
+        batch_window: float = 0.05,
+    ) -> None:
+        """Initialize the responder.
+
+        Args:
+            deliver: Coroutine function that broadcasts a batch of replies
+            delay: Seconds between a message and the bot reply
+            batch_window: Width of the buckets replies are grouped into
+        """
+        self.deliver = deliver
+        self.delay = delay
+        self.batch_window = max(batch_window, 0.001)
+        self._buckets: Dict[int, list[PendingReply]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks: set["asyncio.Task[None]"] = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of replies waiting for their timer."""
+        return sum(len(replies) for replies in self._buckets.values())
+
+    def schedule(self, client_id: str, content: str) -> None:
+        """Schedule a reply; returns immediately.
+
+        Must be called from within the running event loop.
+
+        Args:
+            client_id: Client whose message triggered the reply
+            content: Reply text
+        """
+        loop = asyncio.get_running_loop()
+        bucket = math.ceil((loop.time() + self.delay) / self.batch_window)
+        replies = self._buckets.get(bucket)
+        if replies is None:
+            replies = self._buckets[bucket] = []
+            self._timers[bucket] = loop.call_at(
+                bucket * self.batch_window, self._fire, bucket
+            )
+        replies.append(PendingReply(client_id, content, loop.time()))
+
+    def _fire(self, bucket: int) -> None:
+        self._timers.pop(bucket, None)
+        replies = self._buckets.pop(bucket, None)
+        if not replies:
+            return
+        task: "asyncio.Task[None]" = asyncio.get_running_loop().create_task(
+            self.deliver(replies)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: "asyncio.Task[None]") -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to deliver bot replies: %s", task.exception())
+
+    def cancel_client(self, client_id: str) -> int:
+        """Drop pending replies triggered by a client.
+
+        Args:
+            client_id: Client identifier
+
+        Returns:
+            Number of replies dropped
+        """
+        dropped = 0
+        for bucket, replies in list(self._buckets.items()):
+            kept = [reply for reply in replies if reply.client_id != client_id]
+            dropped += len(replies) - len(kept)
+            if kept:
+                self._buckets[bucket] = kept
+            else:
+                del self._buckets[bucket]
+                self._timers.pop(bucket).cancel()
+        return dropped
+
+    async def shutdown(self) -> None:
+        """Cancel all pending timers and in-flight deliveries."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._buckets.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
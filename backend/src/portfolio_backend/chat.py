@@ -1,164 +1,1434 @@
 """Chat management with WebSocket support."""
 
 import asyncio
-import json
+import base64
+import collections
+import logging
+import math
+import os
+import random
+import sys
 import time
-import uuid
-from dataclasses import dataclass, asdict, field
-from typing import Optional, Dict, Any
-
-
-@dataclass
+from dataclasses import dataclass, field
+from typing import Optional, Deque, Dict, Any, Awaitable, Callable, Iterable
+
+from .backplane import (
+    EVENT_DIRECT,
+    EVENT_KICK,
+    EVENT_MESSAGE,
+    EVENT_NODE_DOWN,
+    EVENT_PRESENCE,
+    EVENT_SYNC,
+    EVENT_SYSTEM,
+    Backplane,
+    InProcessBackplane,
+)
+from .bot import BotResponder, BotRuleEngine, PendingReply
+from .codec import (
+    Frame,
+    compress_frame,
+    decode_message,
+    encode_binary_batch,
+    encode_message,
+    to_binary,
+)
+from .heartbeat import HeartbeatScheduler
+from .history import HistoryPageCache, MessageHistory
+from .historylog import RoomIndex, SegmentLog
+from .metrics import ChatMetrics
+from .outbound import (
+    OutboundQueue,
+    POLICY_DROP_OLDEST,
+    PUT_CLOSED,
+    PUT_DROPPED,
+    PUT_OVERFLOW,
+    PUT_QUEUED,
+)
+from .presence import PresenceChange, PresenceDebouncer
+
+logger = logging.getLogger(__name__)
+
+# Fan-out defaults used when no config is supplied
+DEFAULT_BROADCAST_CONCURRENCY = 100
+DEFAULT_SEND_TIMEOUT = 5.0
+
+# Outbound queue defaults; a high-water mark of 0 disables the queues
+DEFAULT_QUEUE_HIGH_WATER = 256
+DEFAULT_QUEUE_LOW_WATER = 64
+DEFAULT_SLOW_CONSUMER_CLOSE_CODE = 1013
+# Per-client batching of queued frames; a window of 0 disables it
+DEFAULT_BATCH_WINDOW = 0.0
+DEFAULT_BATCH_MAX_FRAMES = 64
+DEFAULT_BATCH_MAX_BYTES = 64 * 1024
+# Compression of large frames for clients that opt in; a threshold of 0
+# disables it
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_WINDOW_BITS = 15
+DEFAULT_COMPRESSION_MEM_LEVEL = 8
+
+# Heartbeat defaults; an interval of 0 disables server pings
+DEFAULT_HEARTBEAT_INTERVAL = 30.0
+DEFAULT_HEARTBEAT_TIMEOUT = 60.0
+DEFAULT_HEARTBEAT_TICK = 1.0
+# Application close code (4000-4999) for clients that stopped answering pings
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 4408
+# Application close codes for users kicked, or replaced by a newer
+# connection under the same username; clients should not reconnect
+KICK_CLOSE_CODE = 4403
+REPLACED_CLOSE_CODE = 4409
+
+# Shutdown: connections are closed as "going away" and told to reconnect
+# after a random delay in this range, so they do not all return at once
+GOING_AWAY_CLOSE_CODE = 1001
+DEFAULT_SHUTDOWN_TIMEOUT = 10.0
+DEFAULT_RECONNECT_DELAY_MIN = 1.0
+DEFAULT_RECONNECT_DELAY_MAX = 15.0
+
+# Rooms; state of a room without members is dropped after the TTL
+DEFAULT_ROOM = "general"
+DEFAULT_ROOM_TTL = 300.0
+
+# Presence updates are debounced per room; join/leave notices are skipped
+# in rooms larger than the notice limit (0 means no limit)
+DEFAULT_PRESENCE_INTERVAL = 0.25
+DEFAULT_PRESENCE_NOTICE_LIMIT = 100
+
+# Serialized /api/history pages kept, and messages per page
+DEFAULT_HISTORY_PAGE_CACHE_SIZE = 64
+DEFAULT_HISTORY_PAGE_SIZE = 50
+
+# Records read from the durable history log at a time
+LOG_READ_BATCH = 4096
+
+
+# JSON frames converted for binary (MessagePack) or compressing clients,
+# reused across recipients of the same broadcast and across joins for the
+# history frame
+BINARY_FRAME_CACHE_SIZE = 256
+
+
+def encode_batch(frames: list[str]) -> str:
+    """Pack encoded frames into a single ``batch`` frame.
+
+    The frames are already JSON, so they are joined rather than decoded
+    and re-encoded.
+    """
+    return '{"type":"batch","data":[' + ",".join(frames) + "]}"
+
+
+PING_FRAME = encode_message({"type": "ping"})
+
+
+def new_message_id() -> str:
+    """Return a random message ID.
+
+    96 random bits as 16 URL-safe base64 characters: as collision-resistant
+    for a chat log as a UUID4 (122 bits) in less than half the string, and
+    still an opaque string to clients.
+    """
+    return base64.urlsafe_b64encode(os.urandom(12)).decode("ascii")
+
+
+@dataclass(slots=True)
 class WebSocketConnectionMetadata:
     """Metadata for a WebSocket connection."""
     username: str = ""
     connected_at: float = 0.0
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    metadata: Optional[Dict[str, Any]] = None
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get metadata value."""
+        if self.metadata is None:
+            return default
         return self.metadata.get(key, default)
 
 
-@dataclass
+@dataclass(slots=True)
 class WebSocketConnection:
-    """Represents a WebSocket connection."""
+    """Represents a WebSocket connection.
+
+    Slotted, with the username and room as interned fields rather than a
+    per-connection dict, so tens of thousands of registered connections
+    stay within the budget checked by ``benchmarks/bench_memory.py``.
+    ``metadata`` is only allocated for callers that attach extra data.
+    """
     client_id: str
     websocket: Any
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    username: str = ""
+    room: str = DEFAULT_ROOM
+    connected_at: float = 0.0
+    metadata: Optional[Dict[str, Any]] = None
+    outbound: Optional[OutboundQueue] = None
+    writer: Optional["asyncio.Task[None]"] = None
+    degraded: bool = False
+    binary: bool = False
+    compressed: bool = False
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of frames waiting in the outbound queue."""
+        return self.outbound.depth if self.outbound is not None else 0
+
+
+@dataclass(slots=True)
+class ShutdownReport:
+    """Outcome of a graceful shutdown, keyed by client ID."""
+    closed: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    timed_out: list[str] = field(default_factory=list)
+
+    @property
+    def closed_count(self) -> int:
+        """Connections drained and closed cleanly."""
+        return len(self.closed)
+
+    @property
+    def failed_count(self) -> int:
+        """Connections whose flush or close failed."""
+        return len(self.failed)
+
+    @property
+    def timed_out_count(self) -> int:
+        """Connections still draining when the timeout expired."""
+        return len(self.timed_out)
+
+
+@dataclass(slots=True)
+class BroadcastReport:
+    """Outcome of a broadcast, keyed by client ID."""
+    delivered: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    timed_out: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
 
 
 class SimpleWebSocketConnectionManager:
-    """Simple WebSocket connection manager for development."""
+    """Simple WebSocket connection manager for development.
 
-    def __init__(self, config: Optional[Any] = None) -> None:
-        """Initialize connection manager."""
+    Besides the global registry, connections are sharded by room: each room
+    maps to the connections subscribed to it, so a room broadcast only
+    visits that room's members, and an index from client ID to its rooms
+    lets a disconnect leave every room it joined without scanning them.
+    A third index maps each username to its connections, so reaching a
+    user (a direct message, a kick) costs O(that user's connections).
+    """
+
+    def __init__(
+        self,
+        config: Optional[Any] = None,
+        on_evict: Optional[Callable[[WebSocketConnection], Awaitable[None]]] = None,
+        metrics: Optional[ChatMetrics] = None,
+    ) -> None:
+        """Initialize connection manager.
+
+        Args:
+            config: WebSocket configuration
+            on_evict: Optional callback invoked after a client is evicted
+                because a send to it failed or timed out
+            metrics: Instruments to record sends and connections in
+        """
         self.config = config
+        self.on_evict = on_evict
+        self.metrics = metrics or ChatMetrics()
+        self._register_gauges()
         self._connections: Dict[str, WebSocketConnection] = {}
+        self._rooms: Dict[str, Dict[str, WebSocketConnection]] = {}
+        self._client_rooms: Dict[str, set[str]] = {}
+        self._users: Dict[str, Dict[str, WebSocketConnection]] = {}
+        self._degraded: set[str] = set()
+        self._binary_frames: Dict[str, bytes] = {}
+        self._compressed_frames: Dict[str, bytes] = {}
+        # Background closes of evicted clients' sockets
+        self._evictions: set["asyncio.Task[None]"] = set()
+        self.broadcast_concurrency = max(
+            1, getattr(config, "broadcast_concurrency", DEFAULT_BROADCAST_CONCURRENCY)
+        )
+        self.send_timeout = getattr(config, "send_timeout", DEFAULT_SEND_TIMEOUT)
+        self.queue_high_water = getattr(config, "queue_high_water", DEFAULT_QUEUE_HIGH_WATER)
+        self.queue_low_water = getattr(config, "queue_low_water", DEFAULT_QUEUE_LOW_WATER)
+        self.overflow_policy = getattr(config, "overflow_policy", POLICY_DROP_OLDEST)
+        self.slow_consumer_close_code = getattr(
+            config, "slow_consumer_close_code", DEFAULT_SLOW_CONSUMER_CLOSE_CODE
+        )
+        self.batch_window = getattr(config, "batch_window", DEFAULT_BATCH_WINDOW)
+        self.batch_max_frames = max(
+            1, getattr(config, "batch_max_frames", DEFAULT_BATCH_MAX_FRAMES)
+        )
+        self.batch_max_bytes = getattr(config, "batch_max_bytes", DEFAULT_BATCH_MAX_BYTES)
+        self.compression_threshold = getattr(
+            config, "compression_threshold", DEFAULT_COMPRESSION_THRESHOLD
+        )
+        self.compression_level = getattr(config, "compression_level", DEFAULT_COMPRESSION_LEVEL)
+        self.compression_window_bits = getattr(
+            config, "compression_window_bits", DEFAULT_COMPRESSION_WINDOW_BITS
+        )
+        self.compression_mem_level = getattr(
+            config, "compression_mem_level", DEFAULT_COMPRESSION_MEM_LEVEL
+        )
+        self.reconnect_delay_min = getattr(
+            config, "reconnect_delay_min", DEFAULT_RECONNECT_DELAY_MIN
+        )
+        self.reconnect_delay_max = max(
+            self.reconnect_delay_min,
+            getattr(config, "reconnect_delay_max", DEFAULT_RECONNECT_DELAY_MAX),
+        )
+        # Cleared when a shutdown starts draining connections
+        self.accepting = True
+
+        self.heartbeat: Optional[HeartbeatScheduler] = None
+        heartbeat_interval = getattr(config, "heartbeat_interval", DEFAULT_HEARTBEAT_INTERVAL)
+        if heartbeat_interval > 0:
+            self.heartbeat = HeartbeatScheduler(
+                send_pings=self._send_pings,
+                evict=self._evict_unresponsive,
+                interval=heartbeat_interval,
+                timeout=getattr(config, "heartbeat_timeout", DEFAULT_HEARTBEAT_TIMEOUT),
+                tick=getattr(config, "heartbeat_tick", DEFAULT_HEARTBEAT_TICK),
+            )
+
+    def _register_gauges(self) -> None:
+        registry = self.metrics.registry
+        registry.gauge(
+            "chat_connections", "Open connections on this worker",
+            read=self.get_connection_count,
+        )
+        registry.gauge(
+            "chat_degraded_connections", "Connections admitted in degraded mode",
+            read=self.get_degraded_count,
+        )
+        registry.gauge(
+            "chat_outbound_queued_frames", "Frames waiting in all outbound queues",
+            read=lambda: sum(c.queue_depth for c in self._connections.values()),
+        )
+        registry.gauge(
+            "chat_outbound_queue_depth_max", "Deepest outbound queue",
+            read=lambda: max((c.queue_depth for c in self._connections.values()), default=0),
+        )
+
+    @property
+    def queued(self) -> bool:
+        """Whether sends go through per-connection outbound queues."""
+        return self.queue_high_water > 0
 
     async def start(self) -> None:
         """Start the manager."""
-        pass
+        if self.heartbeat is not None:
+            self.heartbeat.start()
 
     async def connect(
         self,
         client_id: str,
         websocket: Any,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        degraded: bool = False,
+        binary: bool = False,
+        compressed: bool = False,
+        username: str = "",
+        room: str = DEFAULT_ROOM,
     ) -> None:
-        """Connect a client."""
-        self._connections[client_id] = WebSocketConnection(
+        """Connect a client.
+
+        Args:
+            client_id: Client identifier
+            websocket: WebSocket connection
+            metadata: Optional extra connection data
+            degraded: Whether the client was admitted in degraded mode
+            binary: Whether the client negotiated MessagePack frames
+            compressed: Whether large JSON frames are sent compressed
+            username: Display name, interned so connections share one string
+            room: Room the client joins, interned likewise
+
+        Raises:
+            ConnectionRefusedError: If the manager is shutting down
+        """
+        if not self.accepting:
+            raise ConnectionRefusedError("Server is shutting down")
+        connection = WebSocketConnection(
             client_id=client_id,
             websocket=websocket,
-            metadata=metadata or {}
+            username=sys.intern(username),
+            room=sys.intern(room),
+            connected_at=time.time(),
+            metadata=metadata,
+            degraded=degraded,
+            binary=binary,
+            compressed=compressed,
         )
+        if degraded:
+            self._degraded.add(client_id)
+        if self.queued:
+            connection.outbound = OutboundQueue(
+                high_water=self.queue_high_water,
+                low_water=self.queue_low_water,
+                policy=self.overflow_policy,
+            )
+            connection.writer = asyncio.create_task(self._writer(connection))
+        self._connections[client_id] = connection
+        if connection.username:
+            self._users.setdefault(connection.username, {})[client_id] = connection
+        self.metrics.connections_opened.inc()
+        if self.heartbeat is not None:
+            self.heartbeat.track(client_id)
 
     async def disconnect(self, client_id: str) -> None:
         """Disconnect a client."""
-        if client_id in self._connections:
-            del self._connections[client_id]
+        connection = self._connections.pop(client_id, None)
+        if connection is not None:
+            self.metrics.connections_closed.inc()
+            self._release(connection)
+
+    def join_room(self, client_id: str, room: str) -> bool:
+        """Subscribe a connected client to a room.
+
+        Args:
+            client_id: Client identifier
+            room: Room name
+
+        Returns:
+            False if the client is not connected
+        """
+        connection = self._connections.get(client_id)
+        if connection is None:
+            return False
+        self._rooms.setdefault(room, {})[client_id] = connection
+        self._client_rooms.setdefault(client_id, set()).add(room)
+        return True
+
+    def leave_room(self, client_id: str, room: str) -> bool:
+        """Unsubscribe a client from a room.
+
+        Returns:
+            True if the client was a member
+        """
+        rooms = self._client_rooms.get(client_id)
+        if rooms is None or room not in rooms:
+            return False
+        rooms.discard(room)
+        if not rooms:
+            del self._client_rooms[client_id]
+        members = self._rooms[room]
+        del members[client_id]
+        if not members:
+            del self._rooms[room]
+        return True
+
+    def get_rooms(self, client_id: str) -> frozenset[str]:
+        """Get the rooms a client has joined."""
+        return frozenset(self._client_rooms.get(client_id, ()))
+
+    def get_room_count(self, room: str) -> int:
+        """Get the number of members of a room."""
+        return len(self._rooms.get(room, ()))
+
+    def get_room_counts(self) -> Dict[str, int]:
+        """Get the member count of every room with members."""
+        return {room: len(members) for room, members in self._rooms.items()}
+
+    def get_connection(self, client_id: str) -> Optional[WebSocketConnection]:
+        """Get a client's connection."""
+        return self._connections.get(client_id)
+
+    def get_user_client_ids(self, username: str) -> list[str]:
+        """Get the IDs of a user's connections."""
+        return list(self._users.get(username, ()))
+
+    def is_user_connected(self, username: str) -> bool:
+        """Whether a user has at least one connection."""
+        return username in self._users
+
+    def _release(self, connection: WebSocketConnection) -> None:
+        """Release a connection's rooms, heartbeat timer, outbound queue and writer."""
+        for room in list(self._client_rooms.get(connection.client_id, ())):
+            self.leave_room(connection.client_id, room)
+        connections = self._users.get(connection.username)
+        if connections is not None:
+            connections.pop(connection.client_id, None)
+            if not connections:
+                del self._users[connection.username]
+        self._degraded.discard(connection.client_id)
+        if self.heartbeat is not None:
+            self.heartbeat.untrack(connection.client_id)
+        if connection.outbound is not None:
+            connection.outbound.close()
+        writer = connection.writer
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    async def _writer(self, connection: WebSocketConnection) -> None:
+        """Drain a connection's outbound queue onto its socket.
+
+        With batching enabled, frames queued within ``batch_window`` of each
+        other are sent as one ``batch`` frame, so a busy chat costs one
+        write per window instead of one per event.
+        """
+        queue = connection.outbound
+        assert queue is not None
+        while True:
+            if self.batch_window > 0:
+                frames = await queue.get_batch(
+                    self.batch_max_frames, self.batch_max_bytes, self.batch_window
+                )
+                if not frames:
+                    return
+                frames = self._pack_batch(connection, frames)
+            else:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                frames = [frame]
+            try:
+                for frame in frames:
+                    await self._send_text(connection, frame)
+            except Exception as e:
+                # Counted rather than logged loudly: a wave of dropped
+                # clients would otherwise flood the log with one line each
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics.send_timeouts.inc()
+                else:
+                    self.metrics.send_failures.inc()
+                logger.debug("Error sending to client %s: %s", connection.client_id, e)
+                await self.evict(connection.client_id)
+                return
+
+    async def evict(
+        self,
+        client_id: str,
+        code: int = 1000,
+        reason: str = "",
+    ) -> Optional[WebSocketConnection]:
+        """Remove a client whose socket is no longer usable.
+
+        The socket is closed on a best-effort basis and ``on_evict`` is
+        notified so higher layers can announce the departure.
+
+        Args:
+            client_id: Client identifier
+            code: WebSocket close code sent to the client
+            reason: Optional close reason sent to the client
+
+        Returns:
+            The evicted connection, or None if it was already gone
+        """
+        connection = self._detach(client_id)
+        if connection is not None:
+            await self._close_evicted(connection, code, reason)
+        return connection
+
+    async def evict_many(
+        self,
+        client_ids: Iterable[str],
+        code: int = 1000,
+        reason: str = "",
+    ) -> None:
+        """Evict several clients, closing their sockets concurrently.
+
+        Args:
+            client_ids: Client identifiers
+            code: WebSocket close code sent to each client
+            reason: Optional close reason sent to each client
+        """
+        await asyncio.gather(
+            *(self.evict(client_id, code=code, reason=reason) for client_id in client_ids)
+        )
+
+    def evict_later(self, client_ids: Iterable[str], code: int = 1000, reason: str = "") -> None:
+        """Evict clients at once and close their sockets in the background.
+
+        The clients leave every room and index before this returns, so no
+        further frames are sent to them; closing the sockets, which may
+        take up to ``send_timeout`` each, happens concurrently in a task
+        that shutdown waits for.
+
+        Args:
+            client_ids: Client identifiers
+            code: WebSocket close code sent to each client
+            reason: Optional close reason sent to each client
+        """
+        connections = [
+            connection for connection in map(self._detach, client_ids) if connection is not None
+        ]
+        if not connections:
+            return
+        task = asyncio.create_task(self._close_all_evicted(connections, code, reason))
+        self._evictions.add(task)
+        task.add_done_callback(self._evictions.discard)
+
+    def _detach(self, client_id: str) -> Optional[WebSocketConnection]:
+        """Unregister an evicted client and release its resources."""
+        connection = self._connections.pop(client_id, None)
+        if connection is None:
+            return None
+        self.metrics.connections_evicted.inc()
+        self._release(connection)
+        return connection
+
+    async def _close_evicted(self, connection: WebSocketConnection, code: int, reason: str) -> None:
+        """Close an evicted client's socket and notify ``on_evict``."""
+        try:
+            close = (
+                connection.websocket.close(code=code, reason=reason) if reason
+                else connection.websocket.close(code=code)
+            )
+            await asyncio.wait_for(close, self.send_timeout)
+        except Exception:
+            pass
+
+        if self.on_evict is not None:
+            await self.on_evict(connection)
+
+    async def _close_all_evicted(
+        self,
+        connections: list[WebSocketConnection],
+        code: int,
+        reason: str,
+    ) -> None:
+        """Close evicted clients' sockets concurrently."""
+        results = await asyncio.gather(
+            *(self._close_evicted(connection, code, reason) for connection in connections),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error after evicting a client: %s", result)
+
+    async def _send_pings(self, client_ids: list[str]) -> None:
+        """Send one shared ping frame to a batch of clients."""
+        await self.broadcast_frames([PING_FRAME], client_ids=client_ids)
+
+    async def _evict_unresponsive(self, client_ids: list[str]) -> None:
+        """Evict clients that stopped answering pings."""
+        await self.evict_many(client_ids, code=HEARTBEAT_TIMEOUT_CLOSE_CODE)
+
+    async def _send_text(self, connection: WebSocketConnection, frame: Frame) -> None:
+        """Send a pre-encoded frame, bounded by the per-send timeout."""
+        if isinstance(frame, bytes):
+            send = connection.websocket.send_bytes(frame)
+        else:
+            send = connection.websocket.send_text(frame)
+        await asyncio.wait_for(send, self.send_timeout)
+
+    def _encode_for(self, connection: WebSocketConnection, frame: str) -> Frame:
+        """Return a JSON frame in the connection's wire format."""
+        if connection.binary:
+            binary = self._binary_frames.get(frame)
+            if binary is None:
+                if len(self._binary_frames) >= BINARY_FRAME_CACHE_SIZE:
+                    self._binary_frames.clear()
+                binary = self._binary_frames[frame] = to_binary(frame)
+            return binary
+        if connection.compressed and self._should_compress(frame):
+            compressed = self._compressed_frames.get(frame)
+            if compressed is None:
+                if len(self._compressed_frames) >= BINARY_FRAME_CACHE_SIZE:
+                    self._compressed_frames.clear()
+                compressed = self._compressed_frames[frame] = self._compress(frame)
+            return compressed
+        return frame
+
+    def _should_compress(self, frame: str) -> bool:
+        """Whether a frame is large enough to be worth compressing."""
+        # Length in characters; close enough to bytes for a threshold
+        return 0 < self.compression_threshold <= len(frame)
+
+    def _compress(self, frame: str) -> bytes:
+        """Compress a JSON frame with the configured settings."""
+        return compress_frame(
+            frame,
+            level=self.compression_level,
+            window_bits=self.compression_window_bits,
+            mem_level=self.compression_mem_level,
+        )
+
+    def _pack_batch(self, connection: WebSocketConnection, frames: list[Frame]) -> list[Frame]:
+        """Pack frames taken from an outbound queue into as few as possible.
+
+        Frames of binary clients are packed into one MessagePack batch.
+        For JSON clients, consecutive text frames are packed into a
+        ``batch`` frame (compressed if large enough), while frames that
+        were already compressed are sent on their own, in order.
+        """
+        if len(frames) == 1:
+            return frames
+        if connection.binary:
+            # Binary clients are only queued MessagePack frames
+            return [encode_binary_batch([
+                frame if isinstance(frame, bytes) else to_binary(frame) for frame in frames
+            ])]
+
+        packed: list[Frame] = []
+        run: list[str] = []
+        for frame in frames:
+            if isinstance(frame, str):
+                run.append(frame)
+                continue
+            if run:
+                packed.append(self._pack_run(connection, run))
+                run = []
+            packed.append(frame)
+        if run:
+            packed.append(self._pack_run(connection, run))
+        return packed
+
+    def _pack_run(self, connection: WebSocketConnection, frames: list[str]) -> Frame:
+        """Pack consecutive text frames, compressing the result if it is large."""
+        frame = frames[0] if len(frames) == 1 else encode_batch(frames)
+        if connection.compressed and self._should_compress(frame):
+            return self._compress(frame)
+        return frame
 
     async def broadcast(
         self,
         message: Dict[str, Any],
-        exclude_client: Optional[str] = None
+        exclude_client: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+        room: Optional[str] = None,
+    ) -> BroadcastReport:
+        """Broadcast message to all connected clients, or to a room.
+
+        The payload is encoded once. With outbound queues enabled the shared
+        frame is appended to every recipient's queue and this call never
+        waits on a socket; otherwise it is sent to every recipient
+        concurrently, with at most ``broadcast_concurrency`` sends in flight
+        and each send bounded by ``send_timeout``. Clients whose send fails,
+        times out or overflows a ``disconnect``-policy queue are evicted.
+
+        Args:
+            message: Payload to broadcast
+            exclude_client: Optional client to exclude
+            coalesce_key: Optional key under which superseded frames may be
+                collapsed by the ``coalesce`` overflow policy
+            room: Optional room to restrict the broadcast to
+
+        Returns:
+            Delivery report. In queued mode ``delivered`` lists clients whose
+            queue accepted the frame and ``dropped`` those that shed older
+            frames to make room.
+        """
+        return await self.broadcast_frames(
+            [encode_message(message)],
+            exclude_client=exclude_client,
+            coalesce_key=coalesce_key,
+            room=room,
+        )
+
+    async def broadcast_many(
+        self,
+        messages: list[Dict[str, Any]],
+        exclude_client: Optional[str] = None,
+        room: Optional[str] = None,
+    ) -> BroadcastReport:
+        """Broadcast several payloads in a single pass over the clients.
+
+        Each payload is encoded once and every recipient receives them in
+        order. See ``broadcast`` for delivery semantics.
+
+        Args:
+            messages: Payloads to broadcast
+            exclude_client: Optional client to exclude
+            room: Optional room to restrict the broadcast to
+
+        Returns:
+            Delivery report
+        """
+        return await self.broadcast_frames(
+            [encode_message(message) for message in messages],
+            exclude_client=exclude_client,
+            room=room,
+        )
+
+    async def broadcast_frames(
+        self,
+        frames: list[str],
+        exclude_client: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+        client_ids: Optional[Iterable[str]] = None,
+        room: Optional[str] = None,
+    ) -> BroadcastReport:
+        """Broadcast pre-encoded frames to connected clients.
+
+        Args:
+            frames: Encoded text frames, sent in order
+            exclude_client: Optional client to exclude
+            coalesce_key: Optional coalescing key applied to every frame
+            client_ids: Optional subset of clients to send to; takes
+                precedence over ``room``
+            room: Optional room whose members are sent to; defaults to
+                every connected client
+
+        Returns:
+            Delivery report
+        """
+        if client_ids is None:
+            connections = self._connections if room is None else self._rooms.get(room, {})
+            recipients = [
+                connection for client_id, connection in connections.items()
+                if client_id != exclude_client
+            ]
+        else:
+            recipients = [
+                connection for connection in map(self._connections.get, client_ids)
+                if connection is not None and connection.client_id != exclude_client
+            ]
+        report = BroadcastReport()
+        if not recipients or not frames:
+            return report
+
+        metrics = self.metrics
+        metrics.broadcast_recipients.observe(len(recipients))
+        started = time.perf_counter()
+        if self.queued:
+            self._enqueue(recipients, frames, coalesce_key, report)
+            metrics.broadcast_seconds.observe(time.perf_counter() - started)
+            return report
+
+        pending = iter(recipients)
+
+        async def worker() -> None:
+            # Workers share one iterator, so each recipient is sent to once
+            for connection in pending:
+                try:
+                    for frame in frames:
+                        await self._send_text(connection, self._encode_for(connection, frame))
+                except asyncio.TimeoutError:
+                    report.timed_out.append(connection.client_id)
+                except Exception as e:
+                    logger.debug("Error sending to client %s: %s", connection.client_id, e)
+                    report.failed.append(connection.client_id)
+                else:
+                    report.delivered.append(connection.client_id)
+
+        workers = min(self.broadcast_concurrency, len(recipients))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        metrics.broadcast_seconds.observe(time.perf_counter() - started)
+
+        # One summary per broadcast rather than a line per recipient
+        if report.failed or report.timed_out:
+            metrics.send_failures.inc(len(report.failed))
+            metrics.send_timeouts.inc(len(report.timed_out))
+            logger.warning(
+                "Broadcast to %d clients: %d failed, %d timed out",
+                len(recipients), len(report.failed), len(report.timed_out),
+                extra={"recipients": len(recipients), "failed": len(report.failed),
+                       "timed_out": len(report.timed_out)},
+            )
+
+        # Closing a stuck socket can take a full send timeout; do not hold
+        # the broadcast for it
+        self.evict_later(report.failed + report.timed_out)
+
+        return report
+
+    def _enqueue(
+        self,
+        recipients: list[WebSocketConnection],
+        frames: list[str],
+        coalesce_key: Optional[str],
+        report: BroadcastReport,
     ) -> None:
-        """Broadcast message to all connected clients."""
-        import logging
-        logger = logging.getLogger(__name__)
-        for client_id, connection in self._connections.items():
-            if exclude_client and client_id == exclude_client:
-                continue
-            try:
-                logger.info(f"Sending message to client {client_id}")
-                await connection.websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to client {client_id}: {e}")
+        """Append frames to each recipient's outbound queue."""
+        for connection in recipients:
+            assert connection.outbound is not None
+            dropped = False
+            for frame in frames:
+                result = connection.outbound.put(self._encode_for(connection, frame), coalesce_key)
+                if result == PUT_OVERFLOW or result == PUT_CLOSED:
+                    report.failed.append(connection.client_id)
+                    break
+                dropped = dropped or result == PUT_DROPPED
+            else:
+                report.delivered.append(connection.client_id)
+                if dropped:
+                    report.dropped.append(connection.client_id)
+
+        if report.failed:
+            self.metrics.send_overflows.inc(len(report.failed))
+            logger.warning(
+                "Evicting %d slow consumers", len(report.failed),
+                extra={"client_ids": report.failed[:10]},
+            )
+        # Producers never wait on a slow consumer, not even to close it
+        self.evict_later(report.failed, code=self.slow_consumer_close_code)
 
     async def send_to_client(
         self,
         client_id: str,
         message: Dict[str, Any]
-    ) -> None:
-        """Send message to a specific client."""
-        if client_id in self._connections:
-            try:
-                await self._connections[client_id].websocket.send_json(message)
-            except Exception:
-                pass
+    ) -> bool:
+        """Send message to a specific client.
+
+        Returns:
+            True if the message was delivered
+        """
+        return await self.send_frame(client_id, encode_message(message))
+
+    async def send_frame(self, client_id: str, frame: str) -> bool:
+        """Send a pre-encoded frame to a specific client.
+
+        Args:
+            client_id: Client identifier
+            frame: Encoded text frame
+
+        Returns:
+            True if the frame was delivered (or queued for delivery)
+        """
+        connection = self._connections.get(client_id)
+        if connection is None:
+            return False
+        encoded = self._encode_for(connection, frame)
+
+        if connection.outbound is not None:
+            result = connection.outbound.put(encoded)
+            if result == PUT_OVERFLOW:
+                self.metrics.send_overflows.inc()
+                self.evict_later([client_id], code=self.slow_consumer_close_code)
+            return result == PUT_QUEUED or result == PUT_DROPPED
+
+        try:
+            await self._send_text(connection, encoded)
+        except asyncio.TimeoutError:
+            self.metrics.send_timeouts.inc()
+            await self.evict(client_id)
+            return False
+        except Exception:
+            self.metrics.send_failures.inc()
+            await self.evict(client_id)
+            return False
+        return True
 
     def get_connection_count(self) -> int:
         """Get number of active connections."""
         return len(self._connections)
 
+    def get_degraded_count(self) -> int:
+        """Get number of connections admitted in degraded mode."""
+        return len(self._degraded)
+
+    def iter_normal_client_ids(self, room: Optional[str] = None) -> Iterable[str]:
+        """Iterate over the clients that are not in degraded mode.
+
+        Args:
+            room: Optional room to restrict the clients to
+        """
+        degraded = self._degraded
+        connections = self._connections if room is None else self._rooms.get(room, {})
+        return (client_id for client_id in connections if client_id not in degraded)
+
+    def get_queue_depths(self) -> Dict[str, int]:
+        """Get outbound queue depth per client."""
+        return {
+            client_id: connection.queue_depth
+            for client_id, connection in self._connections.items()
+        }
+
     async def handle_pong(self, client_id: str) -> None:
         """Handle pong message from client."""
-        pass
+        if self.heartbeat is not None:
+            self.heartbeat.touch(client_id)
 
-    async def graceful_shutdown(self, timeout: float = 30.0):
-        """Gracefully shutdown all connections."""
-        # Simple shutdown report
-        @dataclass
-        class ShutdownReport:
-            closed_count: int = 0
-            failed_count: int = 0
+    def reconnect_hint(self) -> float:
+        """Random delay, in seconds, for a client to wait before reconnecting."""
+        return round(random.uniform(self.reconnect_delay_min, self.reconnect_delay_max), 1)
+
+    async def graceful_shutdown(
+        self,
+        timeout: float = DEFAULT_SHUTDOWN_TIMEOUT,
+        code: int = GOING_AWAY_CLOSE_CODE,
+    ) -> ShutdownReport:
+        """Drain and close every connection.
+
+        New connections are refused and the heartbeat stops. Then all
+        connections are drained concurrently: each is sent a ``reconnect``
+        frame with a jittered ``retry_after`` behind the frames already
+        queued for it, its queue is flushed and its socket closed with
+        ``code``. Departures are not announced. Connections not closed
+        within ``timeout`` are dropped without waiting further.
 
-        return ShutdownReport(closed_count=len(self._connections), failed_count=0)
+        Args:
+            timeout: Seconds allowed for the whole drain
+            code: WebSocket close code sent to each client
 
+        Returns:
+            Which clients were closed, failed or timed out
+        """
+        self.accepting = False
+        self.on_evict = None
+        if self.heartbeat is not None:
+            await self.heartbeat.stop()
+
+        report = ShutdownReport()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._connections:
+            tasks = {
+                asyncio.create_task(self._drain(connection, code)): connection
+                for connection in list(self._connections.values())
+            }
+            done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+            for task in done:
+                closed = not task.cancelled() and task.exception() is None and task.result()
+                (report.closed if closed else report.failed).append(tasks[task].client_id)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in pending:
+                connection = tasks[task]
+                report.timed_out.append(connection.client_id)
+                if self._connections.pop(connection.client_id, None) is not None:
+                    self.metrics.connections_evicted.inc()
+                    self._release(connection)
+        if self._evictions:
+            await asyncio.wait(self._evictions, timeout=max(0.0, deadline - loop.time()))
+        return report
+
+    async def _drain(self, connection: WebSocketConnection, code: int) -> bool:
+        """Flush a connection's queue, then close it with a reconnect hint.
 
-@dataclass
+        Returns:
+            True if the connection was closed cleanly
+        """
+        retry_after = self.reconnect_hint()
+        notice = self._encode_for(
+            connection, encode_message({"type": "reconnect", "retry_after": retry_after})
+        )
+        try:
+            if connection.outbound is not None:
+                connection.outbound.put(notice)
+                connection.outbound.close(drain=True)
+                if connection.writer is not None:
+                    # Returns once the queue is empty; a failed send evicts
+                    await connection.writer
+                if self._connections.get(connection.client_id) is not connection:
+                    return False
+            else:
+                await self._send_text(connection, notice)
+            await asyncio.wait_for(
+                connection.websocket.close(
+                    code=code, reason=f"retry-after={math.ceil(retry_after)}"
+                ),
+                self.send_timeout,
+            )
+            return True
+        except Exception as e:
+            logger.debug("Error draining client %s: %s", connection.client_id, e)
+            return False
+        finally:
+            if self._connections.pop(connection.client_id, None) is not None:
+                self.metrics.connections_closed.inc()
+                self._release(connection)
+
+
+@dataclass(slots=True)
 class ChatMessage:
-    """Represents a chat message."""
+    """Represents a chat message.
+
+    Slotted so a history of tens of thousands of messages carries no
+    per-instance ``__dict__``; usernames and rooms of messages decoded
+    from the wire are interned by ``from_dict``.
+    """
 
     id: str
     username: str
     content: str
     timestamp: float
+    seq: int = 0
+    room: str = DEFAULT_ROOM
 
     def to_dict(self) -> dict:
-        """Convert to dictionary."""
-        return asdict(self)
+        """Convert to dictionary.
+
+        Built field by field rather than with ``dataclasses.asdict``, which
+        deep-copies recursively.
+        """
+        return {
+            "id": self.id,
+            "username": self.username,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "seq": self.seq,
+            "room": self.room,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChatMessage":
+        """Build a message from ``to_dict`` output, interning repeated strings.
+
+        Args:
+            data: Message dictionary, e.g. from the backplane or history log
+
+        Returns:
+            The message
+        """
+        return cls(
+            id=data["id"],
+            username=sys.intern(data["username"]),
+            content=data["content"],
+            timestamp=data["timestamp"],
+            seq=data.get("seq", 0),
+            room=sys.intern(data.get("room", DEFAULT_ROOM)),
+        )
+
+
+@dataclass(slots=True)
+class ChatRoom:
+    """Per-room chat state held by a worker.
+
+    Attributes:
+        name: Room name
+        history: The room's message history
+        last_active: Monotonic time of the last join, leave or message
+        user_count_updates: User count broadcasts so far, for sampling
+        last_count: User count last broadcast (-1 before the first)
+    """
+    name: str
+    history: MessageHistory
+    last_active: float = field(default_factory=time.monotonic)
+    user_count_updates: int = 0
+    last_count: int = -1
 
 
 class ChatManager:
-    """Manages chat connections and message broadcasting."""
+    """Manages chat rooms, connections and message broadcasting.
+
+    Chat messages, system notices and user counts are published on a
+    ``Backplane`` and applied locally when they come back, so with several
+    workers every worker stores the same history and clients connected to
+    any of them see the same messages and the same total user count.
 
-    def __init__(self, config: Optional[Any] = None) -> None:
+    Each room has its own history buffer and user count. Room state is
+    created on first use and dropped lazily once the room has had no
+    members on any worker and no messages for ``room_ttl`` seconds, so
+    memory follows the active rooms rather than every room ever used.
+
+    Joins and leaves are debounced: each worker publishes its changed room
+    counts at most once per ``presence_interval``, and each room's members
+    get at most one ``user_count`` summary per interval, only when the
+    count actually changed.
+    """
+
+    def __init__(
+        self,
+        config: Optional[Any] = None,
+        history_size: int = 100,
+        history_replay_size: int = 50,
+        degraded_user_count_every: int = 10,
+        bot: Optional[BotRuleEngine] = None,
+        bot_reply_delay: float = 0.5,
+        bot_reply_batch_window: float = 0.05,
+        backplane: Optional[Backplane] = None,
+        history_log: Optional[SegmentLog] = None,
+        room_ttl: float = DEFAULT_ROOM_TTL,
+        presence_interval: float = DEFAULT_PRESENCE_INTERVAL,
+        presence_notice_limit: int = DEFAULT_PRESENCE_NOTICE_LIMIT,
+        metrics: Optional[ChatMetrics] = None,
+        history_page_cache_size: int = DEFAULT_HISTORY_PAGE_CACHE_SIZE,
+    ) -> None:
         """Initialize chat manager.
 
         Args:
             config: WebSocket configuration
+            history_size: Number of messages kept in each room's history
+            history_replay_size: Number of messages sent to joining clients
+            degraded_user_count_every: Degraded clients receive only every
+                Nth user count update
+            bot: Bot rule engine (defaults to the built-in rules)
+            bot_reply_delay: Seconds before the bot replies
+            bot_reply_batch_window: Bot replies due within this window are
+                broadcast together
+            backplane: Pub/sub backplane shared with other workers (defaults
+                to a single-process one)
+            history_log: Optional durable log every stored message is
+                appended to
+            room_ttl: Seconds an idle room without members keeps its state
+            presence_interval: Seconds over which joins, leaves and user
+                counts are aggregated (0 sends every change at once)
+            presence_notice_limit: Rooms with more users than this get no
+                individual join/leave notices (0 for no limit)
+            metrics: Instruments shared with the connection manager
+            history_page_cache_size: Serialized history pages kept for
+                ``history_page`` (0 disables the cache)
+        """
+        self.ws_manager = SimpleWebSocketConnectionManager(
+            config, on_evict=self._on_evict, metrics=metrics
+        )
+        self.metrics = self.ws_manager.metrics
+        self.history_size = history_size
+        self.history_replay_size = history_replay_size
+        self.rooms: Dict[str, ChatRoom] = {}
+        self.history_pages = HistoryPageCache(history_page_cache_size)
+        self.room_ttl = room_ttl
+        self._next_sweep = time.monotonic() + room_ttl
+        # Highest sequence number stored in any room
+        self._last_seq = 0
+        self.degraded_user_count_every = max(1, degraded_user_count_every)
+        self.bot = bot or BotRuleEngine()
+        self.bot_responder = BotResponder(
+            self._deliver_bot_replies,
+            delay=bot_reply_delay,
+            batch_window=bot_reply_batch_window,
+        )
+        self.backplane = backplane or InProcessBackplane(history_size=history_size)
+        # Latest per-room connection counts reported by each other worker
+        self._node_counts: Dict[str, Dict[str, int]] = {}
+        self.history_log = history_log
+        # Each room's records in the durable log, for pages older than memory
+        self.log_index = RoomIndex()
+        self.presence_notice_limit = presence_notice_limit
+        # Local changes waiting to be published, and changes from every
+        # worker waiting to be broadcast to local members
+        self._presence_out = PresenceDebouncer(self._publish_presence, presence_interval)
+        self._presence_in = PresenceDebouncer(self._broadcast_presence, presence_interval)
+        self._shutdown: Optional["asyncio.Future[ShutdownReport]"] = None
+        registry = self.metrics.registry
+        registry.gauge(
+            "chat_rooms", "Rooms with state on this worker", read=lambda: len(self.rooms)
+        )
+        registry.counter(
+            "chat_history_page_cache_total", "History page lookups in the page cache",
+            labels={"result": "hit"}, read=lambda: self.history_pages.hits,
+        )
+        registry.counter(
+            "chat_history_page_cache_total", "History page lookups in the page cache",
+            labels={"result": "miss"}, read=lambda: self.history_pages.misses,
+        )
+        registry.gauge(
+            "chat_bot_pending_replies", "Bot replies waiting for their timer",
+            read=lambda: self.bot_responder.pending,
+        )
+
+    @property
+    def message_history(self) -> MessageHistory:
+        """History of the default room."""
+        return self.get_room(DEFAULT_ROOM).history
+
+    def get_room(self, name: str) -> ChatRoom:
+        """Get a room's state, creating it if needed.
+
+        Also drops expired rooms, at most once per ``room_ttl``.
+
+        Args:
+            name: Room name
+
+        Returns:
+            The room
         """
-        self.ws_manager = SimpleWebSocketConnectionManager(config)
-        self.message_history: list[ChatMessage] = []
-        self.max_history_size = 100
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.room_ttl
+            self._sweep_rooms(now)
+
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = ChatRoom(
+                name=name,
+                history=MessageHistory(
+                    capacity=self.history_size,
+                    replay_size=self.history_replay_size,
+                    encoder=encode_message,
+                ),
+            )
+        return room
+
+    def _sweep_rooms(self, now: float) -> int:
+        """Drop rooms that have been idle and empty for ``room_ttl``.
+
+        A room counts as empty only when it has no members on any worker,
+        so a quiet room kept alive elsewhere keeps its history here too.
+
+        Returns:
+            Number of rooms dropped
+        """
+        expired = [
+            name for name, room in self.rooms.items()
+            if now - room.last_active >= self.room_ttl and not self.get_user_count(name)
+        ]
+        for name in expired:
+            del self.rooms[name]
+            self.history_pages.invalidate(name)
+        return len(expired)
+
+    async def recover_history(self) -> int:
+        """Open the history log and reload each room's newest messages from it.
+
+        Recovery scans the segment files in a worker thread and truncates a
+        torn tail left by a crash. Call before ``start`` so the backplane
+        continues the recovered sequence.
+
+        Returns:
+            Number of messages in the log after recovery
+        """
+        log = self.history_log
+        if log is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        recovered = await loop.run_in_executor(None, log.open)
+        recent = await loop.run_in_executor(None, self._read_recent, log)
+        for room, messages in recent.items():
+            history = self.get_room(room).history
+            if history.restore(messages):
+                self._last_seq = max(self._last_seq, history.last_seq)
+        return recovered
+
+    def _read_recent(self, log: SegmentLog) -> Dict[str, Deque[ChatMessage]]:
+        """Read the newest ``history_size`` messages of every room in a log.
+
+        The whole log is read, since a quiet room's last messages may be
+        its oldest records; ``log_index`` is filled on the way. Safe to run
+        in a worker thread before the manager starts.
+
+        Returns:
+            Messages per room, oldest first
+        """
+        recent: Dict[str, Deque[ChatMessage]] = {}
+        seq = log.first_seq
+        while seq and seq <= log.last_seq:
+            batch = log.read(seq, LOG_READ_BATCH)
+            if not batch:
+                break
+            for payload in batch:
+                message = ChatMessage.from_dict(decode_message(payload))
+                messages = recent.get(message.room)
+                if messages is None:
+                    messages = recent[message.room] = collections.deque(
+                        maxlen=self.history_size
+                    )
+                messages.append(message)
+                self.log_index.add(message.room, message.seq)
+            seq = message.seq + 1
+        return recent
 
     async def start(self) -> None:
-        """Start the chat manager."""
+        """Start the chat manager and subscribe to the backplane."""
         await self.ws_manager.start()
+        if self.history_log is not None:
+            self.history_log.start()
+        self._presence_out.start()
+        self._presence_in.start()
+        await self.backplane.start(self._on_backplane_event, hello=self._backplane_hello)
+
+    def _backplane_hello(self) -> Dict[str, Any]:
+        """Describe this worker so a new broker can continue its sequence."""
+        messages = sorted(
+            (msg for room in self.rooms.values() for msg in room.history),
+            key=lambda msg: msg.seq,
+        )
+        return {
+            "last_seq": self._last_seq,
+            "messages": [msg.to_dict() for msg in messages[-self.history_size:]],
+            "counts": self.ws_manager.get_room_counts(),
+        }
+
+    async def _on_backplane_event(self, event: Dict[str, Any]) -> None:
+        """Apply an event delivered by the backplane.
 
-    async def connect(self, client_id: str, websocket, username: str) -> None:
+        Args:
+            event: Backplane event
+        """
+        kind = event.get("kind")
+        if kind == EVENT_MESSAGE:
+            await self._apply_messages(event["messages"])
+        elif kind == EVENT_SYSTEM:
+            payload = {"type": "system", "data": event["message"]}
+            await self.ws_manager.broadcast(
+                payload,
+                exclude_client=event.get("exclude_client"),
+                room=event["message"]["room"],
+            )
+        elif kind == EVENT_DIRECT:
+            await self._deliver_direct_message(event["message"])
+        elif kind == EVENT_KICK:
+            exclude = event.get("exclude_client")
+            await self.ws_manager.evict_many(
+                [
+                    client_id
+                    for client_id in self.ws_manager.get_user_client_ids(event["username"])
+                    if client_id != exclude
+                ],
+                code=event["code"],
+                reason=event["reason"],
+            )
+        elif kind == EVENT_PRESENCE:
+            if event["node"] != self.backplane.node_id:
+                counts = self._node_counts.setdefault(event["node"], {})
+                for room, count in event["counts"].items():
+                    if count:
+                        counts[room] = count
+                    else:
+                        counts.pop(room, None)
+            changes = event.get("changes", {})
+            for room in event["counts"]:
+                joined, left = changes.get(room, (0, 0))
+                await self._presence_in.record(room, joined, left)
+        elif kind == EVENT_NODE_DOWN:
+            node_counts = self._node_counts.pop(event["node"], None)
+            for room in node_counts or ():
+                await self._presence_in.record(room)
+        elif kind == EVENT_SYNC:
+            for data in event["messages"]:
+                self._store(ChatMessage.from_dict(data))
+            self._node_counts = {
+                node: dict(counts)
+                for node, counts in event["presence"].items()
+                if node != self.backplane.node_id
+            }
+
+    async def connect(
+        self,
+        client_id: str,
+        websocket: Any,
+        username: str,
+        since: Optional[str] = None,
+        degraded: bool = False,
+        room: str = DEFAULT_ROOM,
+        binary: bool = False,
+        compressed: bool = False,
+    ) -> None:
         """Register a new chat connection.
 
         Args:
             client_id: Unique client identifier
             websocket: WebSocket connection
             username: Username for chat
+            since: Optional history cursor (sequence number or message ID)
+                of the last message the client has seen
+            degraded: Admitted under load: no history replay and sampled
+                user counts
+            room: Room to join
+            binary: Whether the client negotiated MessagePack frames
+            compressed: Whether the client accepts compressed binary frames
         """
         await self.ws_manager.connect(
             client_id,
             websocket,
-            metadata={"username": username, "connected_at": time.time()}
+            username=username,
+            room=room,
+            degraded=degraded,
+            binary=binary,
+            compressed=compressed,
         )
+        self.ws_manager.join_room(client_id, room)
+        self.get_room(room).last_active = time.monotonic()
+
+        # Send chat history to new user (skipped for degraded clients)
+        if not degraded:
+            await self.send_history(client_id, since=since, room=room)
 
-        # Send chat history to new user
-        await self.send_history(client_id)
+        # The next summary may be a tick away, so the new user gets the
+        # current count now
+        if self._presence_out.interval > 0:
+            await self.ws_manager.send_to_client(client_id, {
+                "type": "user_count",
+                "data": {"count": self.get_user_count(room)},
+            })
 
         # Notify others of new user
-        await self.broadcast_system_message(
-            f"{username} joined the chat",
-            exclude_client=client_id
-        )
+        if self._should_announce(room):
+            await self.broadcast_system_message(
+                f"{username} joined the chat",
+                exclude_client=client_id,
+                room=room,
+            )
+        await self._presence_out.record(room, joined=1)
 
     async def disconnect(self, client_id: str) -> None:
         """Disconnect a client.
@@ -167,15 +1437,37 @@ class ChatManager:
             client_id: Client identifier
         """
         # Get username before disconnecting
-        connections = self.ws_manager._connections
-        username = "Unknown"
-        if client_id in connections:
-            username = connections[client_id].metadata.get("username", "Unknown")
+        connection = self.ws_manager.get_connection(client_id)
+        if connection is None:
+            # Already evicted; the departure was announced by _on_evict
+            return
 
+        self.bot_responder.cancel_client(client_id)
         await self.ws_manager.disconnect(client_id)
+        await self._announce_departure(connection)
+
+    async def _on_evict(self, connection: WebSocketConnection) -> None:
+        """Announce a client that was evicted after a failed send.
 
-        # Notify others of user leaving
-        await self.broadcast_system_message(f"{username} left the chat")
+        Args:
+            connection: The evicted connection
+        """
+        self.bot_responder.cancel_client(connection.client_id)
+        await self._announce_departure(connection)
+
+    async def _announce_departure(self, connection: WebSocketConnection) -> None:
+        """Tell a departed client's room that it left."""
+        username = connection.username or "Unknown"
+        room = connection.room
+        self.get_room(room).last_active = time.monotonic()
+        if self._should_announce(room):
+            await self.broadcast_system_message(f"{username} left the chat", room=room)
+        await self._presence_out.record(room, left=1)
+
+    def _should_announce(self, room: str) -> bool:
+        """Whether a room is small enough for individual join/leave notices."""
+        limit = self.presence_notice_limit
+        return limit <= 0 or self.get_user_count(room) <= limit
 
     def _get_bot_response(self, message: str) -> Optional[str]:
         """Generate bot response based on message content.
@@ -186,32 +1478,14 @@ class ChatManager:
         Returns:
             Bot response string or None if no match
         """
-        message_lower = message.lower()
-
-        responses = {
-            "hello": "Hi there! 👋 Welcome to the WebSocket demo!",
-            "hi": "Hello! Thanks for visiting 👋",
-            "how are you": "I'm just a simple bot, but I'm working great! 🤖",
-            "thanks": "You're welcome! 😊",
-            "thank you": "Happy to help! 😊",
-            "help": "I'm a demo bot that responds to basic greetings. Try saying 'hello', 'how are you', or 'what is websocket'!",
-            "what is websocket": "WebSockets provide full-duplex communication channels over a single TCP connection. They enable real-time, bidirectional communication between clients and servers! 🚀",
-            "websocket": "WebSockets are awesome for real-time applications! This chat is powered by them.",
-            "bye": "Goodbye! Thanks for trying the demo! 👋",
-            "good bye": "Goodbye! Thanks for trying the demo! 👋",
-        }
-
-        for keyword, response in responses.items():
-            if keyword in message_lower:
-                return response
-
-        return None
+        return self.bot.respond(message)
 
     async def send_message(
         self,
         client_id: str,
         username: str,
         content: str,
+        room: str = DEFAULT_ROOM,
     ) -> Optional[ChatMessage]:
         """Send a chat message.
 
@@ -219,127 +1493,521 @@ class ChatManager:
             client_id: Client identifier
             username: Username
             content: Message content (already sanitized)
+            room: Room the message is sent to
 
         Returns:
             ChatMessage if successful, None otherwise
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         message = ChatMessage(
-            id=str(uuid.uuid4()),
+            id=new_message_id(),
             username=username,
             content=content,
-            timestamp=time.time()
+            timestamp=time.time(),
+            room=room,
         )
 
-        # Add to history
-        self.message_history.append(message)
-
-        # Trim history if too large
-        if len(self.message_history) > self.max_history_size:
-            self.message_history = self.message_history[-self.max_history_size:]
-
-        # Broadcast message
-        logger.info(f"[SEND_MESSAGE] About to broadcast message from {username}: {content}")
-        logger.info(f"[SEND_MESSAGE] Connection count before broadcast: {len(self.ws_manager._connections)}")
+        # Store and broadcast on every worker
         await self.broadcast_message(message)
-        logger.info(f"[SEND_MESSAGE] Broadcast complete")
 
-        # Generate and broadcast bot response if triggered
+        # Schedule a bot reply if triggered; it is delivered in the background
+        # after a short delay so the sender's receive loop is not held up
         bot_response = self._get_bot_response(content)
         if bot_response:
-            await asyncio.sleep(0.5)  # Small delay to feel more natural
+            self.bot_responder.schedule(client_id, bot_response)
+
+        return message
+
+    def is_user_online(self, username: str) -> bool:
+        """Whether a user has a connection on this worker.
+
+        Args:
+            username: Username
+
+        Returns:
+            True if connected here; users on other workers are not known
+        """
+        return self.ws_manager.is_user_connected(username)
+
+    async def send_direct_message(self, username: str, to: str, content: str) -> Dict[str, Any]:
+        """Send a direct message to every connection of a user.
+
+        The message is published to every worker, and each delivers it to
+        its own connections of the recipient and of the sender (so the
+        sender's other tabs see it too), found through the username index.
+        Direct messages are not stored in any room's history.
+
+        Args:
+            username: Sender's username
+            to: Recipient's username
+            content: Sanitized message content
+
+        Returns:
+            The message as delivered
+        """
+        message = {
+            "id": new_message_id(),
+            "username": username,
+            "to": to,
+            "content": content,
+            "timestamp": time.time(),
+        }
+        self.metrics.direct_messages.inc()
+        await self.backplane.publish({"kind": EVENT_DIRECT, "message": message})
+        return message
+
+    async def _deliver_direct_message(self, message: Dict[str, Any]) -> None:
+        """Send a direct message to the local connections of its two users."""
+        ws_manager = self.ws_manager
+        client_ids = ws_manager.get_user_client_ids(message["to"])
+        if message["username"] != message["to"]:
+            client_ids += ws_manager.get_user_client_ids(message["username"])
+        if client_ids:
+            await ws_manager.broadcast_frames(
+                [encode_message({"type": "dm", "data": message})], client_ids=client_ids
+            )
+
+    async def kick_user(
+        self,
+        username: str,
+        code: int = KICK_CLOSE_CODE,
+        reason: str = "Kicked",
+        exclude_client: Optional[str] = None,
+    ) -> None:
+        """Close every connection of a user, on every worker.
+
+        Each connection is found through the username index, closed with
+        ``code`` and announced as a departure. The kick is applied when
+        the backplane delivers it, which may be after this returns and
+        after the user has connected again; that connection can be
+        spared with ``exclude_client``.
+
+        Args:
+            username: Username
+            code: WebSocket close code
+            reason: Close reason sent to the clients
+            exclude_client: Client ID whose connection is kept open
+        """
+        await self.backplane.publish({
+            "kind": EVENT_KICK, "username": username, "code": code, "reason": reason,
+            "exclude_client": exclude_client,
+        })
+
+    async def _deliver_bot_replies(self, replies: list[PendingReply]) -> None:
+        """Store and broadcast a batch of bot replies.
+
+        Each reply goes to the room of the client that triggered it.
+
+        Args:
+            replies: Replies that came due together
+        """
+        bot_messages = []
+        now = asyncio.get_running_loop().time()
+        for reply in replies:
+            self.metrics.bot_reply_seconds.observe(now - reply.scheduled_at)
+            connection = self.ws_manager.get_connection(reply.client_id)
+            if connection is None:
+                continue
             bot_message = ChatMessage(
-                id=str(uuid.uuid4()),
+                id=new_message_id(),
                 username="Bot",
-                content=bot_response,
-                timestamp=time.time()
+                content=reply.content,
+                timestamp=time.time(),
+                room=connection.room,
             )
-            self.message_history.append(bot_message)
-            await self.broadcast_message(bot_message)
-            logger.info(f"[BOT_RESPONSE] Bot responded to message from {username}")
+            bot_messages.append(bot_message)
 
-        return message
+        if bot_messages:
+            await self._publish_messages(bot_messages)
+        logger.debug("Bot sent %d replies", len(bot_messages), extra={"replies": len(bot_messages)})
 
     async def broadcast_message(self, message: ChatMessage) -> None:
-        """Broadcast a chat message to all clients.
+        """Store and broadcast a chat message in its room on every worker.
 
         Args:
             message: Message to broadcast
         """
-        import logging
-        logger = logging.getLogger(__name__)
+        await self._publish_messages([message])
 
-        payload = {
-            "type": "message",
-            "data": message.to_dict()
-        }
+    async def _publish_messages(self, messages: list[ChatMessage]) -> None:
+        """Publish chat messages; the backplane assigns their sequence numbers.
+
+        Args:
+            messages: Messages to publish together
+        """
+        data = [message.to_dict() for message in messages]
+        event = await self.backplane.publish({"kind": EVENT_MESSAGE, "messages": data})
+        for message, stamped in zip(messages, event["messages"]):
+            message.seq = stamped.get("seq", 0)
+
+    async def _apply_messages(self, messages: list[Dict[str, Any]]) -> None:
+        """Store messages from the backplane and broadcast them to local clients.
+
+        Args:
+            messages: Message dictionaries carrying their sequence numbers
+        """
+        payloads: Dict[str, list[Dict[str, Any]]] = {}
+        for data in messages:
+            message = ChatMessage.from_dict(data)
+            if self._store(message):
+                payloads.setdefault(message.room, []).append(
+                    {"type": "message", "data": message.to_dict()}
+                )
+
+        for room, room_payloads in payloads.items():
+            if len(room_payloads) == 1:
+                await self.ws_manager.broadcast(room_payloads[0], room=room)
+            else:
+                await self.ws_manager.broadcast_many(room_payloads, room=room)
+
+    def _store(self, message: ChatMessage) -> bool:
+        """Add a message to its room's history and the durable log.
+
+        Args:
+            message: Message carrying its sequence number
+
+        Returns:
+            False if the message was already stored
+        """
+        room = self.get_room(message.room)
+        room.last_active = time.monotonic()
+        if not room.history.append(message):
+            return False
+        self.history_pages.invalidate(message.room)
+        self._last_seq = max(self._last_seq, message.seq)
+        log = self.history_log
+        if log is not None:
+            if log.append(message.seq, encode_message(message.to_dict()).encode("utf-8")):
+                self.log_index.add(message.room, message.seq)
+        return True
+
+    def history_etag(self, room: str = DEFAULT_ROOM) -> str:
+        """Get a strong ETag for a room's history.
+
+        It is built only from state every worker shares, so a tag issued by
+        one worker revalidates on any other: the room's latest sequence
+        number, which changes with every stored message, and that message's
+        ID, which keeps a tag from before a restart from matching different
+        messages numbered the same way when there is no durable log. With a
+        log, the room's oldest sequence number in it is included too, since
+        compaction removes old pages without a new message. The tag can be
+        checked before any page is built.
+
+        Args:
+            room: Room name
+
+        Returns:
+            Quoted entity tag
+        """
+        last_seq, last_id = self._room_newest(room)
+        oldest = 0
+        if self.history_log is not None:
+            oldest = self.log_index.first(room, self.history_log.first_seq)
+        return f'"{oldest}-{last_seq}-{last_id}"'
+
+    def _room_newest(self, room: str) -> tuple[int, str]:
+        """A room's latest sequence number and the ID of that message.
+
+        The ID is empty if the message is no longer stored.
+        """
+        last_seq = self._room_last_seq(room)
+        state = self.rooms.get(room)
+        if state is not None and len(state.history) and state.history[-1].seq == last_seq:
+            return last_seq, state.history[-1].id
+        log = self.history_log
+        if last_seq and log is not None:
+            messages = self._read_log(log, [last_seq])
+            if messages and messages[0]["seq"] == last_seq:
+                return last_seq, messages[0]["id"]
+        return last_seq, ""
+
+    def _room_last_seq(self, room: str) -> int:
+        """A room's latest sequence number in memory or in the durable log."""
+        state = self.rooms.get(room)
+        last_seq = state.history.last_seq if state is not None else 0
+        if self.history_log is not None:
+            last_seq = max(last_seq, self.log_index.last(room))
+        return last_seq
+
+    def history_page(
+        self,
+        room: str = DEFAULT_ROOM,
+        before: Optional[str] = None,
+        limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+    ) -> str:
+        """Get an encoded page of a room's history, newest page first.
+
+        Pages come from the in-memory history and, once a cursor reaches
+        past its oldest message, from the durable log when there is one.
+        They are cached until the room's next message. A room without
+        state is not created.
+
+        Args:
+            room: Room name
+            before: Optional cursor (sequence number or message ID); the
+                page holds the messages older than it
+            limit: Maximum number of messages
+
+        Returns:
+            JSON object with the room, its ``messages`` (oldest first), the
+            ``next_cursor`` for the preceding page (null on the oldest
+            page) and ``last_seq``
+
+        Raises:
+            ValueError: If the cursor is not a sequence number or the ID of
+                a message still in the in-memory history
+        """
+        state = self.rooms.get(room)
+        before_seq = None
+        if before:
+            before_seq = (
+                state.history.resolve_cursor(before) if state is not None
+                else int(before) if before.isdigit() else None
+            )
+            if before_seq is None:
+                raise ValueError(f"Unknown cursor: {before}")
+
+        key = (room, before_seq, limit)
+        page = self.history_pages.get(key)
+        if page is None:
+            page = self._build_history_page(room, state, before_seq, limit)
+            self.history_pages.put(key, page)
+        return page
 
-        logger.info(f"[BROADCAST_MESSAGE] Payload: {payload}")
-        logger.info(f"[BROADCAST_MESSAGE] Broadcasting message to {len(self.ws_manager._connections)} clients")
-        await self.ws_manager.broadcast(payload)
-        logger.info(f"[BROADCAST_MESSAGE] Broadcast sent")
+    def _build_history_page(
+        self,
+        room: str,
+        state: Optional[ChatRoom],
+        before_seq: Optional[int],
+        limit: int,
+    ) -> str:
+        """Encode a history page from memory, topped up from the durable log."""
+        messages: list[Dict[str, Any]] = []
+        oldest = 0
+        if state is not None:
+            history = state.history
+            messages = [msg.to_dict() for msg in history.before(before_seq, limit)]
+            oldest = history.first_seq
+
+        log = self.history_log
+        if log is not None:
+            log_oldest = self.log_index.first(room, log.first_seq)
+            if log_oldest and (not oldest or log_oldest < oldest):
+                oldest = log_oldest
+            if len(messages) < limit:
+                bound = messages[0]["seq"] if messages else before_seq
+                seqs = self.log_index.before(room, bound, limit - len(messages), log.first_seq)
+                messages[:0] = self._read_log(log, seqs)
+
+        more = bool(messages) and messages[0]["seq"] > oldest
+        return encode_message({
+            "room": room,
+            "messages": messages,
+            "next_cursor": str(messages[0]["seq"]) if more else None,
+            "last_seq": self._room_last_seq(room),
+        })
+
+    @staticmethod
+    def _read_log(log: SegmentLog, seqs: list[int]) -> list[Dict[str, Any]]:
+        """Read messages from the log, one ``read`` per run of consecutive seqs."""
+        messages: list[Dict[str, Any]] = []
+        start = 0
+        while start < len(seqs):
+            end = start + 1
+            while end < len(seqs) and seqs[end] == seqs[end - 1] + 1:
+                end += 1
+            payloads = log.read(seqs[start], end - start)
+            messages.extend(decode_message(payload) for payload in payloads)
+            start = end
+        return messages
 
     async def broadcast_system_message(
         self,
         content: str,
-        exclude_client: Optional[str] = None
+        exclude_client: Optional[str] = None,
+        room: str = DEFAULT_ROOM,
     ) -> None:
-        """Broadcast a system message.
+        """Broadcast a system message to a room.
 
         Args:
             content: System message content
             exclude_client: Optional client to exclude
+            room: Room name
         """
         system_message = ChatMessage(
-            id=str(uuid.uuid4()),
+            id=new_message_id(),
             username="System",
             content=content,
-            timestamp=time.time()
+            timestamp=time.time(),
+            room=room,
         )
 
-        payload = {
-            "type": "system",
-            "data": system_message.to_dict()
-        }
+        await self.backplane.publish({
+            "kind": EVENT_SYSTEM,
+            "message": system_message.to_dict(),
+            "exclude_client": exclude_client,
+        })
 
-        await self.ws_manager.broadcast(payload, exclude_client=exclude_client)
+    async def send_history(
+        self,
+        client_id: str,
+        since: Optional[str] = None,
+        room: str = DEFAULT_ROOM,
+    ) -> None:
+        """Send a room's message history to a client.
 
-    async def send_history(self, client_id: str) -> None:
-        """Send message history to a client.
+        With a cursor, only the messages after it are sent as a ``delta``
+        history frame. The cached full snapshot is sent instead when there is
+        no cursor, the cursor has aged out of the buffer or is newer than
+        any message, or the delta would be larger than the snapshot.
 
         Args:
             client_id: Client identifier
+            since: Optional cursor (sequence number or message ID)
+            room: Room name
         """
-        payload = {
-            "type": "history",
-            "data": [msg.to_dict() for msg in self.message_history[-50:]]
-        }
+        history = self.get_room(room).history
+        if since:
+            seq = history.resolve_cursor(since)
+            delta = (
+                history.since(seq)
+                if seq is not None and seq <= self._last_seq
+                else None
+            )
+            if delta is not None and len(delta) <= history.replay_size:
+                payload = {
+                    "type": "history",
+                    "delta": True,
+                    "data": [msg.to_dict() for msg in delta],
+                }
+                await self.ws_manager.send_to_client(client_id, payload)
+                return
 
-        await self.ws_manager.send_to_client(client_id, payload)
+        await self.ws_manager.send_frame(client_id, history.history_frame())
 
-    async def send_user_count(self) -> None:
-        """Broadcast current user count."""
-        count = self.ws_manager.get_connection_count()
-        payload = {
-            "type": "user_count",
-            "data": {"count": count}
-        }
+    async def send_user_count(self, room: str = DEFAULT_ROOM) -> None:
+        """Mark a room's user count as changed.
 
-        await self.ws_manager.broadcast(payload)
+        The count is published with the next presence flush, after which
+        every worker broadcasts the room's new total to its members.
 
-    async def graceful_shutdown(self, timeout: float = 30.0):
+        Args:
+            room: Room name
+        """
+        await self._presence_out.record(room)
+
+    async def _publish_presence(self, changes: Dict[str, PresenceChange]) -> None:
+        """Publish this worker's counts for the rooms that changed.
+
+        Args:
+            changes: Local joins and leaves per room since the last flush
+        """
+        await self.backplane.publish({
+            "kind": EVENT_PRESENCE,
+            "node": self.backplane.node_id,
+            "counts": {room: self.ws_manager.get_room_count(room) for room in changes},
+            "changes": {
+                room: [change.joined, change.left] for room, change in changes.items()
+            },
+        })
+
+    async def _broadcast_presence(self, changes: Dict[str, PresenceChange]) -> None:
+        """Broadcast one user count summary per changed room.
+
+        Args:
+            changes: Joins and leaves per room across all workers
+        """
+        for room, change in changes.items():
+            await self._broadcast_user_count(room, change)
+
+    async def _broadcast_user_count(
+        self,
+        room: str,
+        change: Optional[PresenceChange] = None,
+    ) -> None:
+        """Broadcast a room's total user count to its local members.
+
+        Nothing is sent if the count is the one last broadcast. Degraded
+        clients only receive every ``degraded_user_count_every``th update.
+
+        Args:
+            room: Room name
+            change: Joins and leaves since the last summary, if known
+        """
+        if not self.ws_manager.get_room_count(room):
+            return
+        state = self.get_room(room)
+        count = self.get_user_count(room)
+        if count == state.last_count:
+            return
+        state.last_count = count
+
+        data: Dict[str, int] = {"count": count}
+        if change is not None and (change.joined or change.left):
+            data["joined"] = change.joined
+            data["left"] = change.left
+        payload = {"type": "user_count", "data": data}
+
+        state.user_count_updates += 1
+        client_ids = None
+        if (
+            self.ws_manager.get_degraded_count()
+            and state.user_count_updates % self.degraded_user_count_every
+        ):
+            client_ids = list(self.ws_manager.iter_normal_client_ids(room))
+
+        await self.ws_manager.broadcast_frames(
+            [encode_message(payload)], coalesce_key="user_count", client_ids=client_ids, room=room
+        )
+
+    @property
+    def accepting(self) -> bool:
+        """Whether new connections are accepted (False once shutdown starts)."""
+        return self.ws_manager.accepting
+
+    async def graceful_shutdown(self, timeout: float = DEFAULT_SHUTDOWN_TIMEOUT) -> ShutdownReport:
         """Gracefully shutdown the chat manager.
 
+        Connections are drained and closed (see
+        ``SimpleWebSocketConnectionManager.graceful_shutdown``) before the
+        backplane and history log are closed. Only the first call does
+        the work; later calls return its report.
+
         Args:
-            timeout: Shutdown timeout in seconds
+            timeout: Seconds allowed for draining connections
 
         Returns:
             Shutdown report
         """
-        return await self.ws_manager.graceful_shutdown(timeout)
+        if self._shutdown is None:
+            self._shutdown = asyncio.ensure_future(self._graceful_shutdown(timeout))
+        return await asyncio.shield(self._shutdown)
+
+    async def _graceful_shutdown(self, timeout: float) -> ShutdownReport:
+        await self.bot_responder.shutdown()
+        await self._presence_out.stop()
+        await self._presence_in.stop()
+        report = await self.ws_manager.graceful_shutdown(timeout)
+        await self.backplane.close()
+        if self.history_log is not None:
+            await self.history_log.close()
+        return report
 
     def get_connection_count(self) -> int:
-        """Get current connection count."""
+        """Get current connection count on this worker."""
         return self.ws_manager.get_connection_count()
+
+    def get_user_count(self, room: Optional[str] = None) -> int:
+        """Get the connection count across all workers.
+
+        Args:
+            room: Optional room to count; defaults to every room
+        """
+        if room is None:
+            others = sum(sum(counts.values()) for counts in self._node_counts.values())
+            return self.ws_manager.get_connection_count() + others
+        others = sum(counts.get(room, 0) for counts in self._node_counts.values())
+        return self.ws_manager.get_room_count(room) + others
+
+    def get_message_count(self) -> int:
+        """Get the number of messages held in memory across rooms."""
+        return sum(len(room.history) for room in self.rooms.values())
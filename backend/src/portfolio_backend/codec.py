@@ -0,0 +1,159 @@
+"""Wire codecs for chat frames.
+
+Frames are JSON text by default, encoded with orjson when it is installed
+and the standard library otherwise. Clients that request the ``msgpack``
+WebSocket subprotocol get MessagePack binary frames instead (requires the
+``msgpack`` package).
+
+Fan-out paths encode each payload once as JSON; ``to_binary`` converts such
+a frame for binary clients, and ``encode_binary_batch`` packs already
+encoded MessagePack frames into a ``batch`` frame without unpacking them.
+JSON clients that opt into ``deflate`` compression get large frames as
+binary zlib streams from ``compress_frame``.
+"""
+
+import json
+import struct
+import zlib
+from typing import Any, Mapping, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack  # type: ignore[import-untyped]
+except ImportError:
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+SUBPROTOCOL_MSGPACK = "msgpack"
+COMPRESSION_DEFLATE = "deflate"
+
+# MessagePack prefix of {"type": "batch", "data": [...]} up to the array
+_BINARY_BATCH_PREFIX = b"\x82\xa4type\xa5batch\xa4data"
+
+
+def _stdlib_dumps(payload: Any) -> str:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+if orjson is not None:
+    def encode_message(payload: Any) -> str:
+        """Encode a payload into a compact JSON text frame."""
+        return orjson.dumps(payload).decode("utf-8")
+
+    def decode_message(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Decode a JSON frame or stored payload."""
+        return orjson.loads(data)
+else:
+    def encode_message(payload: Any) -> str:
+        """Encode a payload into a compact JSON text frame."""
+        return _stdlib_dumps(payload)
+
+    def decode_message(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Decode a JSON frame or stored payload."""
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def encode_bytes(payload: Any) -> bytes:
+    """Encode a payload as UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _stdlib_dumps(payload).encode("utf-8")
+
+
+def msgpack_available() -> bool:
+    """Whether the MessagePack subprotocol can be offered."""
+    return msgpack is not None
+
+
+def negotiate_subprotocol(requested: list[str], allow_msgpack: bool = True) -> Optional[str]:
+    """Pick the subprotocol to accept from those a client requested.
+
+    Args:
+        requested: Subprotocols from the ``Sec-WebSocket-Protocol`` header
+        allow_msgpack: Whether binary frames are enabled
+
+    Returns:
+        ``SUBPROTOCOL_MSGPACK`` or None for JSON text frames
+    """
+    if allow_msgpack and msgpack is not None and SUBPROTOCOL_MSGPACK in requested:
+        return SUBPROTOCOL_MSGPACK
+    return None
+
+
+def encode_binary(payload: Any) -> bytes:
+    """Encode a payload as a MessagePack frame."""
+    packed: bytes = msgpack.packb(payload, use_bin_type=True)
+    return packed
+
+
+def decode_binary(data: bytes) -> Any:
+    """Decode a MessagePack frame."""
+    return msgpack.unpackb(data, raw=False)
+
+
+def to_binary(frame: str) -> bytes:
+    """Convert an encoded JSON frame to MessagePack."""
+    return encode_binary(decode_message(frame))
+
+
+def encode_binary_batch(frames: list[bytes]) -> bytes:
+    """Pack MessagePack frames into a single ``batch`` frame."""
+    count = len(frames)
+    if count < 16:
+        header = bytes((0x90 | count,))
+    elif count < 0x10000:
+        header = b"\xdc" + struct.pack(">H", count)
+    else:
+        header = b"\xdd" + struct.pack(">I", count)
+    return _BINARY_BATCH_PREFIX + header + b"".join(frames)
+
+
+def compress_frame(
+    frame: str,
+    level: int = 6,
+    window_bits: int = 15,
+    mem_level: int = 8,
+) -> bytes:
+    """Compress a JSON frame into a zlib stream.
+
+    Each frame is compressed on its own, so no compressor state outlives
+    the call.
+
+    Args:
+        frame: Encoded JSON frame
+        level: zlib compression level (1-9)
+        window_bits: Base-2 log of the window size (9-15)
+        mem_level: zlib memory level (1-9)
+
+    Returns:
+        zlib-wrapped deflate stream of the UTF-8 frame
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, window_bits, mem_level)
+    return compressor.compress(frame.encode("utf-8")) + compressor.flush()
+
+
+def decode_frame(message: Mapping[str, Any]) -> Any:
+    """Decode an ASGI ``websocket.receive`` message.
+
+    Binary frames are MessagePack and text frames are JSON, whichever
+    subprotocol was negotiated.
+
+    Args:
+        message: ASGI receive event
+
+    Returns:
+        The decoded payload
+    """
+    data = message.get("bytes")
+    if data is not None:
+        if msgpack is None:
+            raise ValueError("Binary frames require the msgpack package")
+        return decode_binary(data)
+    return decode_message(message.get("text") or "")
@@ -2,6 +2,7 @@
 
 import os
 import json
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -34,11 +35,132 @@ class Settings(BaseSettings):
     # WebSocket
     ws_heartbeat_interval: float = 30.0
     ws_heartbeat_timeout: float = 60.0
+    ws_heartbeat_tick: float = 1.0
     ws_max_connections: int = 1000
+    # Admission control (0 disables the soft cap / accept-rate limit)
+    ws_soft_max_connections: int = 800
+    ws_degraded_user_count_every: int = 10
+    ws_accept_rate: float = 100.0
+    ws_accept_burst: int = 200
+    ws_retry_after: float = 10.0
+    ws_broadcast_concurrency: int = 100
+    ws_send_timeout: float = 5.0
+    # Per-connection outbound queues (a high-water mark of 0 disables them)
+    ws_queue_high_water: int = 256
+    ws_queue_low_water: int = 64
+    ws_queue_overflow_policy: Literal["drop_oldest", "coalesce", "disconnect"] = "drop_oldest"
+    ws_slow_consumer_close_code: int = 1013
+    # Per-client batching of queued frames (a window of 0 disables it)
+    ws_batch_window: float = 0.0
+    ws_batch_max_frames: int = 64
+    ws_batch_max_bytes: int = 64 * 1024
+    # Offer the MessagePack subprotocol (needs the msgpack package)
+    ws_msgpack: bool = True
+    # Transport compression negotiated by uvicorn (per connection), not
+    # offered to clients that receive compressed frames from the app. The
+    # window (base-2 log, 9-15) and zlib memory level (1-9) cap the
+    # compressor memory each connection keeps
+    ws_per_message_deflate: bool = True
+    ws_per_message_deflate_window_bits: int = 12
+    ws_per_message_deflate_mem_level: int = 5
+    # Frames of at least this size are compressed once and shared by every
+    # client that asked for ?compression=deflate (0 disables it)
+    ws_compression_threshold: int = 1024
+    ws_compression_level: int = 6
+    ws_compression_window_bits: int = 15
+    ws_compression_mem_level: int = 8
+    # Graceful shutdown: seconds allowed to drain connections, and the range
+    # of the random delay clients are told to wait before reconnecting
+    ws_shutdown_timeout: float = 10.0
+    ws_reconnect_delay_min: float = 1.0
+    ws_reconnect_delay_max: float = 15.0
 
     # Chat
     max_message_length: int = 1000
     max_username_length: int = 50
+    chat_history_size: int = 100
+    chat_history_replay_size: int = 50
+    # Serialized GET /api/history pages cached until the room's next message
+    chat_history_page_cache_size: int = 64
+    # Seconds an idle room without members keeps its history
+    chat_room_ttl: float = 300.0
+    max_room_length: int = 50
+    # A new connection under a username that is already connected is
+    # let in ("allow"), refused ("reject", checked on this worker) or
+    # takes over, closing the older connections ("replace")
+    chat_duplicate_username_policy: Literal["allow", "reject", "replace"] = "allow"
+    # Presence: seconds over which joins, leaves and user counts are
+    # aggregated (0 sends each at once), and the room size above which
+    # join/leave notices are suppressed (0 for no limit)
+    chat_presence_interval: float = 0.25
+    chat_presence_notice_limit: int = 100
+    # Message rate limits in messages per second (0 disables a limit).
+    # Over-limit messages get an error frame ("error") or are dropped
+    # ("drop"); a client with too many strikes in a row is disconnected
+    chat_rate_limit: float = 2.0
+    chat_rate_burst: int = 10
+    chat_username_rate_limit: float = 5.0
+    chat_username_rate_burst: int = 20
+    chat_global_rate_limit: float = 200.0
+    chat_global_rate_burst: int = 400
+    chat_rate_limit_action: Literal["error", "drop"] = "error"
+    chat_rate_limit_strikes: int = 20
+    chat_rate_limit_strike_window: float = 10.0
+    # Durable history log (disabled unless a directory is set; 0 disables
+    # the age and size limits)
+    chat_log_dir: Optional[str] = None
+    chat_log_segment_bytes: int = 64 * 1024 * 1024
+    chat_log_index_interval: int = 64
+    chat_log_fsync_interval: float = 0.05
+    chat_log_max_age: float = 0.0
+    chat_log_max_bytes: int = 0
+
+    # Backplane shared by workers ("memory" for a single worker, "unix" to
+    # relay through a broker on a Unix domain socket)
+    backplane: Literal["memory", "unix"] = "memory"
+    backplane_socket_path: str = "/tmp/portfolio-chat.sock"
+    # Bytes the broker buffers for a worker before disconnecting it as slow
+    backplane_max_peer_buffer: int = 8 * 1024 * 1024
+
+    # Logging (written by a background thread). Chat message text is
+    # logged only with log_content (direct messages never); per-message
+    # records are kept one in log_sample_every
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_content: bool = False
+    log_sample_every: int = 1
+    log_queue_size: int = 10000
+
+    # Metrics served in the Prometheus text format on /metrics; the event
+    # loop lag probe runs every metrics_loop_lag_interval seconds (0
+    # disables it)
+    metrics_enabled: bool = True
+    metrics_loop_lag_interval: float = 0.5
+
+    # Diagnostics, all off by default: event loop stalls longer than
+    # diagnostics_stall_threshold seconds are logged with the blocking
+    # stack (0 disables), /debug/profile takes sampling profiles,
+    # diagnostics_timing_enabled times the chat manager's methods, and
+    # /debug/queues lists the clients with the deepest outbound queues
+    diagnostics_stall_threshold: float = 0.0
+    diagnostics_profiler_enabled: bool = False
+    diagnostics_profile_max_seconds: float = 30.0
+    diagnostics_timing_enabled: bool = False
+    diagnostics_queues_enabled: bool = False
+
+    # Event loop and HTTP parser used by `python -m portfolio_backend.main`;
+    # "auto" picks uvloop and httptools when they are installed
+    server_loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    server_http: Literal["auto", "h11", "httptools"] = "auto"
+    # Worker processes sharing the port, each draining its connections on
+    # shutdown (more than one needs BACKPLANE=unix)
+    server_workers: int = 1
+
+    # Bot
+    bot_rules_path: Optional[str] = None
+    bot_rules_reload_interval: float = 2.0
+    bot_reply_delay: float = 0.5
+    bot_reply_batch_window: float = 0.05
 
     @property
     def cors_origins(self) -> list[str]:
@@ -0,0 +1,328 @@
+"""Event loop diagnostics: stall detection, sampling profiles and call timing.
+
+Every client is served by one event loop, so anything that blocks it (a
+synchronous log write, a large encode, a slow regex) delays every
+connection. The tools here find out what:
+
+- ``StallDetector`` watches the loop from a separate thread and, when the
+  loop has not run a callback for longer than a threshold, records the
+  loop thread's stack at that moment, i.e. the code that is blocking it.
+- ``SamplingProfiler`` samples the loop thread's stack at a fixed interval
+  for a few seconds and returns collapsed stacks, the input format of
+  flamegraph.pl and speedscope.
+- ``instrument_methods`` wraps selected methods of an object so each call
+  is timed into a histogram.
+
+None of them costs anything until it is started or installed.
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from .metrics import Histogram, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALL_HISTORY = 20
+DEFAULT_STACK_DEPTH = 40
+DEFAULT_PROFILE_INTERVAL = 0.005
+
+
+def event_loop_implementation() -> str:
+    """Name of the running event loop's class, e.g. ``uvloop.Loop``."""
+    loop_type = type(asyncio.get_running_loop())
+    return f"{loop_type.__module__}.{loop_type.__qualname__}"
+
+
+def _thread_frame(thread_id: int) -> Optional[FrameType]:
+    return sys._current_frames().get(thread_id)
+
+
+@dataclass(slots=True)
+class Stall:
+    """A period in which the event loop ran no callbacks.
+
+    Attributes:
+        started: Wall-clock time the loop was last seen running
+        duration: Seconds the loop was blocked (grows until it recovers)
+        stack: Loop thread's stack when the stall was detected, outermost
+            frame first
+        ongoing: Whether the loop is still blocked
+    """
+    started: float
+    duration: float
+    stack: list[str] = field(default_factory=list)
+    ongoing: bool = True
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary."""
+        return {
+            "started": self.started,
+            "duration": round(self.duration, 6),
+            "stack": self.stack,
+            "ongoing": self.ongoing,
+        }
+
+
+class StallDetector:
+    """Record event loop stalls longer than a threshold, with their stacks.
+
+    A callback on the loop records a heartbeat every ``threshold / 2``
+    seconds. A watchdog thread checks the heartbeat every
+    ``threshold / 4`` seconds; once a heartbeat is overdue by
+    ``threshold``, it captures the loop thread's current stack. The loop
+    side is one timer per beat; the capture happens on the watchdog
+    thread while the loop is still blocked. Opening a stall and the beat
+    that closes it hold a lock, so a stall is never opened after the loop
+    has already beaten again; ``stalls`` is only read or appended to
+    under the same lock.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        history: int = DEFAULT_STALL_HISTORY,
+        registry: Optional[MetricsRegistry] = None,
+        stack_depth: int = DEFAULT_STACK_DEPTH,
+    ) -> None:
+        """Initialize the detector.
+
+        Args:
+            threshold: Seconds the loop must be blocked to count as a stall
+                (0 disables the detector)
+            history: Number of recent stalls kept
+            registry: Optional registry the stall metrics are added to
+            stack_depth: Innermost frames kept per stack
+        """
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self.stalls: Deque[Stall] = collections.deque(maxlen=max(1, history))
+        self.count = 0
+        self._beat_interval = threshold / 2
+        self._last_beat = 0.0
+        self._current: Optional[Stall] = None
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._duration_histogram = None
+        if registry is not None:
+            registry.counter(
+                "event_loop_stalls_total",
+                f"Event loop stalls longer than {threshold}s",
+                read=lambda: self.count,
+            )
+            self._duration_histogram = registry.histogram(
+                "event_loop_stall_seconds", "Duration of event loop stalls"
+            )
+
+    def start(self) -> None:
+        """Start watching the running loop (call from the loop thread)."""
+        if self.threshold <= 0 or self._watchdog is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="stall-detector", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stop watching."""
+        if self._watchdog is None:
+            return
+        self._stop.set()
+        self._watchdog.join()
+        self._watchdog = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _beat(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stall, self._current = self._current, None
+            last_beat, self._last_beat = self._last_beat, now
+        if stall is not None:
+            stall.duration = now - last_beat - self._beat_interval
+            stall.ongoing = False
+            if self._duration_histogram is not None:
+                self._duration_histogram.observe(stall.duration)
+        assert self._loop is not None
+        self._handle = self._loop.call_later(self._beat_interval, self._beat)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 4):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self._beat_interval
+            if overdue < self.threshold:
+                continue
+            with self._lock:
+                stall = self._current
+                if stall is not None:
+                    stall.duration = overdue
+                    continue
+            stack = self._stack()
+            stall = Stall(started=time.time() - overdue, duration=overdue, stack=stack)
+            with self._lock:
+                if self._last_beat != last_beat:
+                    continue  # the loop recovered while the stack was taken
+                self._current = stall
+                self.stalls.append(stall)
+                self.count += 1
+            logger.warning(
+                "Event loop blocked for over %.3fs in %s",
+                overdue, stack[-1] if stack else "<unknown>",
+                extra={"stall_seconds": round(overdue, 6), "stack": stack},
+            )
+
+    def _stack(self) -> list[str]:
+        frame = _thread_frame(self._loop_thread)
+        if frame is None:
+            return []
+        entries = traceback.extract_stack(frame)[-self.stack_depth:]
+        return [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in entries]
+
+    def recent(self) -> list[dict]:
+        """Recent stalls, oldest first."""
+        # The watchdog thread appends while the loop thread reads
+        with self._lock:
+            stalls = list(self.stalls)
+        return [stall.to_dict() for stall in stalls]
+
+
+class SamplingProfiler:
+    """Sample one thread's stack at a fixed interval.
+
+    Runs in its own thread while the sampled thread carries on, so it is
+    started from the event loop with ``run_in_executor``. Only one profile
+    runs at a time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether a profile is being taken."""
+        return self._lock.locked()
+
+    def profile(
+        self,
+        thread_id: int,
+        seconds: float,
+        interval: float = DEFAULT_PROFILE_INTERVAL,
+    ) -> Dict[str, int]:
+        """Sample a thread's stack for a while.
+
+        Args:
+            thread_id: Thread to sample, e.g. the event loop's
+            seconds: How long to sample
+            interval: Seconds between samples
+
+        Returns:
+            Sample counts per stack, keyed by ``;``-joined frames, outermost
+            first
+
+        Raises:
+            RuntimeError: If a profile is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            counts: Dict[str, int] = collections.Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = _thread_frame(thread_id)
+                if frame is not None:
+                    counts[_collapse(frame)] += 1
+                time.sleep(interval)
+            return dict(counts)
+        finally:
+            self._lock.release()
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    frames.reverse()
+    return ";".join(frames)
+
+
+def format_collapsed(counts: Dict[str, int]) -> str:
+    """Render sample counts as collapsed stacks, one ``stack count`` per line.
+
+    The output can be passed to flamegraph.pl or opened in speedscope.
+    """
+    lines = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in lines)
+
+
+def instrument_methods(
+    target: Any,
+    names: Iterable[str],
+    registry: MetricsRegistry,
+    metric: str = "chat_manager_call_seconds",
+) -> None:
+    """Time every call of some of an object's methods.
+
+    Each method is replaced on the instance by a wrapper that records the
+    call's duration in a histogram labelled with the method name. For a
+    coroutine this is the time until it returns, including its awaits.
+    Attribute lookups reach the wrappers, but callbacks bound before this
+    call keep the unwrapped methods.
+
+    Args:
+        target: Object whose methods are wrapped
+        names: Method names
+        registry: Registry the histograms are added to
+        metric: Histogram name
+    """
+    for name in names:
+        method = getattr(target, name)
+        histogram = registry.histogram(
+            metric, "Duration of chat manager calls", labels={"method": name}
+        )
+        setattr(target, name, _timed(method, histogram))
+
+
+def _timed(method: Callable[..., Any], histogram: Histogram) -> Callable[..., Any]:
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def timed_coroutine(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return timed_coroutine
+
+    @functools.wraps(method)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return timed
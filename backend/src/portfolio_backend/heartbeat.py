@@ -0,0 +1,240 @@
+"""Heartbeat scheduling on a hierarchical timer wheel."""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TimerWheel(Generic[K]):
+    """Hierarchical timing wheel keyed by arbitrary hashable keys.
+
+    Level 0 has ``slots`` buckets one ``tick`` wide; each higher level's
+    buckets are ``slots`` times wider than the level below. Timers far in
+    the future sit in a coarse bucket and are cascaded down a level when the
+    wheel reaches it, so scheduling and cancelling are O(1) and advancing is
+    O(expiring + cascading timers) regardless of how many are pending.
+    """
+
+    def __init__(
+        self,
+        tick: float = 1.0,
+        slots: int = 64,
+        levels: int = 3,
+        now: Optional[float] = None,
+    ) -> None:
+        """Initialize the wheel.
+
+        Args:
+            tick: Resolution in seconds
+            slots: Buckets per level
+            levels: Number of levels; the horizon is ``tick * slots**levels``
+            now: Current time on the clock used by ``schedule``/``advance``
+        """
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._origin = time.monotonic() if now is None else now
+        self._current = 0
+        self._wheels: list[list[set[K]]] = [
+            [set() for _ in range(slots)] for _ in range(levels)
+        ]
+        self._timers: Dict[K, tuple[int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """Schedule (or reschedule) a timer.
+
+        Args:
+            key: Timer key
+            deadline: Expiry time; rounded up to the next tick
+        """
+        self.cancel(key)
+        target = math.ceil((deadline - self._origin) / self.tick)
+        self._insert(key, max(target, self._current + 1))
+
+    def cancel(self, key: K) -> bool:
+        """Cancel a timer.
+
+        Returns:
+            True if the timer was pending
+        """
+        entry = self._timers.pop(key, None)
+        if entry is None:
+            return False
+        _, level, slot = entry
+        self._wheels[level][slot].discard(key)
+        return True
+
+    def _insert(self, key: K, target: int) -> None:
+        delta = target - self._current
+        level = 0
+        span = self.slots
+        while delta >= span and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        slot = (target // self.slots ** level) % self.slots
+        self._wheels[level][slot].add(key)
+        self._timers[key] = (target, level, slot)
+
+    def advance(self, now: float) -> list[K]:
+        """Advance the wheel to ``now``.
+
+        Args:
+            now: Current time
+
+        Returns:
+            Keys of the timers that expired, which are removed
+        """
+        expired: list[K] = []
+        until = math.floor((now - self._origin) / self.tick)
+        while self._current < until:
+            self._current += 1
+            self._cascade()
+            bucket = self._wheels[0][self._current % self.slots]
+            if not bucket:
+                continue
+            keys = list(bucket)
+            bucket.clear()
+            for key in keys:
+                target = self._timers.pop(key)[0]
+                if target > self._current:
+                    # Beyond the wheel's horizon when scheduled; go round again
+                    self._insert(key, target)
+                else:
+                    expired.append(key)
+        return expired
+
+    def _cascade(self) -> None:
+        """Move timers from higher-level buckets that came due down a level."""
+        width = 1
+        for level in range(1, self.levels):
+            width *= self.slots
+            if self._current % width:
+                return
+            bucket = self._wheels[level][(self._current // width) % self.slots]
+            if not bucket:
+                continue
+            keys = list(bucket)
+            bucket.clear()
+            for key in keys:
+                target = self._timers.pop(key)[0]
+                self._insert(key, max(target, self._current))
+
+
+class HeartbeatScheduler:
+    """Pings idle clients and evicts unresponsive ones.
+
+    One task drives a single ``TimerWheel`` holding one timer per client.
+    ``touch`` only records the last-seen time; the client's timer is
+    re-evaluated when it fires. A client idle for ``interval`` seconds is
+    pinged, and one idle for ``timeout`` seconds is evicted. Pings and
+    evictions due on the same tick are handed over as one batch each.
+    """
+
+    def __init__(
+        self,
+        send_pings: Callable[[list[str]], Awaitable[None]],
+        evict: Callable[[list[str]], Awaitable[None]],
+        interval: float = 30.0,
+        timeout: float = 60.0,
+        tick: float = 1.0,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            send_pings: Coroutine function sending a ping to client IDs
+            evict: Coroutine function evicting client IDs
+            interval: Idle seconds before a client is pinged
+            timeout: Idle seconds before a client is evicted
+            tick: Timer wheel resolution in seconds
+        """
+        self.send_pings = send_pings
+        self.evict = evict
+        self.interval = interval
+        self.timeout = max(timeout, interval)
+        self.tick = tick
+        self.wheel: TimerWheel[str] = TimerWheel(tick=tick, now=time.monotonic())
+        self._last_seen: Dict[str, float] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def track(self, client_id: str) -> None:
+        """Start tracking a client."""
+        now = time.monotonic()
+        self._last_seen[client_id] = now
+        self.wheel.schedule(client_id, now + self.interval)
+
+    def untrack(self, client_id: str) -> None:
+        """Stop tracking a client."""
+        self._last_seen.pop(client_id, None)
+        self.wheel.cancel(client_id)
+
+    def touch(self, client_id: str) -> None:
+        """Record activity (such as a pong) from a client."""
+        if client_id in self._last_seen:
+            self._last_seen[client_id] = time.monotonic()
+
+    def last_seen(self, client_id: str) -> Optional[float]:
+        """Get the monotonic time a client was last heard from."""
+        return self._last_seen.get(client_id)
+
+    def start(self) -> None:
+        """Start the scheduler task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler task."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.process(time.monotonic())
+            except Exception as e:
+                logger.error("Heartbeat tick failed: %s", e)
+
+    async def process(self, now: float) -> None:
+        """Handle the timers that expired by ``now``.
+
+        Args:
+            now: Current monotonic time
+        """
+        to_ping: list[str] = []
+        to_evict: list[str] = []
+        for client_id in self.wheel.advance(now):
+            last_seen = self._last_seen.get(client_id)
+            if last_seen is None:
+                continue
+            idle = now - last_seen
+            if idle >= self.timeout:
+                to_evict.append(client_id)
+                continue
+            if idle >= self.interval:
+                to_ping.append(client_id)
+                next_check = min(last_seen + self.timeout, now + self.interval)
+            else:
+                next_check = last_seen + self.interval
+            self.wheel.schedule(client_id, next_check)
+
+        if to_ping:
+            await self.send_pings(to_ping)
+        if to_evict:
+            for client_id in to_evict:
+                self._last_seen.pop(client_id, None)
+            logger.info("Evicting %d unresponsive clients", len(to_evict))
+            await self.evict(to_evict)
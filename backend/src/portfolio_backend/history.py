@@ -0,0 +1,264 @@
+"""Fixed-capacity message history with a cached history frame."""
+
+import bisect
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .codec import encode_message
+
+if TYPE_CHECKING:
+    from .chat import ChatMessage
+
+
+class MessageHistory:
+    """Ring buffer of the most recent chat messages.
+
+    Appends are O(1): once the buffer is full the oldest slot is overwritten
+    in place instead of re-slicing a list. The encoded ``history`` frame for
+    the last ``replay_size`` messages is built on first use and reused until
+    the next append, so a burst of joins costs a single serialization.
+
+    Every appended message carries a sequence number. Numbers increase
+    but need not be contiguous: they are global across rooms, so a room's
+    buffer holds only some of them. A cursor is located by binary search,
+    and message IDs map to sequence numbers through a dictionary kept in
+    step with the buffer.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        replay_size: int = 50,
+        encoder: Callable[[Dict[str, Any]], str] = encode_message,
+    ) -> None:
+        """Initialize the history buffer.
+
+        Args:
+            capacity: Maximum number of messages retained
+            replay_size: Number of messages included in the history frame
+            encoder: Function encoding a payload into a text frame
+        """
+        self.capacity = max(1, capacity)
+        self.replay_size = min(max(0, replay_size), self.capacity)
+        self.encoder = encoder
+        self._buffer: list[Optional["ChatMessage"]] = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._last_seq = 0
+        # Highest sequence number dropped from the buffer
+        self._evicted_seq = 0
+        self._seq_by_id: Dict[str, int] = {}
+        self._frame: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> "ChatMessage":
+        """Get a message by logical index, oldest first."""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("history index out of range")
+        message = self._buffer[(self._start + index) % self.capacity]
+        assert message is not None
+        return message
+
+    def __iter__(self) -> Iterator["ChatMessage"]:
+        for index in range(self._count):
+            yield self[index]
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest retained message (0 if empty)."""
+        return self[0].seq if self._count else 0
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest message (0 if none yet)."""
+        return self._last_seq
+
+    def append(self, message: "ChatMessage") -> bool:
+        """Add a message, overwriting the oldest one when full.
+
+        A message without a sequence number (``seq`` of 0) is given the next
+        one. A message that already carries one (assigned by the backplane)
+        keeps it; numbers at or below ``last_seq`` are duplicates and are
+        ignored.
+
+        Args:
+            message: Message to append
+
+        Returns:
+            True if the message was added
+        """
+        if message.seq <= 0:
+            message.seq = self._last_seq + 1
+        elif message.seq <= self._last_seq:
+            return False
+        self._last_seq = message.seq
+        if self._count < self.capacity:
+            self._buffer[(self._start + self._count) % self.capacity] = message
+            self._count += 1
+        else:
+            evicted = self._buffer[self._start]
+            if evicted is not None:
+                self._seq_by_id.pop(evicted.id, None)
+                self._evicted_seq = evicted.seq
+            self._buffer[self._start] = message
+            self._start = (self._start + 1) % self.capacity
+        self._seq_by_id[message.id] = message.seq
+        self._frame = None
+        return True
+
+    def restore(self, messages: Iterable["ChatMessage"]) -> int:
+        """Load messages recovered from the durable log.
+
+        Anything older than the first of them may be missing from the
+        buffer, so ``since`` answers cursors before it with None (a full
+        snapshot) rather than a delta with a silent gap.
+
+        Args:
+            messages: Recovered messages, oldest first
+
+        Returns:
+            Number of messages added
+        """
+        added = sum(1 for message in messages if self.append(message))
+        if added:
+            self._evicted_seq = max(self._evicted_seq, self.first_seq - 1)
+        return added
+
+    def clear(self) -> None:
+        """Drop all messages; sequence numbering continues from ``last_seq``."""
+        self._evicted_seq = self._last_seq
+        self._buffer = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._seq_by_id.clear()
+        self._frame = None
+
+    def resolve_cursor(self, cursor: str) -> Optional[int]:
+        """Resolve a cursor to a sequence number.
+
+        Args:
+            cursor: Sequence number or message ID
+
+        Returns:
+            Sequence number, or None if the cursor is not recognised
+        """
+        if cursor.isdigit():
+            return int(cursor)
+        return self._seq_by_id.get(cursor)
+
+    def since(self, seq: int) -> Optional[list["ChatMessage"]]:
+        """Get the messages newer than a sequence number.
+
+        Args:
+            seq: Last sequence number the caller has seen
+
+        Returns:
+            Messages after ``seq``, oldest first, or None if messages after
+            ``seq`` have already been dropped and the caller needs a full
+            snapshot
+        """
+        if seq < self._evicted_seq:
+            return None
+        start = bisect.bisect_right(range(self._count), seq, key=lambda index: self[index].seq)
+        return [self[index] for index in range(start, self._count)]
+
+    def before(self, seq: Optional[int], limit: int) -> list["ChatMessage"]:
+        """Get up to ``limit`` of the newest messages older than a sequence number.
+
+        Args:
+            seq: Exclusive upper bound, or None for the newest messages
+            limit: Maximum number of messages
+
+        Returns:
+            Messages oldest first
+        """
+        if seq is None:
+            return self.recent(limit)
+        end = bisect.bisect_left(range(self._count), seq, key=lambda index: self[index].seq)
+        start = max(0, end - max(0, limit))
+        return [self[index] for index in range(start, end)]
+
+    def recent(self, limit: int) -> list["ChatMessage"]:
+        """Get up to ``limit`` of the newest messages, oldest first.
+
+        Args:
+            limit: Maximum number of messages
+
+        Returns:
+            List of messages
+        """
+        limit = min(max(0, limit), self._count)
+        return [self[index] for index in range(self._count - limit, self._count)]
+
+    def history_frame(self) -> str:
+        """Get the encoded ``history`` frame for the newest messages.
+
+        Returns:
+            Encoded frame, cached until the next append
+        """
+        if self._frame is None:
+            self._frame = self.encoder({
+                "type": "history",
+                "data": [msg.to_dict() for msg in self.recent(self.replay_size)],
+            })
+        return self._frame
+
+
+# (room, exclusive upper sequence number or None for the newest, limit)
+PageKey = Tuple[str, Optional[int], int]
+
+
+class HistoryPageCache:
+    """Least recently used cache of serialized history pages.
+
+    Pages are dropped per room whenever the room's history changes, so a
+    cached page is always current and can be served without re-encoding.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        """Initialize the cache.
+
+        Args:
+            capacity: Maximum number of pages kept (0 disables caching)
+        """
+        self.capacity = max(0, capacity)
+        self.hits = 0
+        self.misses = 0
+        self._pages: "OrderedDict[PageKey, str]" = OrderedDict()
+        self._keys_by_room: Dict[str, set[PageKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get(self, key: PageKey) -> Optional[str]:
+        """Get a cached page, marking it as recently used."""
+        page = self._pages.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pages.move_to_end(key)
+        return page
+
+    def put(self, key: PageKey, page: str) -> None:
+        """Cache a page, evicting the least recently used beyond capacity."""
+        if not self.capacity:
+            return
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        self._keys_by_room.setdefault(key[0], set()).add(key)
+        while len(self._pages) > self.capacity:
+            evicted, _ = self._pages.popitem(last=False)
+            keys = self._keys_by_room[evicted[0]]
+            keys.discard(evicted)
+            if not keys:
+                del self._keys_by_room[evicted[0]]
+
+    def invalidate(self, room: str) -> None:
+        """Drop every cached page of a room."""
+        for key in self._keys_by_room.pop(room, ()):
+            del self._pages[key]
@@ -0,0 +1,506 @@
+"""Durable append-only chat history log."""
+
+import asyncio
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import time
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from struct import Struct
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length, CRC-32 of the payload, sequence number
+RECORD_HEADER = Struct(">IIQ")
+SEGMENT_SUFFIX = ".log"
+LOCK_NAME = "LOCK"
+
+
+@dataclass
+class Segment:
+    """One segment file and its sparse index.
+
+    Attributes:
+        path: Segment file path
+        base_seq: Sequence number of the first record
+        last_seq: Sequence number of the last record (``base_seq - 1`` if empty)
+        size: Bytes of valid records
+        index: ``(seq, offset)`` pairs for every Nth record, ascending
+        mtime: Wall-clock time of the last append
+    """
+    path: str
+    base_seq: int
+    last_seq: int
+    size: int = 0
+    index: list[tuple[int, int]] = field(default_factory=list)
+    mtime: float = 0.0
+    _map: Optional[mmap.mmap] = field(default=None, repr=False, compare=False)
+    _mapped_size: int = field(default=0, repr=False, compare=False)
+
+    def view(self) -> memoryview:
+        """Map the segment (again, if it grew) and return a view of its records."""
+        if self.size == 0:
+            return memoryview(b"")
+        if self._map is None or self._mapped_size < self.size:
+            # A replaced map stays alive while views returned earlier use it
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+            self._mapped_size = self.size
+        return memoryview(self._map)[:self.size]
+
+
+class SegmentLog:
+    """Append-only log of encoded chat messages, split into segment files.
+
+    Each record is a ``RECORD_HEADER`` followed by the message's JSON
+    encoding. Appends are plain ``os.write`` calls; a background task
+    fsyncs at most once every ``fsync_interval`` seconds, so every message
+    written in that window shares one fsync (group commit). A sparse index
+    with one entry per ``index_interval`` records maps sequence numbers to
+    file offsets, and reads return ``memoryview`` slices of the
+    memory-mapped segments, so old ranges are served without decoding
+    messages into Python objects.
+
+    When the active segment reaches ``segment_bytes`` a new one is started.
+    Sealed segments are deleted once they are older than ``max_age`` or
+    the log exceeds ``max_bytes``. On open, every segment is scanned and
+    the log is truncated at the first torn or corrupt record, which is
+    what a crash in the middle of a write leaves behind.
+
+    Only one process may write a log directory; it is claimed with a
+    ``flock`` on its ``LOCK`` file. A process that cannot claim it opens
+    the log read-only and sees the segments present when it was opened.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        index_interval: int = 64,
+        fsync_interval: float = 0.05,
+        max_age: float = 0.0,
+        max_bytes: int = 0,
+    ) -> None:
+        """Initialize the log; call ``open`` before use.
+
+        Args:
+            directory: Directory holding the segment files
+            segment_bytes: Size at which the active segment is rotated
+            index_interval: Records between sparse index entries
+            fsync_interval: Seconds between group commits
+            max_age: Seconds after its last append that a sealed segment is
+                deleted (0 keeps segments forever)
+            max_bytes: Total size above which the oldest sealed segments
+                are deleted (0 means unlimited)
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = max(1, index_interval)
+        self.fsync_interval = fsync_interval
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.writable = False
+        self.segments: list[Segment] = []
+        self._fd: Optional[int] = None
+        self._lock_fd: Optional[int] = None
+        self._dirty = False
+        self._sync_directory = False
+        self._sealed_fds: list[int] = []
+        self._records_since_index = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+        # Group commit running in a worker thread
+        self._inflight: Optional["asyncio.Future[None]"] = None
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest record (0 if empty)."""
+        for segment in self.segments:
+            if segment.last_seq >= segment.base_seq:
+                return segment.base_seq
+        return 0
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest record (0 if empty)."""
+        return self.segments[-1].last_seq if self.segments else 0
+
+    @property
+    def size(self) -> int:
+        """Total bytes of valid records."""
+        return sum(segment.size for segment in self.segments)
+
+    def open(self) -> int:
+        """Claim the directory, recover the segments and start writing.
+
+        Returns:
+            Number of records recovered
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock_fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._lock_fd = lock_fd
+            self.writable = True
+        except BlockingIOError:
+            os.close(lock_fd)
+            logger.info(
+                "History log %s is locked by another process; opening read-only", self.directory
+            )
+
+        names = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        recovered = 0
+        for position, name in enumerate(names):
+            segment = self._recover(os.path.join(self.directory, name))
+            if segment is None:
+                continue
+            if segment.base_seq <= self.last_seq:
+                logger.error(
+                    "History log segment %s overlaps seq %d; ignoring the rest", name, self.last_seq
+                )
+                if self.writable:
+                    for stale in names[position:]:
+                        os.unlink(os.path.join(self.directory, stale))
+                break
+            if segment.size == 0 and position < len(names) - 1:
+                # Only the active segment may be empty
+                if self.writable:
+                    os.unlink(segment.path)
+                continue
+            self.segments.append(segment)
+            recovered += segment.last_seq - segment.base_seq + 1
+
+        if self.writable:
+            if not self.segments:
+                self._new_segment(1)
+            else:
+                active = self.segments[-1]
+                self._fd = os.open(active.path, os.O_WRONLY | os.O_APPEND)
+                self._records_since_index = self._count_since_index(active)
+        return recovered
+
+    def _recover(self, path: str) -> Optional[Segment]:
+        """Scan a segment, build its index and cut off a torn tail."""
+        name = os.path.basename(path)
+        try:
+            base_seq = int(name[:-len(SEGMENT_SUFFIX)])
+        except ValueError:
+            return None
+        segment = Segment(path=path, base_seq=base_seq, last_seq=base_seq - 1)
+        segment.mtime = os.stat(path).st_mtime
+
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        count = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, crc, seq = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if (
+                end > len(data)
+                or seq != segment.last_seq + 1
+                or zlib.crc32(data[offset + RECORD_HEADER.size:end]) != crc
+            ):
+                break
+            if count % self.index_interval == 0:
+                segment.index.append((seq, offset))
+            segment.last_seq = seq
+            offset = end
+            count += 1
+
+        segment.size = offset
+        if offset < len(data):
+            logger.warning(
+                "Truncating history log segment %s at byte %d of %d", name, offset, len(data)
+            )
+            if self.writable:
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+                    os.fsync(f.fileno())
+        return segment
+
+    def _count_since_index(self, segment: Segment) -> int:
+        if not segment.index:
+            return 0
+        return (segment.last_seq - segment.index[-1][0] + 1) % self.index_interval
+
+    def _new_segment(self, base_seq: int) -> None:
+        """Seal the active segment and start a new one at ``base_seq``."""
+        if self._fd is not None:
+            # Fsynced and closed by the next group commit
+            self._sealed_fds.append(self._fd)
+        path = os.path.join(self.directory, f"{base_seq:020d}{SEGMENT_SUFFIX}")
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.segments.append(
+            Segment(path=path, base_seq=base_seq, last_seq=base_seq - 1, mtime=time.time())
+        )
+        self._records_since_index = 0
+        # Make the new file's directory entry durable with the next commit
+        self._sync_directory = True
+
+    def append(self, seq: int, payload: bytes) -> bool:
+        """Append an encoded message.
+
+        Args:
+            seq: Message sequence number; must be above ``last_seq``
+            payload: JSON encoding of the message
+
+        Returns:
+            True if the record was written (False when read-only or ``seq``
+            is not new)
+        """
+        if not self.writable or seq <= self.last_seq:
+            return False
+        assert self._fd is not None
+        active = self.segments[-1]
+        if active.size == 0:
+            if seq != active.base_seq:
+                # Nothing written yet; renumber the segment instead of leaving
+                # an empty file behind
+                path = os.path.join(self.directory, f"{seq:020d}{SEGMENT_SUFFIX}")
+                os.rename(active.path, path)
+                active.path, active.base_seq = path, seq
+                self._sync_directory = True
+        elif active.size >= self.segment_bytes or seq != active.last_seq + 1:
+            # Full, or the sequence jumped; a new segment keeps seqs contiguous
+            # within each segment
+            self._new_segment(seq)
+            active = self.segments[-1]
+
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), seq) + payload
+        os.write(self._fd, record)
+        if self._records_since_index == 0:
+            active.index.append((seq, active.size))
+        self._records_since_index = (self._records_since_index + 1) % self.index_interval
+        active.size += len(record)
+        active.last_seq = seq
+        active.mtime = time.time()
+        self._dirty = True
+        return True
+
+    def _take_commit(self) -> tuple[list[int], Optional[int], bool]:
+        """Collect the work for one group commit and reset the pending flags."""
+        sealed, self._sealed_fds = self._sealed_fds, []
+        active = self._fd if self._dirty else None
+        sync_directory = self._sync_directory
+        self._dirty = False
+        self._sync_directory = False
+        return sealed, active, sync_directory
+
+    def _commit(self, sealed: list[int], active: Optional[int], sync_directory: bool) -> None:
+        """Fsync the collected files; safe to run in a worker thread."""
+        for fd in sealed:
+            os.fsync(fd)
+            os.close(fd)
+        if active is not None:
+            os.fsync(active)
+        if sync_directory:
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def flush(self) -> None:
+        """Fsync everything appended so far."""
+        self._commit(*self._take_commit())
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Delete sealed segments beyond the age or size limits.
+
+        Args:
+            now: Current wall-clock time
+
+        Returns:
+            Number of segments deleted
+        """
+        if not self.writable:
+            return 0
+        now = time.time() if now is None else now
+        total = self.size
+        deleted = 0
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            too_old = self.max_age > 0 and now - oldest.mtime > self.max_age
+            too_big = self.max_bytes > 0 and total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self.segments.pop(0)
+            total -= oldest.size
+            os.unlink(oldest.path)
+            deleted += 1
+        return deleted
+
+    def locate(self, seq: int) -> Optional[tuple[int, int]]:
+        """Find the first record at or after a sequence number.
+
+        Uses the sparse index to jump close to the record and scans the
+        remaining headers in the mapped segment.
+
+        Args:
+            seq: Sequence number
+
+        Returns:
+            ``(segment position, byte offset)``, or None if the log has no
+            record at or after ``seq``
+        """
+        if not self.segments or seq > self.last_seq:
+            return None
+        position = max(bisect.bisect_right([s.base_seq for s in self.segments], seq) - 1, 0)
+        segment = self.segments[position]
+        if seq > segment.last_seq:
+            # In a gap between segments
+            position += 1
+            segment = self.segments[position]
+        if seq <= segment.base_seq:
+            return position, 0
+        entry = bisect.bisect_right(segment.index, (seq, float("inf"))) - 1
+        current, offset = segment.index[entry]
+        view = segment.view()
+        while current < seq:
+            offset += RECORD_HEADER.size + RECORD_HEADER.unpack_from(view, offset)[0]
+            current += 1
+        return position, offset
+
+    def read(self, start_seq: int, limit: int) -> list[memoryview]:
+        """Read encoded messages starting at a sequence number.
+
+        Args:
+            start_seq: First sequence number to read; reading starts at the
+                next record present if it was compacted away
+            limit: Maximum number of messages
+
+        Returns:
+            JSON payloads, oldest first, as views into the mapped segments
+        """
+        located = self.locate(start_seq) if limit > 0 else None
+        if located is None:
+            return []
+        position, offset = located
+        segment = self.segments[position]
+        payloads: list[memoryview] = []
+        view = segment.view()
+        while len(payloads) < limit:
+            if offset >= segment.size:
+                position += 1
+                if position >= len(self.segments):
+                    break
+                segment = self.segments[position]
+                offset = 0
+                view = segment.view()
+                continue
+            length = RECORD_HEADER.unpack_from(view, offset)[0]
+            start = offset + RECORD_HEADER.size
+            payloads.append(view[start:start + length])
+            offset = start + length
+        return payloads
+
+    def start(self) -> None:
+        """Start the group commit task."""
+        if self._task is None and self.writable:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                if self._dirty or self._sealed_fds or self._sync_directory:
+                    # Collect on the loop thread, fsync off it. Cancelling
+                    # the task cannot stop the thread, so close() waits for it
+                    self._inflight = loop.run_in_executor(
+                        None, self._commit, *self._take_commit()
+                    )
+                    await asyncio.shield(self._inflight)
+                    self._inflight = None
+                self.compact()
+            except Exception as e:
+                logger.error("History log commit failed: %s", e)
+
+    async def close(self) -> None:
+        """Stop the commit task, fsync and release the directory."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        inflight, self._inflight = self._inflight, None
+        if inflight is not None:
+            # Still fsyncing the files closed below
+            await asyncio.gather(inflight, return_exceptions=True)
+        if self.writable:
+            self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.writable = False
+
+
+class RoomIndex:
+    """Sequence numbers of each room's records in a ``SegmentLog``.
+
+    The log does not know about rooms, so finding a room's older messages
+    would mean reading every other room's records too. The index keeps
+    each room's sequence numbers in an ``array`` (8 bytes per record),
+    so a page of a room's messages is found with a bisect and read record
+    by record.
+    """
+
+    def __init__(self) -> None:
+        self._seqs: Dict[str, "array[int]"] = {}
+
+    def add(self, room: str, seq: int) -> None:
+        """Record that a room's message was written with ``seq``.
+
+        Args:
+            room: Room name
+            seq: Sequence number; must be above the room's previous one
+        """
+        seqs = self._seqs.get(room)
+        if seqs is None:
+            seqs = self._seqs[room] = array("q")
+        seqs.append(seq)
+
+    def _trim(self, room: str, first_seq: int) -> "array[int]":
+        """A room's sequence numbers, without those compacted out of the log."""
+        seqs = self._seqs.get(room)
+        if seqs is None:
+            return array("q")
+        start = bisect.bisect_left(seqs, first_seq)
+        if start:
+            del seqs[:start]
+        return seqs
+
+    def before(self, room: str, seq: Optional[int], limit: int, first_seq: int) -> list[int]:
+        """Get up to ``limit`` of a room's newest sequence numbers below ``seq``.
+
+        Args:
+            room: Room name
+            seq: Exclusive upper bound, or None for the newest
+            limit: Maximum number of sequence numbers
+            first_seq: Oldest sequence number still in the log
+
+        Returns:
+            Sequence numbers, ascending
+        """
+        seqs = self._trim(room, first_seq)
+        end = len(seqs) if seq is None else bisect.bisect_left(seqs, seq)
+        return seqs[max(0, end - max(0, limit)):end].tolist()
+
+    def first(self, room: str, first_seq: int) -> int:
+        """A room's oldest sequence number still in the log (0 if none)."""
+        seqs = self._trim(room, first_seq)
+        return seqs[0] if seqs else 0
+
+    def last(self, room: str) -> int:
+        """A room's newest sequence number in the log (0 if none)."""
+        seqs = self._seqs.get(room)
+        return seqs[-1] if seqs else 0
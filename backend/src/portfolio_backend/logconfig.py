@@ -0,0 +1,155 @@
+"""Logging that stays off the event loop.
+
+Records are put on a bounded queue by a ``QueueHandler`` and formatted and
+written by a ``QueueListener`` thread, so a log call on the event loop costs
+an enqueue rather than formatting and a blocking write. Records are not
+formatted before they are queued: call sites pass ``%``-style arguments,
+which the listener thread merges.
+
+Structured fields go in ``extra`` and are emitted as JSON keys. Two keys
+are treated specially:
+
+- ``content``: user-supplied text, dropped unless content logging is on
+- ``sampled``: marks a high-volume record that is kept once every
+  ``sample_every`` calls
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional, TextIO
+
+# Attributes of every LogRecord; anything else was passed in ``extra``
+_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sampled":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContentFilter(logging.Filter):
+    """Drop user-supplied ``content`` fields when content logging is off."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.__dict__.pop("content", None)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every ``every`` records marked ``sampled``."""
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False):
+            return True
+        keep = self._seen % self.every == 0
+        self._seen += 1
+        return keep
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and defers formatting.
+
+    When the queue is full the record is dropped and counted rather than
+    stalling the caller.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    level: str = "INFO",
+    json_format: bool = True,
+    log_content: bool = False,
+    sample_every: int = 1,
+    queue_size: int = 10000,
+    stream: Optional[TextIO] = None,
+) -> logging.handlers.QueueListener:
+    """Route root logging through a queue to a background writer thread.
+
+    Replaces any handlers on the root logger. The listener is stopped, and
+    the queue flushed, at interpreter exit; call ``stop_listener`` to stop
+    it earlier.
+
+    Args:
+        level: Root log level
+        json_format: Emit JSON lines (plain text otherwise)
+        log_content: Keep ``content`` fields (chat message text)
+        sample_every: Keep one in this many ``sampled`` records
+        queue_size: Records buffered before new ones are dropped
+        stream: Output stream (defaults to stderr)
+
+    Returns:
+        The started listener
+    """
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_every))
+    if not log_content:
+        handler.addFilter(ContentFilter())
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """Flush and stop a listener; safe to call more than once."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def get_queue_handler() -> Optional[NonBlockingQueueHandler]:
+    """The root logger's queue handler, if ``setup_logging`` installed one."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            return handler
+    return None
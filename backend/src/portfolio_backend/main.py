@@ -1,22 +1,75 @@
 """Main application for portfolio backend."""
 
+import importlib
 import logging
+import asyncio
+import math
+import os
+import signal
+import socket
+import sys
+import threading
+import time
 from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import uuid
+from urllib.parse import parse_qs
+import uvicorn
+from uvicorn._subprocess import get_subprocess
+from uvicorn.config import STARTUP_FAILURE
+from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.http11 import Request as HandshakeRequest
 
 from .config import settings
-from .chat import ChatManager
-from .security import MessageValidator
+from .admission import ADMIT_DEGRADED, REJECT_CLOSE_CODE, AdmissionController
+from .backplane import Backplane, InProcessBackplane, UnixSocketBackplane
+from .bot import BotRuleEngine
+from .chat import (
+    DEFAULT_HISTORY_PAGE_SIZE,
+    DEFAULT_ROOM,
+    GOING_AWAY_CLOSE_CODE,
+    REPLACED_CLOSE_CODE,
+    ChatManager,
+)
+from .codec import (
+    COMPRESSION_DEFLATE,
+    SUBPROTOCOL_MSGPACK,
+    decode_frame,
+    encode_binary,
+    encode_message,
+    negotiate_subprotocol,
+)
+from .diagnostics import (
+    DEFAULT_PROFILE_INTERVAL,
+    SamplingProfiler,
+    StallDetector,
+    event_loop_implementation,
+    format_collapsed,
+    instrument_methods,
+)
+from .historylog import SegmentLog
+from .logconfig import get_queue_handler, setup_logging
+from .metrics import ChatMetrics, LoopLagMonitor
+from .ratelimit import RATE_DISCONNECT, RATE_OVERLOADED, MessageRateLimiter
+from .security import MessageValidator, REASON_DANGEROUS
 from dataclasses import dataclass
 from datetime import timedelta
 
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging: records are written by a background thread
+setup_logging(
+    level=settings.log_level,
+    json_format=settings.log_format == "json",
+    log_content=settings.log_content,
+    sample_every=settings.log_sample_every,
+    queue_size=settings.log_queue_size,
+)
 logger = logging.getLogger(__name__)
 
 
@@ -26,7 +79,23 @@ class SimpleWebSocketConfig:
     """Simple WebSocket configuration."""
     heartbeat_interval: float = 30.0
     heartbeat_timeout: float = 60.0
+    heartbeat_tick: float = 1.0
     max_connections: int = 1000
+    broadcast_concurrency: int = 100
+    send_timeout: float = 5.0
+    queue_high_water: int = 256
+    queue_low_water: int = 64
+    overflow_policy: str = "drop_oldest"
+    slow_consumer_close_code: int = 1013
+    batch_window: float = 0.0
+    batch_max_frames: int = 64
+    batch_max_bytes: int = 64 * 1024
+    compression_threshold: int = 1024
+    compression_level: int = 6
+    compression_window_bits: int = 15
+    compression_mem_level: int = 8
+    reconnect_delay_min: float = 1.0
+    reconnect_delay_max: float = 15.0
     log_level: str = "INFO"
 
 
@@ -34,30 +103,292 @@ class SimpleWebSocketConfig:
 ws_config = SimpleWebSocketConfig(
     heartbeat_interval=settings.ws_heartbeat_interval,
     heartbeat_timeout=settings.ws_heartbeat_timeout,
+    heartbeat_tick=settings.ws_heartbeat_tick,
     max_connections=settings.ws_max_connections,
+    broadcast_concurrency=settings.ws_broadcast_concurrency,
+    send_timeout=settings.ws_send_timeout,
+    queue_high_water=settings.ws_queue_high_water,
+    queue_low_water=settings.ws_queue_low_water,
+    overflow_policy=settings.ws_queue_overflow_policy,
+    slow_consumer_close_code=settings.ws_slow_consumer_close_code,
+    batch_window=settings.ws_batch_window,
+    batch_max_frames=settings.ws_batch_max_frames,
+    batch_max_bytes=settings.ws_batch_max_bytes,
+    compression_threshold=settings.ws_compression_threshold,
+    compression_level=settings.ws_compression_level,
+    compression_window_bits=settings.ws_compression_window_bits,
+    compression_mem_level=settings.ws_compression_mem_level,
+    reconnect_delay_min=settings.ws_reconnect_delay_min,
+    reconnect_delay_max=settings.ws_reconnect_delay_max,
     log_level="INFO",
 )
-chat_manager = ChatManager(ws_config)
+
+def create_backplane() -> Backplane:
+    """Create the backplane selected in settings."""
+    if settings.backplane == "unix":
+        return UnixSocketBackplane(
+            settings.backplane_socket_path,
+            history_size=settings.chat_history_size,
+            max_peer_buffer=settings.backplane_max_peer_buffer,
+        )
+    return InProcessBackplane(history_size=settings.chat_history_size)
+
+
+def create_history_log() -> Optional[SegmentLog]:
+    """Create the durable history log if a directory is configured."""
+    if not settings.chat_log_dir:
+        return None
+    return SegmentLog(
+        settings.chat_log_dir,
+        segment_bytes=settings.chat_log_segment_bytes,
+        index_interval=settings.chat_log_index_interval,
+        fsync_interval=settings.chat_log_fsync_interval,
+        max_age=settings.chat_log_max_age,
+        max_bytes=settings.chat_log_max_bytes,
+    )
+
+
+# Counters and latency histograms served on /metrics
+metrics = ChatMetrics()
+loop_lag_monitor = LoopLagMonitor(
+    metrics.loop_lag_seconds,
+    interval=settings.metrics_loop_lag_interval,
+)
+
+chat_manager = ChatManager(
+    ws_config,
+    history_size=settings.chat_history_size,
+    history_replay_size=settings.chat_history_replay_size,
+    degraded_user_count_every=settings.ws_degraded_user_count_every,
+    bot=BotRuleEngine(
+        rules_path=settings.bot_rules_path,
+        reload_interval=settings.bot_rules_reload_interval,
+    ),
+    bot_reply_delay=settings.bot_reply_delay,
+    bot_reply_batch_window=settings.bot_reply_batch_window,
+    backplane=create_backplane(),
+    history_log=create_history_log(),
+    room_ttl=settings.chat_room_ttl,
+    presence_interval=settings.chat_presence_interval,
+    presence_notice_limit=settings.chat_presence_notice_limit,
+    metrics=metrics,
+    history_page_cache_size=settings.chat_history_page_cache_size,
+)
+
+# Diagnostics; nothing runs or is wrapped unless enabled
+TIMED_METHODS = (
+    "connect", "disconnect", "send_message", "broadcast_message",
+    "broadcast_system_message", "send_history", "history_page",
+)
+stall_detector = StallDetector(
+    settings.diagnostics_stall_threshold,
+    registry=metrics.registry if settings.diagnostics_stall_threshold > 0 else None,
+)
+profiler = SamplingProfiler()
+if settings.diagnostics_timing_enabled:
+    instrument_methods(chat_manager, TIMED_METHODS, metrics.registry)
 
 # Validators
 message_validator = MessageValidator()
 
+# Per-client, per-username and global message rate limits
+rate_limiter = MessageRateLimiter(
+    client_rate=settings.chat_rate_limit,
+    client_burst=settings.chat_rate_burst,
+    username_rate=settings.chat_username_rate_limit,
+    username_burst=settings.chat_username_rate_burst,
+    global_rate=settings.chat_global_rate_limit,
+    global_burst=settings.chat_global_rate_burst,
+    max_strikes=settings.chat_rate_limit_strikes,
+    strike_window=settings.chat_rate_limit_strike_window,
+)
+
+# Close code for clients disconnected for flooding (policy violation)
+RATE_LIMIT_CLOSE_CODE = 1008
+
+# Admission control for new connections
+admission = AdmissionController(
+    hard_cap=settings.ws_max_connections,
+    soft_cap=settings.ws_soft_max_connections,
+    accept_rate=settings.ws_accept_rate,
+    accept_burst=settings.ws_accept_burst,
+    retry_after=settings.ws_retry_after,
+)
+
+# Counters kept by other components, read when /metrics is scraped
+metrics.registry.counter(
+    "chat_connections_rejected_total", "Connections rejected by admission control",
+    read=lambda: admission.rejected,
+)
+metrics.registry.counter(
+    "chat_messages_rate_limited_total", "Chat messages dropped by rate limits",
+    labels={"limit": "client"}, read=lambda: rate_limiter.limited,
+)
+metrics.registry.counter(
+    "chat_messages_rate_limited_total", "Chat messages dropped by rate limits",
+    labels={"limit": "global"}, read=lambda: rate_limiter.overloaded,
+)
+metrics.registry.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full",
+    read=lambda: getattr(get_queue_handler(), "dropped", 0),
+)
+
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Manage application lifecycle."""
     # Startup
+    if chat_manager.history_log is not None:
+        recovered = await chat_manager.recover_history()
+        logger.info("Recovered %d messages from %s", recovered, settings.chat_log_dir)
     await chat_manager.start()
+    loop_lag_monitor.start()
+    stall_detector.start()
+    logger.info("Event loop: %s", event_loop_implementation())
     logger.info("Chat manager started")
     yield
-    # Shutdown
-    report = await chat_manager.graceful_shutdown()
+    # Shutdown: a no-op report if DrainingServer already drained
+    await loop_lag_monitor.stop()
+    stall_detector.stop()
+    report = await chat_manager.graceful_shutdown(settings.ws_shutdown_timeout)
     logger.info(
-        f"Chat manager shutdown: "
-        f"closed={report.closed_count}, failed={report.failed_count}"
+        "Chat manager shutdown: closed=%d, failed=%d, timed_out=%d",
+        report.closed_count, report.failed_count, report.timed_out_count,
+        extra={"closed": report.closed_count, "failed": report.failed_count,
+               "timed_out": report.timed_out_count},
+    )
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains chat connections before closing them.
+
+    On shutdown uvicorn closes every open WebSocket (code 1012) before the
+    lifespan shutdown runs, which would leave nothing to drain. This
+    server stops listening, drains the chat connections and only then
+    lets uvicorn finish shutting down.
+    """
+
+    async def shutdown(self, sockets: Optional[list[socket.socket]] = None) -> None:
+        for server in self.servers:
+            server.close()
+        await chat_manager.graceful_shutdown(settings.ws_shutdown_timeout)
+        await super().shutdown(sockets=sockets)
+
+
+def serve_worker(config: uvicorn.Config, sockets: list[socket.socket]) -> None:
+    """Run one worker's ``DrainingServer`` on the shared sockets.
+
+    Under ``python -m`` this function may come from the copy of this
+    module run as ``__main__``. The server is therefore taken from the
+    module the app is imported from, so it drains that module's chat
+    manager.
+    """
+    module = importlib.import_module("portfolio_backend.main")
+    module.DrainingServer(config).run(sockets=sockets)
+
+
+def serve_workers(config: uvicorn.Config) -> None:
+    """Serve the app from ``config.workers`` processes that drain on shutdown.
+
+    uvicorn's own supervisor runs plain servers, which close chat
+    connections without draining them. Here every worker runs a
+    ``DrainingServer`` on one shared listening socket. A worker that exits
+    is replaced, unless it failed to start. SIGINT and SIGTERM are passed
+    on as SIGTERM, so every worker drains before the supervisor exits.
+
+    Args:
+        config: uvicorn configuration with the app as an import string
+    """
+    sock = config.bind_socket()
+    stopping = threading.Event()
+
+    def spawn() -> Any:
+        process = get_subprocess(config, partial(serve_worker, config), sockets=[sock])
+        process.start()
+        return process
+
+    def on_signal(signum: int, frame: Any) -> None:
+        stopping.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, on_signal)
+
+    processes = [spawn() for _ in range(config.workers)]
+    logger.info("Started %d workers", len(processes), extra={"workers": len(processes)})
+    while not stopping.wait(0.5):
+        for index, process in enumerate(processes):
+            if process.is_alive():
+                continue
+            if process.exitcode == STARTUP_FAILURE:
+                logger.error("Worker %s failed to start", process.pid)
+                stopping.set()
+                break
+            logger.warning(
+                "Worker %s exited with code %s; restarting", process.pid, process.exitcode
+            )
+            processes[index] = spawn()
+
+    for process in processes:
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+    for process in processes:
+        process.join()
+    sock.close()
+
+
+def uses_app_compression(compression: Optional[str], subprotocol: Optional[str]) -> bool:
+    """Whether a connection gets large frames compressed by the app.
+
+    Args:
+        compression: The ``compression`` query parameter
+        subprotocol: The negotiated subprotocol
+
+    Returns:
+        True for JSON clients that asked for ``deflate`` while shared
+        frame compression is enabled
+    """
+    return (
+        compression == COMPRESSION_DEFLATE
+        and subprotocol != SUBPROTOCOL_MSGPACK
+        and settings.ws_compression_threshold > 0
     )
 
 
+class ChatWebSocketProtocol(WebSocketsSansIOProtocol):
+    """uvicorn WebSocket protocol with chat-aware permessage-deflate.
+
+    The deflate window and memory level of each connection come from the
+    settings. Connections that get compressed frames from the app
+    (``?compression=deflate``) are not offered permessage-deflate, which
+    would only spend CPU deflating zlib streams a second time.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if self.conn.available_extensions:
+            window_bits = settings.ws_per_message_deflate_window_bits
+            self.conn.available_extensions = [
+                ServerPerMessageDeflateFactory(
+                    server_max_window_bits=window_bits,
+                    client_max_window_bits=window_bits,
+                    compress_settings={"memLevel": settings.ws_per_message_deflate_mem_level},
+                )
+            ]
+
+    def handle_connect(self, event: HandshakeRequest) -> None:
+        _, _, query_string = event.path.partition("?")
+        compression = parse_qs(query_string).get("compression", [None])[-1]
+        requested = [
+            token.strip()
+            for header in event.headers.get_all("Sec-WebSocket-Protocol")
+            for token in header.split(",")
+        ]
+        subprotocol = negotiate_subprotocol(requested, allow_msgpack=settings.ws_msgpack)
+        if uses_app_compression(compression, subprotocol):
+            self.conn.available_extensions = []
+        super().handle_connect(event)
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
@@ -75,127 +406,471 @@ app.add_middleware(
 )
 
 
+async def send_payload(websocket: WebSocket, payload: Any, binary: bool) -> None:
+    """Send a payload directly in the connection's wire format."""
+    if binary:
+        await websocket.send_bytes(encode_binary(payload))
+    else:
+        await websocket.send_text(encode_message(payload))
+
+
+async def receive_payload(websocket: WebSocket) -> Any:
+    """Receive and decode one frame (JSON text or MessagePack binary)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    return decode_frame(message)
+
+
 # Routes
 @app.get("/health")
-async def health_check() -> dict:
-    """Health check endpoint."""
-    return {
+async def health_check() -> JSONResponse:
+    """Health check endpoint; 503 while draining for shutdown."""
+    if not chat_manager.accepting:
+        return JSONResponse(status_code=503, content={
+            "status": "draining",
+            "service": settings.app_name,
+            "version": settings.app_version,
+        })
+    return JSONResponse(content={
         "status": "ok",
         "service": settings.app_name,
         "version": settings.app_version,
-    }
+    })
 
 
 @app.get("/api/stats")
 async def get_stats() -> dict:
     """Get chat statistics."""
     return {
-        "active_users": chat_manager.get_connection_count(),
-        "total_messages": len(chat_manager.message_history),
+        "active_users": chat_manager.get_user_count(),
+        "worker_users": chat_manager.get_connection_count(),
+        "total_messages": chat_manager.get_message_count(),
+        "messages_received": metrics.messages_received.value,
+        "rooms": len(chat_manager.rooms),
+        "degraded_users": chat_manager.ws_manager.get_degraded_count(),
+        "rejected_connections": admission.rejected,
+        "rate_limited_messages": rate_limiter.limited,
+        "overload_dropped_messages": rate_limiter.overloaded,
+        "rate_limit_disconnects": rate_limiter.disconnected,
+        "dropped_log_records": getattr(get_queue_handler(), "dropped", 0),
     }
 
 
-@app.websocket("/ws/chat")
-async def websocket_chat(
-    websocket: WebSocket,
-    username: str = Query(...)
-) -> None:
-    """WebSocket endpoint for real-time chat.
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an entity tag.
 
-    Query parameters:
-        username: Username for the chat (required)
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
     """
-    await websocket.accept()
-
-    # Validate username
-    sanitized_username = message_validator.sanitize_username(
-        username,
-        max_length=settings.max_username_length
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@app.get("/api/history")
+async def get_history(
+    request: Request,
+    room: str = Query(DEFAULT_ROOM),
+    before: Optional[str] = Query(None, max_length=64),
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=100),
+) -> Response:
+    """Get a page of a room's chat history without opening a WebSocket.
+
+    Revalidation with the ETag returns 304 before any page is built.
+    """
+    sanitized_room = message_validator.sanitize_room(room, max_length=settings.max_room_length)
+    if not sanitized_room:
+        raise HTTPException(status_code=400, detail="Invalid room")
+    etag = chat_manager.history_etag(sanitized_room)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        metrics.history_not_modified.inc()
+        return Response(status_code=304, headers=headers)
+    try:
+        page = chat_manager.history_page(sanitized_room, before=before, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return Response(page, media_type="application/json", headers=headers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """Serve metrics in the Prometheus text exposition format."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
     )
 
-    if not sanitized_username:
-        await websocket.send_json({
-            "type": "error",
-            "message": "Invalid username"
-        })
-        await websocket.close(code=1008, reason="Invalid username")
-        return
 
-    # Generate client ID
-    client_id = str(uuid.uuid4())
+@app.get("/debug/stalls")
+async def get_stalls() -> dict:
+    """Get recent event loop stalls with the stacks that caused them."""
+    if settings.diagnostics_stall_threshold <= 0:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "threshold": stall_detector.threshold,
+        "count": stall_detector.count,
+        "stalls": stall_detector.recent(),
+    }
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: float = Query(5.0, gt=0),
+    interval: float = Query(DEFAULT_PROFILE_INTERVAL, ge=0.001, le=1.0),
+) -> PlainTextResponse:
+    """Sample the event loop's stack and return collapsed stacks.
 
+    The loop keeps serving clients while the profile is taken, so the
+    samples show where it spends its time under real load.
+    """
+    if not settings.diagnostics_profiler_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    seconds = min(seconds, settings.diagnostics_profile_max_seconds)
     try:
-        # Connect user
-        await chat_manager.connect(client_id, websocket, sanitized_username)
-        await chat_manager.send_user_count()
+        counts = await asyncio.get_running_loop().run_in_executor(
+            None, profiler.profile, threading.get_ident(), seconds, interval
+        )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    filename = f"profile-{int(time.time())}.folded"
+    return PlainTextResponse(
+        format_collapsed(counts),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-        logger.info(f"User connected: {sanitized_username} ({client_id})")
 
-        # Handle incoming messages
-        while True:
-            data = await websocket.receive_json()
+@app.get("/api/stats/queues")
+async def get_queue_stats() -> dict:
+    """Get outbound queue totals across this worker's clients."""
+    outbounds = [
+        connection.outbound for connection in chat_manager.ws_manager._connections.values()
+        if connection.outbound is not None
+    ]
+    return {
+        "queues": len(outbounds),
+        "queued_frames": sum(outbound.depth for outbound in outbounds),
+        "max_depth": max((outbound.depth for outbound in outbounds), default=0),
+        "dropped": sum(outbound.dropped for outbound in outbounds),
+        "overflows": sum(outbound.overflows for outbound in outbounds),
+    }
 
-            # Handle heartbeat pong
-            if data.get("type") == "pong":
-                await chat_manager.ws_manager.handle_pong(client_id)
-                continue
 
-            # Handle chat message
-            if data.get("type") == "message":
-                message_content = data.get("content", "").strip()
+@app.get("/debug/queues")
+async def get_queue_clients(limit: int = Query(10, ge=1, le=100)) -> dict:
+    """Get the clients with the deepest outbound queues."""
+    if not settings.diagnostics_queues_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    connections = sorted(
+        chat_manager.ws_manager._connections.values(),
+        key=lambda connection: connection.queue_depth,
+        reverse=True,
+    )[:limit]
+    return {
+        "clients": [
+            {
+                "client_id": connection.client_id,
+                "username": connection.username,
+                "queue_depth": connection.queue_depth,
+                "dropped": connection.outbound.dropped if connection.outbound else 0,
+            }
+            for connection in connections
+        ],
+    }
 
-                # Validate message
-                sanitized_message = message_validator.sanitize_message(
-                    message_content,
-                    max_length=settings.max_message_length
-                )
 
-                if not sanitized_message:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Invalid message"
-                    })
-                    continue
+@app.websocket("/ws/chat")
+async def websocket_chat(
+    websocket: WebSocket,
+    username: str = Query(...),
+    since: Optional[str] = Query(None, max_length=64),
+    room: str = Query(DEFAULT_ROOM),
+    compression: Optional[str] = Query(None, max_length=16),
+) -> None:
+    """WebSocket endpoint for real-time chat.
 
-                # Check for dangerous patterns
-                if message_validator.is_dangerous(sanitized_message):
-                    logger.warning(
-                        f"Dangerous message from {sanitized_username}: "
-                        f"{message_content}"
-                    )
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Message contains invalid content"
-                    })
-                    continue
+    Query parameters:
+        username: Username for the chat (required)
+        since: Sequence number or ID of the last message seen (optional);
+            only newer messages are replayed when it is still in history
+        room: Room to join (optional, defaults to the general room)
+        compression: ``deflate`` to receive large frames as compressed
+            binary frames (optional, JSON clients only)
+
+    Clients that request the ``msgpack`` subprotocol exchange MessagePack
+    binary frames instead of JSON text.
+    """
+    if not chat_manager.accepting:
+        # Shutting down: send the client elsewhere, after a random delay
+        await websocket.accept()
+        retry_after = chat_manager.ws_manager.reconnect_hint()
+        await send_payload(websocket, {"type": "reconnect", "retry_after": retry_after}, False)
+        await websocket.close(
+            code=GOING_AWAY_CLOSE_CODE, reason=f"retry-after={math.ceil(retry_after)}"
+        )
+        return
 
-                # Store and broadcast message
-                await chat_manager.send_message(
+    decision = admission.try_admit(chat_manager.get_connection_count())
+    # Held from here until the client is registered, whichever way the
+    # handshake ends
+    reserved = decision.admitted
+    try:
+        subprotocol = negotiate_subprotocol(
+            websocket.scope.get("subprotocols", []),
+            allow_msgpack=settings.ws_msgpack,
+        )
+        binary = subprotocol == SUBPROTOCOL_MSGPACK
+        compressed = uses_app_compression(compression, subprotocol)
+        await websocket.accept(subprotocol=subprotocol)
+
+        if not decision.admitted:
+            retry_after = math.ceil(decision.retry_after)
+            await send_payload(websocket, {
+                "type": "error",
+                "message": "Server busy, please retry later",
+                "retry_after": retry_after,
+            }, binary)
+            await websocket.close(code=REJECT_CLOSE_CODE, reason=f"retry-after={retry_after}")
+            return
+
+        # Validate username
+        sanitized_username = message_validator.sanitize_username(
+            username,
+            max_length=settings.max_username_length
+        )
+
+        if not sanitized_username:
+            await send_payload(websocket, {
+                "type": "error",
+                "message": "Invalid username"
+            }, binary)
+            await websocket.close(code=1008, reason="Invalid username")
+            return
+
+        # Validate room
+        sanitized_room = message_validator.sanitize_room(
+            room,
+            max_length=settings.max_room_length
+        )
+
+        if not sanitized_room:
+            await send_payload(websocket, {
+                "type": "error",
+                "message": "Invalid room"
+            }, binary)
+            await websocket.close(code=1008, reason="Invalid room")
+            return
+
+        # One shared string per name for this connection, its messages and
+        # everyone else's under the same name
+        sanitized_username = sys.intern(sanitized_username)
+        sanitized_room = sys.intern(sanitized_room)
+
+        # Duplicate usernames, found through the username index
+        duplicate_policy = settings.chat_duplicate_username_policy
+        if duplicate_policy == "reject" and chat_manager.is_user_online(sanitized_username):
+            await send_payload(websocket, {
+                "type": "error",
+                "message": "Username already in use"
+            }, binary)
+            await websocket.close(code=1008, reason="Username already in use")
+            return
+        # Generate client ID
+        client_id = str(uuid.uuid4())
+
+        if duplicate_policy == "replace":
+            # Delivered through the backplane, possibly once this client is
+            # connected, so it is spared by ID
+            await chat_manager.kick_user(
+                sanitized_username,
+                code=REPLACED_CLOSE_CODE,
+                reason="Signed in elsewhere",
+                exclude_client=client_id,
+            )
+
+        rate_limiter.register(client_id, sanitized_username)
+
+        try:
+            # Connect user
+            try:
+                await chat_manager.connect(
                     client_id,
+                    websocket,
                     sanitized_username,
-                    sanitized_message
+                    since=since,
+                    degraded=decision.outcome == ADMIT_DEGRADED,
+                    room=sanitized_room,
+                    binary=binary,
+                    compressed=compressed,
                 )
+            finally:
+                # Registered (or gone): the reservation is no longer needed
+                admission.release()
+                reserved = False
+
+            logger.info(
+                "User connected: %s (%s) to %s", sanitized_username, client_id, sanitized_room,
+                extra={
+                    "client_id": client_id,
+                    "username": sanitized_username,
+                    "room": sanitized_room,
+                },
+            )
+
+            # Handle incoming messages
+            while True:
+                data = await receive_payload(websocket)
+
+                # Handle heartbeat pong
+                if data.get("type") == "pong":
+                    await chat_manager.ws_manager.handle_pong(client_id)
+                    continue
 
-                logger.info(
-                    f"Message from {sanitized_username}: {sanitized_message}"
-                )
+                # Handle chat and direct messages
+                if data.get("type") in ("message", "dm"):
+                    metrics.messages_received.inc()
+
+                    # Rate limit before any validation or broadcast work
+                    rate = rate_limiter.check(client_id)
+                    if rate.outcome == RATE_DISCONNECT:
+                        logger.warning(
+                            "Disconnecting %s (%s) for flooding", sanitized_username, client_id,
+                            extra={"client_id": client_id, "username": sanitized_username},
+                        )
+                        await chat_manager.ws_manager.evict(client_id, code=RATE_LIMIT_CLOSE_CODE)
+                        return
+                    if not rate.allowed:
+                        if settings.chat_rate_limit_action == "error":
+                            await chat_manager.ws_manager.send_to_client(client_id, {
+                                "type": "error",
+                                "message": (
+                                    "Server busy, message dropped"
+                                    if rate.outcome == RATE_OVERLOADED
+                                    else "Rate limit exceeded"
+                                ),
+                                "retry_after": round(rate.retry_after, 2),
+                            })
+                        continue
+
+                    message_content = data.get("content", "").strip()
+                    is_direct = data.get("type") == "dm"
+
+                    # Validate, check for dangerous patterns and sanitize
+                    started = time.perf_counter()
+                    verdict = message_validator.validate_message(
+                        message_content,
+                        max_length=settings.max_message_length
+                    )
+                    metrics.validation_seconds.observe(time.perf_counter() - started)
+                    if verdict.value is None:
+                        metrics.messages_rejected.inc()
+
+                    if verdict.reason == REASON_DANGEROUS:
+                        extra = {
+                            "client_id": client_id,
+                            "username": sanitized_username,
+                            "rule": verdict.rule,
+                        }
+                        # Direct messages are private; their text is never logged
+                        if not is_direct:
+                            extra["content"] = message_content
+                        logger.warning(
+                            "Dangerous message from %s (rule %r)", sanitized_username, verdict.rule,
+                            extra=extra,
+                        )
+                        await chat_manager.ws_manager.send_to_client(client_id, {
+                            "type": "error",
+                            "message": "Message contains invalid content"
+                        })
+                        continue
+
+                    sanitized_message = verdict.value
+                    if sanitized_message is None:
+                        await chat_manager.ws_manager.send_to_client(client_id, {
+                            "type": "error",
+                            "message": "Invalid message"
+                        })
+                        continue
+
+                    if is_direct:
+                        recipient = message_validator.sanitize_username(
+                            str(data.get("to", "")),
+                            max_length=settings.max_username_length
+                        )
+                        # With a single worker every connected user is known here
+                        if not recipient or (
+                            settings.backplane == "memory"
+                            and not chat_manager.is_user_online(recipient)
+                        ):
+                            await chat_manager.ws_manager.send_to_client(client_id, {
+                                "type": "error",
+                                "message": "User not online"
+                            })
+                            continue
+
+                        await chat_manager.send_direct_message(
+                            sanitized_username, recipient, sanitized_message
+                        )
+                        logger.info(
+                            "Direct message from %s to %s", sanitized_username, recipient,
+                            extra={
+                                "client_id": client_id,
+                                "username": sanitized_username,
+                                "to": recipient,
+                                "sampled": True,
+                            },
+                        )
+                        continue
+
+                    # Store and broadcast message
+                    await chat_manager.send_message(
+                        client_id,
+                        sanitized_username,
+                        sanitized_message,
+                        room=sanitized_room,
+                    )
 
-    except WebSocketDisconnect:
-        await chat_manager.disconnect(client_id)
-        await chat_manager.send_user_count()
-        logger.info(f"User disconnected: {sanitized_username} ({client_id})")
+                    logger.info(
+                        "Message from %s", sanitized_username,
+                        extra={
+                            "client_id": client_id,
+                            "username": sanitized_username,
+                            "room": sanitized_room,
+                            "content": sanitized_message,
+                            "sampled": True,
+                        },
+                    )
 
-    except Exception as e:
-        logger.error(f"WebSocket error for {client_id}: {e}")
-        try:
+        except WebSocketDisconnect:
             await chat_manager.disconnect(client_id)
-        except Exception:
-            pass
+            logger.info(
+                "User disconnected: %s (%s)", sanitized_username, client_id,
+                extra={"client_id": client_id, "username": sanitized_username},
+            )
+
+        except Exception as e:
+            logger.error("WebSocket error for %s: %s", client_id, e, extra={"client_id": client_id})
+            try:
+                await chat_manager.disconnect(client_id)
+            except Exception:
+                pass
+
+        finally:
+            rate_limiter.release(client_id)
+    finally:
+        if reserved:
+            admission.release()
 
 
 # Error handlers
 @app.exception_handler(HTTPException)
-async def http_exception_handler(request, exc):
+async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
     """Handle HTTP exceptions."""
     return JSONResponse(
         status_code=exc.status_code,
@@ -204,21 +879,42 @@ async def http_exception_handler(request, exc):
 
 
 @app.exception_handler(Exception)
-async def general_exception_handler(request, exc):
+async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle general exceptions."""
-    logger.error(f"Unhandled exception: {exc}")
+    logger.error("Unhandled exception: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"},
     )
 
 
-if __name__ == "__main__":
-    import uvicorn
+def run() -> None:
+    """Serve the app, draining chat connections on shutdown.
 
-    uvicorn.run(
-        app,
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
-    )
+    With ``server_workers`` above 1, the app is served from that many
+    processes by ``serve_workers``. With ``debug`` on, uvicorn's reloader
+    serves a fresh import of the app in a subprocess instead; connections
+    are not drained there.
+    """
+    options: dict[str, Any] = {
+        "host": settings.host,
+        "port": settings.port,
+        "ws": ChatWebSocketProtocol,
+        "ws_per_message_deflate": settings.ws_per_message_deflate,
+        "loop": settings.server_loop,
+        "http": settings.server_http,
+    }
+    if settings.debug:
+        uvicorn.run("portfolio_backend.main:app", reload=True, **options)
+    elif settings.server_workers > 1:
+        if settings.backplane != "unix":
+            logger.warning("Workers do not share chat state without BACKPLANE=unix")
+        serve_workers(uvicorn.Config(
+            "portfolio_backend.main:app", workers=settings.server_workers, **options
+        ))
+    else:
+        DrainingServer(uvicorn.Config(app, **options)).run()
+
+
+if __name__ == "__main__":
+    run()
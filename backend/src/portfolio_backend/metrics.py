@@ -0,0 +1,336 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Instruments are recorded from the event loop thread only, so they are plain
+attribute updates with no locks: a counter increment is an addition and a
+histogram observation is a bisect over a short tuple of bucket bounds.
+That keeps them cheap enough to leave on in production. Gauges that
+describe current state (connections, queue depths) are computed from a
+callback when ``/metrics`` is scraped rather than maintained on every
+change.
+
+Each worker process reports its own metrics.
+"""
+
+import asyncio
+import bisect
+import math
+from typing import Callable, Dict, Iterable, Optional, TypeVar, Union
+
+# Upper bounds in seconds, roughly x2.5 apart, from 100us to 10s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Broadcast recipients per call
+FANOUT_BUCKETS = (1, 10, 100, 1000, 10000)
+
+DEFAULT_LOOP_LAG_INTERVAL = 0.5
+
+
+def _format_labels(labels: Optional[Dict[str, str]], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in (labels or {}).items()]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonically increasing count, incremented or read from a callback."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Optional[Dict[str, str]] = None,
+        read: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.read = read
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """Add to the counter."""
+        self.value += amount
+
+    def samples(self) -> Iterable[str]:
+        value = self.read() if self.read is not None else self.value
+        yield f"{self.name}{_format_labels(self.labels)} {_format_value(value)}"
+
+
+class Gauge:
+    """Current value, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Optional[Dict[str, str]] = None,
+        read: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.read = read
+        self.value: float = 0
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        self.value = value
+
+    def samples(self) -> Iterable[str]:
+        value = self.read() if self.read is not None else self.value
+        yield f"{self.name}{_format_labels(self.labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Distribution of observations over fixed buckets.
+
+    Besides the cumulative bucket counts, the sum and the count, the
+    largest observation since the previous scrape is exported as a
+    ``<name>_max`` gauge, since bucket bounds hide the worst case.
+    Quantiles (p50, p99) are estimated from the buckets, either by
+    Prometheus' ``histogram_quantile`` or by ``quantile``.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        buckets: tuple = LATENCY_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.bounds: tuple[float, ...] = tuple(sorted(buckets))
+        # One count per bound plus the +Inf overflow bucket (not cumulative)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The estimate, or 0.0 without observations. Observations above
+            the last bound are reported as the last bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def samples(self) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, le)} {cumulative}"
+        labels = _format_labels(self.labels)
+        yield f"{self.name}_sum{labels} {_format_value(self.sum)}"
+        yield f"{self.name}_count{labels} {self.count}"
+
+    def max_samples(self) -> Iterable[str]:
+        yield f"{self.name}_max{_format_labels(self.labels)} {_format_value(self.max)}"
+        self.max = 0.0
+
+
+Instrument = Union[Counter, Gauge, Histogram]
+T = TypeVar("T", Counter, Gauge, Histogram)
+
+
+class MetricsRegistry:
+    """Named instruments rendered together in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        # Instruments sharing a name are label variants of one family
+        self._families: Dict[str, list[Instrument]] = {}
+
+    def _add(self, instrument: T) -> T:
+        family = self._families.setdefault(instrument.name, [])
+        if family and family[0].kind != instrument.kind:
+            raise ValueError(f"Metric {instrument.name} already registered as {family[0].kind}")
+        family.append(instrument)
+        return instrument
+
+    def counter(
+        self,
+        name: str,
+        doc: str,
+        labels: Optional[Dict[str, str]] = None,
+        read: Optional[Callable[[], int]] = None,
+    ) -> Counter:
+        """Register a counter, optionally read from ``read`` at scrape time."""
+        return self._add(Counter(name, doc, labels, read))
+
+    def gauge(
+        self,
+        name: str,
+        doc: str,
+        labels: Optional[Dict[str, str]] = None,
+        read: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        """Register a gauge, optionally read from ``read`` at scrape time."""
+        return self._add(Gauge(name, doc, labels, read))
+
+    def histogram(
+        self,
+        name: str,
+        doc: str,
+        buckets: tuple = LATENCY_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Histogram:
+        """Register a histogram."""
+        return self._add(Histogram(name, doc, buckets, labels))
+
+    def render(self) -> str:
+        """Render every instrument in the Prometheus text exposition format."""
+        lines = []
+        for name, family in self._families.items():
+            first = family[0]
+            lines.append(f"# HELP {name} {first.doc}")
+            lines.append(f"# TYPE {name} {first.kind}")
+            for instrument in family:
+                lines.extend(instrument.samples())
+            if isinstance(first, Histogram):
+                lines.append(f"# HELP {name}_max Largest observation since the previous scrape")
+                lines.append(f"# TYPE {name}_max gauge")
+                for instrument in family:
+                    assert isinstance(instrument, Histogram)
+                    lines.extend(instrument.max_samples())
+        return "\n".join(lines) + "\n"
+
+
+class ChatMetrics:
+    """The chat server's instruments.
+
+    Hot paths hold a reference to this object and update its instruments
+    directly. Gauges over live state, and counters other components
+    already keep, are registered by their owners with ``read`` callbacks.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.messages_received = r.counter(
+            "chat_messages_received_total", "Chat messages received from clients"
+        )
+        self.messages_rejected = r.counter(
+            "chat_messages_rejected_total", "Chat messages rejected by validation"
+        )
+        self.direct_messages = r.counter(
+            "chat_direct_messages_total", "Direct messages sent by clients on this worker"
+        )
+        self.validation_seconds = r.histogram(
+            "chat_validation_seconds", "Time to validate and sanitize a chat message"
+        )
+        self.broadcast_seconds = r.histogram(
+            "chat_broadcast_seconds",
+            "Time to fan a broadcast out to local recipients (queued: enqueue only)",
+        )
+        self.broadcast_recipients = r.histogram(
+            "chat_broadcast_recipients", "Local recipients per broadcast", buckets=FANOUT_BUCKETS
+        )
+        self.send_failures = r.counter(
+            "chat_send_failures_total", "Sends that failed", labels={"reason": "error"}
+        )
+        self.send_timeouts = r.counter(
+            "chat_send_failures_total", "Sends that failed", labels={"reason": "timeout"}
+        )
+        self.send_overflows = r.counter(
+            "chat_send_failures_total", "Sends that failed", labels={"reason": "overflow"}
+        )
+        self.connections_opened = r.counter(
+            "chat_connections_opened_total", "Connections registered"
+        )
+        self.connections_closed = r.counter(
+            "chat_connections_closed_total", "Connections closed", labels={"reason": "disconnect"}
+        )
+        self.connections_evicted = r.counter(
+            "chat_connections_closed_total", "Connections closed", labels={"reason": "evicted"}
+        )
+        self.history_not_modified = r.counter(
+            "chat_history_not_modified_total",
+            "History requests answered 304 Not Modified from the ETag alone",
+        )
+        self.bot_reply_seconds = r.histogram(
+            "chat_bot_reply_seconds", "Time from a triggering message to the bot reply"
+        )
+        self.loop_lag_seconds = r.histogram(
+            "event_loop_lag_seconds", "How late the event loop ran a scheduled callback"
+        )
+
+
+class LoopLagMonitor:
+    """Measure event loop lag by how late a periodic sleep wakes up.
+
+    Costs one timer per interval; any time past the deadline is time the
+    loop spent on other callbacks, i.e. blocking work.
+    """
+
+    def __init__(self, histogram: Histogram, interval: float = DEFAULT_LOOP_LAG_INTERVAL) -> None:
+        """Initialize the monitor.
+
+        Args:
+            histogram: Histogram the lag is recorded in
+            interval: Seconds between probes (0 disables the monitor)
+        """
+        self.histogram = histogram
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start probing."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop probing."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.histogram.observe(max(0.0, loop.time() - deadline))
@@ -0,0 +1,214 @@
+"""Bounded per-connection outbound queues with backpressure."""
+
+import asyncio
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from .codec import Frame
+
+# Overflow policies applied when a queue reaches its high-water mark
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_COALESCE = "coalesce"
+POLICY_DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT)
+
+# Results of OutboundQueue.put
+PUT_QUEUED = "queued"
+PUT_DROPPED = "dropped"
+PUT_OVERFLOW = "overflow"
+PUT_CLOSED = "closed"
+
+
+class OutboundQueue:
+    """Bounded FIFO of encoded frames drained by a connection's writer task.
+
+    Producers never block: ``put`` is synchronous and applies the overflow
+    policy as soon as the queue reaches ``high_water``. ``drop_oldest`` and
+    ``coalesce`` trim the backlog back down to ``low_water`` in one go so a
+    lagging reader sheds stale frames in bursts rather than on every put;
+    ``disconnect`` tells the caller to evict the client.
+
+    The writer either takes frames one at a time with ``get`` or several at
+    once with ``get_batch``, which lingers briefly after the first frame so
+    that frames arriving close together leave in a single write.
+    """
+
+    # One queue per connection
+    __slots__ = (
+        "high_water", "low_water", "policy", "dropped", "overflows", "closed",
+        "_frames", "_waiter", "_wake_depth",
+    )
+
+    def __init__(
+        self,
+        high_water: int = 256,
+        low_water: int = 64,
+        policy: str = POLICY_DROP_OLDEST,
+    ) -> None:
+        """Initialize the queue.
+
+        Args:
+            high_water: Depth at which the overflow policy is applied
+            low_water: Depth the queue is trimmed back to on overflow
+            policy: One of ``OVERFLOW_POLICIES``
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.high_water = max(1, high_water)
+        self.low_water = min(max(0, low_water), self.high_water - 1)
+        self.policy = policy
+        self.dropped = 0
+        self.overflows = 0
+        self.closed = False
+        self._frames: Deque[Tuple[Optional[str], Frame]] = deque()
+        # The writer's pending wait, if any. A bare future rather than an
+        # asyncio.Event, whose waiter deque would cost ~700 bytes per queue
+        self._waiter: Optional["asyncio.Future[None]"] = None
+        # Depth at which ``put`` wakes the writer
+        self._wake_depth = 1
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def depth(self) -> int:
+        """Number of frames waiting to be written."""
+        return len(self._frames)
+
+    def put(self, frame: Frame, key: Optional[str] = None) -> str:
+        """Enqueue a frame without blocking.
+
+        Args:
+            frame: Encoded frame
+            key: Optional coalescing key; under the ``coalesce`` policy only
+                the newest queued frame per key survives an overflow
+
+        Returns:
+            ``PUT_QUEUED``, ``PUT_DROPPED`` if older frames were discarded to
+            make room, ``PUT_OVERFLOW`` if the client should be disconnected,
+            or ``PUT_CLOSED`` if the queue no longer accepts frames
+        """
+        if self.closed:
+            return PUT_CLOSED
+
+        self._frames.append((key, frame))
+        if len(self._frames) >= self._wake_depth:
+            self._wake()
+        if len(self._frames) < self.high_water:
+            return PUT_QUEUED
+
+        self.overflows += 1
+        if self.policy == POLICY_DISCONNECT:
+            return PUT_OVERFLOW
+
+        before = len(self._frames)
+        if self.policy == POLICY_COALESCE:
+            self._coalesce()
+        while len(self._frames) > self.low_water:
+            self._frames.popleft()
+        self.dropped += before - len(self._frames)
+        return PUT_DROPPED
+
+    def _coalesce(self) -> None:
+        """Keep only the newest frame for each coalescing key."""
+        seen: set[str] = set()
+        kept: Deque[Tuple[Optional[str], Frame]] = deque()
+        for key, frame in reversed(self._frames):
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.appendleft((key, frame))
+        self._frames = kept
+
+    async def get(self) -> Optional[Frame]:
+        """Wait for the next frame.
+
+        Returns:
+            The oldest queued frame, or None once the queue is closed
+        """
+        while not self._frames:
+            if self.closed:
+                return None
+            await self._wait()
+        return self._frames.popleft()[1]
+
+    async def get_batch(
+        self,
+        max_frames: int,
+        max_bytes: int,
+        window: float,
+    ) -> list[Frame]:
+        """Wait for frames and take several of them at once.
+
+        After the first frame arrives, waits up to ``window`` seconds (or
+        until ``max_frames`` are queued) for more. Of the frames taken, only
+        the newest per coalescing key is kept, since it supersedes the rest.
+
+        Args:
+            max_frames: Most frames to take
+            max_bytes: Byte budget for the frames taken; the first frame is
+                always taken
+            window: Seconds to linger for more frames
+
+        Returns:
+            Frames in queue order, or an empty list once the queue is closed
+        """
+        while not self._frames:
+            if self.closed:
+                return []
+            await self._wait()
+
+        if window > 0 and not self.closed and len(self._frames) < max_frames:
+            self._wake_depth = max_frames
+            try:
+                await asyncio.wait_for(self._wait(), window)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._wake_depth = 1
+
+        taken: list[Tuple[Optional[str], Frame]] = []
+        size = 0
+        while self._frames and len(taken) < max_frames:
+            frame = self._frames[0][1]
+            if taken and size + len(frame) > max_bytes:
+                break
+            taken.append(self._frames.popleft())
+            size += len(frame)
+
+        seen: set[str] = set()
+        frames: list[Frame] = []
+        for key, frame in reversed(taken):
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            frames.append(frame)
+        frames.reverse()
+        return frames
+
+    def close(self, drain: bool = False) -> None:
+        """Stop accepting frames and wake the writer.
+
+        Args:
+            drain: Keep the queued frames, so the writer sends them before
+                ``get`` reports the queue closed; otherwise they are dropped
+        """
+        self.closed = True
+        if not drain:
+            self._frames.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _wait(self) -> None:
+        """Wait until ``_wake`` is called; there is a single consumer."""
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
@@ -0,0 +1,87 @@
+"""Debounced presence updates."""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PresenceChange:
+    """Joins and leaves in a room since the last flush."""
+    joined: int = 0
+    left: int = 0
+
+
+PresenceFlush = Callable[[Dict[str, PresenceChange]], Awaitable[None]]
+
+
+class PresenceDebouncer:
+    """Aggregate presence changes per room and flush them once per tick.
+
+    A wave of joins or leaves then costs one update per room and tick
+    instead of one per connection. With an interval of 0 every change is
+    flushed as soon as it is recorded.
+    """
+
+    def __init__(self, flush: PresenceFlush, interval: float = 0.25) -> None:
+        """Initialize the debouncer.
+
+        Args:
+            flush: Coroutine called with the changes per room collected
+                during a tick; rooms with a change of zero are included
+                when they were marked
+            interval: Seconds between flushes
+        """
+        self.flush = flush
+        self.interval = interval
+        self._pending: Dict[str, PresenceChange] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of rooms waiting to be flushed."""
+        return len(self._pending)
+
+    async def record(self, room: str, joined: int = 0, left: int = 0) -> None:
+        """Record joins and leaves in a room.
+
+        Args:
+            room: Room name
+            joined: Number of members that joined
+            left: Number of members that left
+        """
+        if self.interval <= 0:
+            await self.flush({room: PresenceChange(joined, left)})
+            return
+        change = self._pending.get(room)
+        if change is None:
+            change = self._pending[room] = PresenceChange()
+        change.joined += joined
+        change.left += left
+
+    def start(self) -> None:
+        """Start the flush task."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task; pending changes are discarded."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._pending.clear()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._pending:
+                continue
+            pending, self._pending = self._pending, {}
+            try:
+                await self.flush(pending)
+            except Exception as e:
+                logger.error("Presence flush failed: %s", e)
@@ -0,0 +1,231 @@
+"""Rate limiting primitives."""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Token bucket refilled lazily on each call.
+
+    No timers are involved: the tokens earned since the last call are added
+    when the bucket is next consulted, so an idle bucket costs nothing.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+            now: Current monotonic time
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def consume(self, tokens: float = 1.0, now: Optional[float] = None) -> bool:
+        """Take tokens if available.
+
+        Args:
+            tokens: Number of tokens to take
+            now: Current monotonic time
+
+        Returns:
+            True if the tokens were taken
+        """
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def available(self, tokens: float = 1.0, now: Optional[float] = None) -> bool:
+        """Whether ``tokens`` could be taken now, without taking them."""
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= tokens
+
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until ``tokens`` will be available."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= tokens or self.rate <= 0:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+# Outcomes of MessageRateLimiter.check
+RATE_ALLOW = "allow"
+RATE_LIMITED = "limited"
+RATE_OVERLOADED = "overloaded"
+RATE_DISCONNECT = "disconnect"
+
+
+@dataclass(slots=True)
+class RateDecision:
+    """Outcome of a message rate check."""
+    outcome: str
+    retry_after: float = 0.0
+
+    @property
+    def allowed(self) -> bool:
+        """Whether the message may be processed."""
+        return self.outcome == RATE_ALLOW
+
+
+@dataclass(slots=True)
+class _SharedBucket:
+    bucket: TokenBucket
+    clients: int = 0
+
+
+@dataclass(slots=True)
+class _ClientState:
+    bucket: Optional[TokenBucket]
+    username: str
+    strikes: int = 0
+    last_strike: float = 0.0
+
+
+class MessageRateLimiter:
+    """Limits how fast clients may send chat messages.
+
+    A message must fit three token buckets: one per client ID, one shared
+    by every connection using the same username (so opening more sockets
+    does not buy more throughput), and a global one that caps messages per
+    second for the whole worker to protect broadcast capacity.
+
+    Each message over a client or username limit is a strike; a client that
+    collects ``max_strikes`` strikes with no more than ``strike_window``
+    seconds between them is to be disconnected. Messages turned away by the
+    global budget are not the sender's fault and do not count.
+
+    Tokens are only taken once every bucket admits a message, so a message
+    turned away by one bucket leaves the others untouched. Buckets refill
+    lazily, so idle clients cost nothing but their entry. A rate of 0
+    disables the corresponding bucket.
+    """
+
+    def __init__(
+        self,
+        client_rate: float = 2.0,
+        client_burst: int = 10,
+        username_rate: float = 5.0,
+        username_burst: int = 20,
+        global_rate: float = 0.0,
+        global_burst: int = 400,
+        max_strikes: int = 20,
+        strike_window: float = 10.0,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            client_rate: Messages per second per client
+            client_burst: Messages a client may send in a burst
+            username_rate: Messages per second per username
+            username_burst: Messages a username may send in a burst
+            global_rate: Messages per second for the worker
+            global_burst: Messages the worker accepts in a burst
+            max_strikes: Strikes before a client is disconnected (0 never
+                disconnects)
+            strike_window: Seconds without a strike after which a client's
+                strikes are forgiven
+        """
+        self.client_rate = client_rate
+        self.client_burst = max(1, client_burst)
+        self.username_rate = username_rate
+        self.username_burst = max(1, username_burst)
+        self.max_strikes = max_strikes
+        self.strike_window = strike_window
+        self._clients: Dict[str, _ClientState] = {}
+        # Username buckets with the number of clients sharing them
+        self._usernames: Dict[str, _SharedBucket] = {}
+        self._global: Optional[TokenBucket] = None
+        if global_rate > 0:
+            self._global = TokenBucket(global_rate, max(1, global_burst))
+        self.limited = 0
+        self.overloaded = 0
+        self.disconnected = 0
+
+    def register(self, client_id: str, username: str) -> None:
+        """Start tracking a client.
+
+        Args:
+            client_id: Client identifier
+            username: The client's username
+        """
+        bucket = None
+        if self.client_rate > 0:
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+        self._clients[client_id] = _ClientState(bucket, username)
+        if self.username_rate > 0:
+            shared = self._usernames.get(username)
+            if shared is None:
+                shared = self._usernames[username] = _SharedBucket(
+                    TokenBucket(self.username_rate, self.username_burst)
+                )
+            shared.clients += 1
+
+    def release(self, client_id: str) -> None:
+        """Stop tracking a client; a username's bucket goes with its last client."""
+        state = self._clients.pop(client_id, None)
+        if state is None:
+            return
+        shared = self._usernames.get(state.username)
+        if shared is not None:
+            shared.clients -= 1
+            if shared.clients <= 0:
+                del self._usernames[state.username]
+
+    def check(self, client_id: str, now: Optional[float] = None) -> RateDecision:
+        """Check whether a client may send a message now.
+
+        Args:
+            client_id: Client identifier
+            now: Current monotonic time
+
+        Returns:
+            Decision with a retry hint when the message is turned away
+        """
+        state = self._clients.get(client_id)
+        if state is None:
+            return RateDecision(RATE_ALLOW)
+        now = time.monotonic() if now is None else now
+
+        buckets = (state.bucket, self._username_bucket(state.username))
+        for bucket in buckets:
+            if bucket is not None and not bucket.available(now=now):
+                return self._strike(state, bucket.wait_time(now=now), now)
+
+        if self._global is not None and not self._global.available(now=now):
+            self.overloaded += 1
+            return RateDecision(RATE_OVERLOADED, self._global.wait_time(now=now))
+
+        for bucket in buckets + (self._global,):
+            if bucket is not None:
+                bucket.consume(now=now)
+        return RateDecision(RATE_ALLOW)
+
+    def _username_bucket(self, username: str) -> Optional[TokenBucket]:
+        shared = self._usernames.get(username)
+        return shared.bucket if shared is not None else None
+
+    def _strike(self, state: _ClientState, retry_after: float, now: float) -> RateDecision:
+        """Record a strike and decide whether to escalate."""
+        if now - state.last_strike > self.strike_window:
+            state.strikes = 0
+        state.strikes += 1
+        state.last_strike = now
+        if self.max_strikes and state.strikes >= self.max_strikes:
+            self.disconnected += 1
+            return RateDecision(RATE_DISCONNECT, retry_after)
+        self.limited += 1
+        return RateDecision(RATE_LIMITED, retry_after)
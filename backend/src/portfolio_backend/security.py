@@ -2,7 +2,29 @@
 
 import html
 import re
-from typing import Optional
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# Reasons reported by ValidationVerdict
+REASON_EMPTY = "empty"
+REASON_TOO_LONG = "too_long"
+REASON_DANGEROUS = "dangerous"
+
+
+@dataclass(frozen=True)
+class ValidationVerdict:
+    """Result of validating a piece of user input.
+
+    Attributes:
+        ok: Whether the input was accepted
+        value: Sanitized input when accepted, None otherwise
+        reason: Why the input was rejected (one of the ``REASON_*`` values)
+        rule: The dangerous pattern that matched, for ``REASON_DANGEROUS``
+    """
+    ok: bool
+    value: Optional[str] = None
+    reason: Optional[str] = None
+    rule: Optional[str] = None
 
 
 class MessageValidator:
@@ -22,6 +44,13 @@ class MessageValidator:
         r"<img[^>]*src",
     ]
 
+    # All dangerous patterns as one alternation, matched against lowercased
+    # text. Capturing groups and re.IGNORECASE both defeat the regex engine's
+    # fast paths, so the rule is identified separately, and only on a match.
+    _DANGEROUS_RE = re.compile("|".join(f"(?:{pattern})" for pattern in DANGEROUS_PATTERNS))
+    _DANGEROUS_RULES = [(pattern, re.compile(pattern)) for pattern in DANGEROUS_PATTERNS]
+    _USERNAME_RE = re.compile(r"[a-zA-Z0-9_-]+")
+
     @staticmethod
     def sanitize_message(message: str, max_length: int = 1000) -> Optional[str]:
         """Sanitize a message for security.
@@ -72,7 +101,7 @@ class MessageValidator:
             return None
 
         # Only allow alphanumeric, underscore, hyphen
-        if not re.match(r"^[a-zA-Z0-9_-]+$", username):
+        if not MessageValidator._USERNAME_RE.fullmatch(username):
             return None
 
         # HTML escape
@@ -80,6 +109,46 @@ class MessageValidator:
 
         return username
 
+    @staticmethod
+    def sanitize_room(room: str, max_length: int = 50) -> Optional[str]:
+        """Validate a room name.
+
+        Room names follow the username rules: alphanumeric, underscore and
+        hyphen only.
+
+        Args:
+            room: Raw room name from the query string
+            max_length: Maximum allowed room name length
+
+        Returns:
+            Room name or None if invalid
+        """
+        if not room or len(room) > max_length:
+            return None
+        room = room.strip()
+        if not room or not MessageValidator._USERNAME_RE.fullmatch(room):
+            return None
+        return room
+
+    @staticmethod
+    def find_dangerous(message: str) -> Optional[str]:
+        """Find the first dangerous pattern in a message.
+
+        Args:
+            message: Message to check
+
+        Returns:
+            The matching entry of ``DANGEROUS_PATTERNS``, or None
+        """
+        message_lower = message.lower()
+        match = MessageValidator._DANGEROUS_RE.search(message_lower)
+        if match is None:
+            return None
+        for pattern, compiled in MessageValidator._DANGEROUS_RULES:
+            if compiled.match(message_lower, match.start()):
+                return pattern
+        return None
+
     @staticmethod
     def is_dangerous(message: str) -> bool:
         """Check if message contains dangerous patterns.
@@ -90,8 +159,51 @@ class MessageValidator:
         Returns:
             True if dangerous patterns found
         """
-        message_lower = message.lower()
-        for pattern in MessageValidator.DANGEROUS_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                return True
-        return False
+        return MessageValidator._DANGEROUS_RE.search(message.lower()) is not None
+
+    @staticmethod
+    def validate_message(message: str, max_length: int = 1000) -> ValidationVerdict:
+        """Validate and sanitize a message in a single pass.
+
+        Checks length, strips whitespace, scans the raw text once for
+        dangerous patterns and only then HTML-escapes it, so rejected
+        messages are never escaped.
+
+        Args:
+            message: Raw message from user
+            max_length: Maximum allowed message length
+
+        Returns:
+            Verdict carrying the sanitized message or the rejection reason
+        """
+        if not message:
+            return ValidationVerdict(ok=False, reason=REASON_EMPTY)
+        if len(message) > max_length:
+            return ValidationVerdict(ok=False, reason=REASON_TOO_LONG)
+
+        message = message.strip()
+        if not message:
+            return ValidationVerdict(ok=False, reason=REASON_EMPTY)
+
+        rule = MessageValidator.find_dangerous(message)
+        if rule is not None:
+            return ValidationVerdict(ok=False, reason=REASON_DANGEROUS, rule=rule)
+
+        return ValidationVerdict(ok=True, value=html.escape(message))
+
+    @staticmethod
+    def validate_many(
+        messages: Iterable[str],
+        max_length: int = 1000,
+    ) -> list[ValidationVerdict]:
+        """Validate a batch of messages.
+
+        Args:
+            messages: Raw messages
+            max_length: Maximum allowed message length
+
+        Returns:
+            One verdict per message, in order
+        """
+        validate = MessageValidator.validate_message
+        return [validate(message, max_length) for message in messages]
@@ -0,0 +1,56 @@
+"""Stand-ins for WebSocket connections used by the tests."""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+from portfolio_backend.codec import decode_frame
+
+
+class FakeWebSocket:
+    """Records the frames sent to it and how it was closed.
+
+    A socket can be made to fail every send, or to hang in ``send`` and
+    ``close`` until cancelled, like a client that stopped reading.
+    """
+
+    def __init__(self, fail: bool = False, hang: bool = False) -> None:
+        self.fail = fail
+        self.hang = hang
+        self.sent: list[Any] = []
+        self.closed: Optional[tuple[int, str]] = None
+
+    async def _send(self, frame: Any) -> None:
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.fail:
+            raise ConnectionResetError("gone")
+        self.sent.append(frame)
+
+    async def send_text(self, frame: str) -> None:
+        await self._send(frame)
+
+    async def send_bytes(self, frame: bytes) -> None:
+        await self._send(frame)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        if self.hang:
+            await asyncio.Event().wait()
+        self.closed = (code, reason)
+
+    def payloads(self) -> list[dict[str, Any]]:
+        """Decode the frames sent so far, unpacking ``batch`` frames."""
+        payloads = []
+        for frame in self.sent:
+            payload = (
+                json.loads(frame) if isinstance(frame, str)
+                else decode_frame({"type": "websocket.receive", "bytes": frame})
+            )
+            if payload.get("type") == "batch":
+                payloads.extend(payload["data"])
+            else:
+                payloads.append(payload)
+        return payloads
+
+    def types(self) -> list[str]:
+        return [payload["type"] for payload in self.payloads()]
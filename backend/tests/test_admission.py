@@ -0,0 +1,70 @@
+"""Tests for connection admission control."""
+
+import time
+
+from portfolio_backend.admission import (
+    ADMIT,
+    ADMIT_DEGRADED,
+    REJECT,
+    AdmissionController,
+)
+
+
+def test_hard_cap_counts_reservations() -> None:
+    admission = AdmissionController(hard_cap=2)
+
+    assert admission.try_admit(0, now=0.0).outcome == ADMIT
+    assert admission.try_admit(0, now=0.0).outcome == ADMIT
+    decision = admission.try_admit(0, now=0.0)
+    assert decision.outcome == REJECT
+    assert decision.reason == "full"
+    assert not decision.admitted
+    assert 5.0 <= decision.retry_after <= 15.0
+
+    admission.release()
+    assert admission.try_admit(1, now=0.0).outcome == REJECT
+    assert admission.try_admit(0, now=0.0).admitted
+    assert admission.rejected == 2
+
+
+def test_release_never_goes_negative() -> None:
+    admission = AdmissionController(hard_cap=1)
+    admission.release()
+
+    assert admission.pending == 0
+    assert admission.try_admit(0, now=0.0).admitted
+    assert admission.try_admit(0, now=0.0).outcome == REJECT
+
+
+def test_soft_cap_degrades() -> None:
+    admission = AdmissionController(hard_cap=10, soft_cap=5)
+
+    assert admission.try_admit(4, now=0.0).outcome == ADMIT
+    decision = admission.try_admit(4, now=0.0)
+    assert decision.outcome == ADMIT_DEGRADED
+    assert decision.admitted
+
+
+def test_accept_rate_spreads_retries() -> None:
+    admission = AdmissionController(hard_cap=100, accept_rate=10.0, accept_burst=2)
+    # The accept bucket runs on the monotonic clock
+    now = time.monotonic()
+
+    assert admission.try_admit(0, now=now).admitted
+    assert admission.try_admit(0, now=now).admitted
+    retries = [admission.try_admit(0, now=now) for _ in range(3)]
+    assert [decision.reason for decision in retries] == ["rate_limited"] * 3
+    # Consecutive slots at the accept rate
+    assert [round(decision.retry_after, 3) for decision in retries] == [0.2, 0.3, 0.4]
+    assert admission.try_admit(0, now=now + 0.1).admitted
+
+
+def test_retry_after_is_bounded() -> None:
+    admission = AdmissionController(
+        hard_cap=100, accept_rate=1.0, accept_burst=1, max_retry_after=3.0
+    )
+    now = time.monotonic()
+    admission.try_admit(0, now=now)
+    retries = [admission.try_admit(0, now=now).retry_after for _ in range(10)]
+
+    assert max(retries) == 3.0
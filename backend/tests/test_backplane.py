@@ -0,0 +1,169 @@
+"""Tests for the backplane: sequencing, relaying and broker election."""
+
+import asyncio
+from pathlib import Path
+
+from portfolio_backend.backplane import (
+    EVENT_HELLO,
+    EVENT_MESSAGE,
+    EVENT_NODE_DOWN,
+    EVENT_PRESENCE,
+    EVENT_SYNC,
+    InProcessBackplane,
+    Sequencer,
+    UnixSocketBackplane,
+    UnixSocketBroker,
+    encode_frame,
+    read_frame,
+)
+from portfolio_backend.chat import ChatManager
+
+from .fakes import FakeWebSocket
+
+
+def test_sequencer_stamps_messages_in_order() -> None:
+    sequencer = Sequencer(history_size=2)
+    event = {"kind": EVENT_MESSAGE, "messages": [{"content": "a"}, {"content": "b"}]}
+    sequencer.observe(event)
+    sequencer.observe({"kind": EVENT_MESSAGE, "messages": [{"content": "c"}]})
+
+    assert [message["seq"] for message in event["messages"]] == [1, 2]
+    assert sequencer.last_seq == 3
+    assert [message["content"] for message in sequencer.recent] == ["b", "c"]
+
+
+def test_sequencer_tracks_presence_per_worker() -> None:
+    sequencer = Sequencer()
+    sequencer.observe({"kind": EVENT_PRESENCE, "node": "w1", "counts": {"a": 2, "b": 1}})
+    sequencer.observe({"kind": EVENT_PRESENCE, "node": "w2", "counts": {"a": 1}})
+    sequencer.observe({"kind": EVENT_PRESENCE, "node": "w1", "counts": {"b": 0}})
+    sequencer.observe({"kind": EVENT_NODE_DOWN, "node": "w2"})
+
+    snapshot = sequencer.snapshot()
+    assert snapshot["kind"] == EVENT_SYNC
+    assert snapshot["presence"] == {"w1": {"a": 2}}
+
+
+def test_sequencer_adopts_a_worker_that_is_ahead() -> None:
+    sequencer = Sequencer()
+    sequencer.adopt(10, [{"seq": 10}])
+    sequencer.adopt(5, [{"seq": 5}])
+    event = {"kind": EVENT_MESSAGE, "messages": [{}]}
+    sequencer.observe(event)
+
+    assert event["messages"][0]["seq"] == 11
+    assert [message["seq"] for message in sequencer.recent] == [10, 11]
+
+
+async def test_in_process_publish_returns_the_stamped_event() -> None:
+    backplane = InProcessBackplane()
+    delivered = []
+
+    async def handler(event: dict) -> None:
+        delivered.append(event)
+
+    await backplane.start(handler)
+    event = await backplane.publish({"kind": EVENT_MESSAGE, "messages": [{}]})
+
+    assert event["messages"][0]["seq"] == 1
+    # A sync event comes first, like from a broker
+    assert delivered[0]["kind"] == EVENT_SYNC
+    assert delivered[1:] == [event]
+    await backplane.close()
+
+
+def make_worker(path: Path) -> ChatManager:
+    backplane = UnixSocketBackplane(str(path), reconnect_delay=0.05)
+    return ChatManager(presence_interval=0.01, backplane=backplane)
+
+
+async def test_workers_share_messages_and_sequence(tmp_path: Path) -> None:
+    path = tmp_path / "bp.sock"
+    first, second = make_worker(path), make_worker(path)
+    await first.start()
+    await second.start()
+    amy, bob = FakeWebSocket(), FakeWebSocket()
+    await first.connect("c1", amy, "amy")
+    await second.connect("c2", bob, "bob")
+
+    sent = await asyncio.gather(
+        *(first.send_message("c1", "amy", f"a{n}") for n in range(5)),
+        *(second.send_message("c2", "bob", f"b{n}") for n in range(5)),
+    )
+    await asyncio.sleep(0.1)
+
+    # The broker numbers messages once; publishers get the same numbers back
+    assert sorted(message.seq for message in sent if message) == list(range(1, 11))
+    first_history = [(m.seq, m.content) for m in first.message_history]
+    assert first_history == [(m.seq, m.content) for m in second.message_history]
+    assert len(first_history) == 10
+    assert {p["data"]["content"] for p in bob.payloads() if p["type"] == "message"} >= {
+        f"a{n}" for n in range(5)
+    }
+    assert first.get_user_count() == second.get_user_count() == 2
+
+    await first.graceful_shutdown()
+    await second.graceful_shutdown()
+
+
+async def test_new_broker_continues_the_sequence(tmp_path: Path) -> None:
+    path = tmp_path / "bp.sock"
+    first, second = make_worker(path), make_worker(path)
+    await first.start()
+    await second.start()
+    await first.connect("c1", FakeWebSocket(), "amy")
+    await second.connect("c2", FakeWebSocket(), "bob")
+    assert isinstance(first.backplane, UnixSocketBackplane)
+    assert first.backplane.broker is not None
+    for n in range(3):
+        await second.send_message("c2", "bob", f"before {n}")
+
+    # The broker's host goes away; the other worker takes over
+    await first.graceful_shutdown()
+    await asyncio.sleep(0.3)
+    message = await second.send_message("c2", "bob", "after")
+    await asyncio.sleep(0.05)
+
+    assert message is not None
+    assert message.seq == 4
+    assert isinstance(second.backplane, UnixSocketBackplane)
+    assert second.backplane.broker is not None
+    assert second.get_user_count() == 1
+    await second.graceful_shutdown()
+
+
+async def test_broker_disconnects_a_slow_worker(tmp_path: Path) -> None:
+    path = str(tmp_path / "bp.sock")
+    broker = UnixSocketBroker(path, max_peer_buffer=64 * 1024)
+    await broker.start()
+    fast_reader, fast = await asyncio.open_unix_connection(path)
+    slow_reader, slow = await asyncio.open_unix_connection(path)
+    for node, writer in (("fast", fast), ("slow", slow)):
+        writer.write(encode_frame({"kind": EVENT_HELLO, "node": node}))
+        await writer.drain()
+    await asyncio.sleep(0.05)
+    # The slow worker stops reading; the fast one keeps up
+    slow.transport.pause_reading()  # type: ignore[attr-defined]
+    received: list[dict] = []
+
+    async def read_all() -> None:
+        while True:
+            received.append(await read_frame(fast_reader))
+
+    reader = asyncio.create_task(read_all())
+    message = {"content": "x" * 400}
+    # In rounds small enough for the fast worker to read its echoes in time
+    for _ in range(40):
+        for _ in range(50):
+            fast.write(encode_frame({"kind": EVENT_MESSAGE, "messages": [message]}))
+        await fast.drain()
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+
+    assert broker.slow_disconnects == 1
+    assert {"kind": EVENT_NODE_DOWN, "node": "slow"} in received
+    assert sum(event["kind"] == EVENT_MESSAGE for event in received) == 2000
+    reader.cancel()
+    fast.close()
+    slow.close()
+    await broker.close()
@@ -0,0 +1,53 @@
+"""Tests for the bot's keyword matcher."""
+
+import pytest
+
+from portfolio_backend.bot import KeywordMatcher
+
+
+def test_no_match() -> None:
+    matcher = KeywordMatcher(["hello", "help"])
+
+    assert matcher.match("nothing here") is None
+    assert matcher.match("") is None
+
+
+def test_highest_priority_keyword_wins() -> None:
+    matcher = KeywordMatcher(["python", "hello", "hi"])
+
+    assert matcher.match("hi, hello there") == 1
+    assert matcher.match("hello, do you know python?") == 0
+    assert matcher.match("oh hi") == 2
+
+
+def test_keywords_found_through_failure_links() -> None:
+    # "she" contains "he", which is only reached through a failure link
+    matcher = KeywordMatcher(["he", "she", "hers"])
+
+    assert matcher.match("ushers") == 0
+    assert KeywordMatcher(["hers", "she"]).match("ushers") == 0
+    assert KeywordMatcher(["xyz", "she"]).match("ushe") == 1
+
+
+def test_overlapping_prefixes() -> None:
+    matcher = KeywordMatcher(["abcd", "bc"])
+
+    assert matcher.match("abce") == 1
+    assert matcher.match("xabcdx") == 0
+
+
+def test_empty_keywords_are_ignored() -> None:
+    matcher = KeywordMatcher(["", "ok"])
+
+    assert matcher.match("anything") is None
+    assert matcher.match("ok") == 1
+
+
+@pytest.mark.parametrize("text", ["aaab", "abab", "bbbba", "ab" * 50])
+def test_matches_naive_search(text: str) -> None:
+    keywords = ["bab", "aa", "abb", "ba"]
+    expected = next(
+        (priority for priority, keyword in enumerate(keywords) if keyword in text), None
+    )
+
+    assert KeywordMatcher(keywords).match(text) == expected
@@ -0,0 +1,121 @@
+"""Tests for the chat manager's history pages."""
+
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+from portfolio_backend.chat import ChatManager
+from portfolio_backend.historylog import SegmentLog
+
+
+def walk(manager: ChatManager, room: str, limit: int) -> list[str]:
+    """Page through a room's history from the newest page to the oldest."""
+    contents: list[str] = []
+    cursor: Optional[str] = None
+    while True:
+        page: dict[str, Any] = json.loads(manager.history_page(room, cursor, limit))
+        contents[:0] = [message["content"] for message in page["messages"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return contents
+
+
+async def fill(manager: ChatManager, count: int) -> None:
+    for n in range(count):
+        await manager.send_message("c1", "amy", f"a{n}", room="a")
+        await manager.send_message("c2", "bob", f"b{n}", room="b")
+
+
+async def test_pages_come_from_memory() -> None:
+    manager = ChatManager(history_size=20)
+    await manager.start()
+    await fill(manager, 6)
+
+    assert walk(manager, "a", 4) == [f"a{n}" for n in range(6)]
+    assert walk(manager, "unknown", 4) == []
+    await manager.graceful_shutdown()
+
+
+async def test_pages_continue_from_the_log(tmp_path: Path) -> None:
+    manager = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await manager.recover_history()
+    await manager.start()
+    await fill(manager, 10)
+
+    assert walk(manager, "a", 4) == [f"a{n}" for n in range(10)]
+    assert walk(manager, "b", 3) == [f"b{n}" for n in range(10)]
+    await manager.graceful_shutdown()
+    assert manager.history_log is not None
+    await manager.history_log.close()
+
+    restarted = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await restarted.recover_history()
+    assert walk(restarted, "a", 7) == [f"a{n}" for n in range(10)]
+    assert restarted.history_log is not None
+    await restarted.history_log.close()
+
+
+async def test_page_cache_is_dropped_on_new_messages() -> None:
+    manager = ChatManager(history_size=20)
+    await manager.start()
+    await fill(manager, 2)
+    page = manager.history_page("a")
+
+    assert manager.history_page("a") is page
+    await manager.send_message("c1", "amy", "new", room="a")
+    assert "new" in manager.history_page("a")
+    await manager.graceful_shutdown()
+
+
+async def test_etag_is_the_same_on_every_worker(tmp_path: Path) -> None:
+    manager = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await manager.recover_history()
+    await manager.start()
+    empty = manager.history_etag("a")
+    await fill(manager, 5)
+    etag = manager.history_etag("a")
+    assert etag != empty
+    await manager.graceful_shutdown()
+
+    # Another worker, or the next boot, reading the same log
+    other = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await other.recover_history()
+    assert other.history_etag("a") == etag
+    # Also once the room has expired from memory
+    other.rooms.clear()
+    assert other.history_etag("a") == etag
+    assert other.history_log is not None
+    await other.history_log.close()
+
+
+async def test_etag_changes_when_history_is_renumbered() -> None:
+    before, after = ChatManager(), ChatManager()
+    for manager in (before, after):
+        await manager.start()
+        await fill(manager, 1)
+
+    # Without a durable log a restart numbers history from scratch again
+    assert json.loads(before.history_page("a"))["last_seq"] == 1
+    assert json.loads(after.history_page("a"))["last_seq"] == 1
+    assert before.history_etag("a") != after.history_etag("a")
+    for manager in (before, after):
+        await manager.graceful_shutdown()
+
+
+async def test_since_before_the_recovered_history_gets_a_snapshot(tmp_path: Path) -> None:
+    manager = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await manager.recover_history()
+    await manager.start()
+    await fill(manager, 5)
+    await manager.graceful_shutdown()
+    assert manager.history_log is not None
+    await manager.history_log.close()
+
+    restarted = ChatManager(history_size=3, history_log=SegmentLog(str(tmp_path)))
+    await restarted.recover_history()
+    history = restarted.get_room("a").history
+    assert [message.content for message in history] == ["a2", "a3", "a4"]
+    assert history.since(history.first_seq - 1) is not None
+    assert history.since(1) is None
+    assert restarted.history_log is not None
+    await restarted.history_log.close()
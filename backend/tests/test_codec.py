@@ -0,0 +1,65 @@
+"""Tests for the JSON and MessagePack codecs."""
+
+import asyncio
+
+from portfolio_backend.codec import (
+    SUBPROTOCOL_MSGPACK,
+    decode_binary,
+    decode_frame,
+    encode_binary,
+    encode_binary_batch,
+    encode_message,
+    negotiate_subprotocol,
+    to_binary,
+)
+
+from .fakes import FakeWebSocket
+from .test_connections import make_manager
+
+
+def test_negotiation() -> None:
+    assert negotiate_subprotocol(["chat", SUBPROTOCOL_MSGPACK]) == SUBPROTOCOL_MSGPACK
+    assert negotiate_subprotocol(["chat"]) is None
+    assert negotiate_subprotocol([SUBPROTOCOL_MSGPACK], allow_msgpack=False) is None
+
+
+def test_json_frames_convert_to_msgpack() -> None:
+    payload = {"type": "message", "data": {"content": "héllo", "seq": 3}}
+
+    assert decode_binary(to_binary(encode_message(payload))) == payload
+    assert decode_frame({"type": "websocket.receive", "bytes": encode_binary(payload)}) == payload
+    assert decode_frame({"type": "websocket.receive", "text": encode_message(payload)}) == payload
+
+
+def test_binary_batch_packs_encoded_frames() -> None:
+    for count in (1, 15, 16, 70000):
+        payloads = [{"type": "message", "n": n} for n in range(count)]
+        batch = encode_binary_batch([encode_binary(payload) for payload in payloads])
+        assert decode_binary(batch) == {"type": "batch", "data": payloads}
+
+
+async def test_binary_clients_get_msgpack_frames() -> None:
+    manager = make_manager()
+    text, binary = FakeWebSocket(), FakeWebSocket()
+    await manager.connect("text", text)
+    await manager.connect("binary", binary, binary=True)
+
+    await manager.broadcast({"type": "message", "data": "hi"})
+
+    assert isinstance(text.sent[0], str)
+    assert isinstance(binary.sent[0], bytes)
+    assert text.payloads() == binary.payloads() == [{"type": "message", "data": "hi"}]
+
+
+async def test_queued_binary_frames_are_batched() -> None:
+    manager = make_manager(queue_high_water=100, queue_low_water=10, batch_window=0.02)
+    websocket = FakeWebSocket()
+    await manager.connect("binary", websocket, binary=True)
+
+    for n in range(5):
+        await manager.broadcast({"type": "message", "n": n})
+    await asyncio.sleep(0.05)
+
+    assert len(websocket.sent) == 1
+    assert isinstance(websocket.sent[0], bytes)
+    assert [payload["n"] for payload in websocket.payloads()] == list(range(5))
@@ -0,0 +1,105 @@
+"""Tests for shared compressed frames and transport compression."""
+
+import asyncio
+import socket
+import zlib
+from typing import Any, Optional
+
+import pytest
+import uvicorn
+
+from portfolio_backend.codec import compress_frame, encode_message
+from portfolio_backend.config import settings
+from portfolio_backend.main import ChatWebSocketProtocol
+
+from .fakes import FakeWebSocket
+from .test_connections import make_manager
+
+
+def test_compress_frame_round_trip() -> None:
+    frame = encode_message({"type": "message", "data": "x" * 2000})
+    compressed = compress_frame(frame, level=1, window_bits=9, mem_level=1)
+
+    assert len(compressed) < len(frame) // 10
+    assert zlib.decompress(compressed).decode("utf-8") == frame
+
+
+async def test_large_frames_are_compressed_once() -> None:
+    manager = make_manager(compression_threshold=100)
+    plain = FakeWebSocket()
+    compressed = [FakeWebSocket() for _ in range(3)]
+    await manager.connect("plain", plain)
+    for n, websocket in enumerate(compressed):
+        await manager.connect(f"c{n}", websocket, compressed=True)
+
+    await manager.broadcast({"type": "message", "data": "small"})
+    await manager.broadcast({"type": "message", "data": "x" * 500})
+
+    assert all(isinstance(frame, str) for frame in plain.sent)
+    small, large = compressed[0].sent
+    assert isinstance(small, str)
+    assert isinstance(large, bytes)
+    # One compressed frame shared by every client
+    assert all(websocket.sent[1] is large for websocket in compressed)
+    assert zlib.decompress(large).decode("utf-8") == plain.sent[1]
+
+
+async def accept_app(scope: dict, receive: Any, send: Any) -> None:
+    if scope["type"] == "lifespan":
+        while (await receive())["type"] != "lifespan.shutdown":
+            await send({"type": "lifespan.startup.complete"})
+        await send({"type": "lifespan.shutdown.complete"})
+        return
+    await receive()
+    await send({"type": "websocket.accept"})
+    await send({"type": "websocket.close", "code": 1000})
+
+
+async def negotiated_extensions(port: int, path: str) -> Optional[str]:
+    """Open a WebSocket handshake offering permessage-deflate."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "Sec-WebSocket-Extensions: permessage-deflate; client_max_window_bits\r\n"
+        "\r\n"
+    ).encode("ascii"))
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    writer.close()
+    assert head.startswith("HTTP/1.1 101")
+    for line in head.split("\r\n"):
+        name, _, value = line.partition(":")
+        if name.lower() == "sec-websocket-extensions":
+            return value.strip()
+    return None
+
+
+async def test_app_compressed_connections_skip_permessage_deflate(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "ws_per_message_deflate_window_bits", 10)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        accept_app, port=port, ws=ChatWebSocketProtocol, log_level="warning"
+    ))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        extensions = await negotiated_extensions(port, "/ws/chat?username=amy")
+        assert extensions is not None
+        assert "server_max_window_bits=10" in extensions
+        assert "client_max_window_bits=10" in extensions
+
+        assert await negotiated_extensions(
+            port, "/ws/chat?username=amy&compression=deflate"
+        ) is None
+    finally:
+        server.should_exit = True
+        await task
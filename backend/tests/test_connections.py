@@ -0,0 +1,156 @@
+"""Tests for the WebSocket connection manager's fan-out and eviction."""
+
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from portfolio_backend.chat import SimpleWebSocketConnectionManager, WebSocketConnection
+
+from .fakes import FakeWebSocket
+
+
+def make_manager(**config: Any) -> SimpleWebSocketConnectionManager:
+    options = {"heartbeat_interval": 0, "queue_high_water": 0, "send_timeout": 0.1}
+    options.update(config)
+    return SimpleWebSocketConnectionManager(SimpleNamespace(**options))
+
+
+async def test_broadcast_report() -> None:
+    manager = make_manager()
+    sockets = {
+        "ok": FakeWebSocket(),
+        "failing": FakeWebSocket(fail=True),
+        "stuck": FakeWebSocket(hang=True),
+    }
+    for client_id, websocket in sockets.items():
+        await manager.connect(client_id, websocket)
+
+    report = await manager.broadcast({"type": "message", "data": "hi"})
+
+    assert report.delivered == ["ok"]
+    assert report.failed == ["failing"]
+    assert report.timed_out == ["stuck"]
+    assert sockets["ok"].types() == ["message"]
+    # Evicted clients are gone before the broadcast returns
+    assert manager.get_connection_count() == 1
+
+
+async def test_broadcast_excludes_and_targets_rooms() -> None:
+    manager = make_manager()
+    amy, bob, eve = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect("amy", amy, room="a")
+    await manager.connect("bob", bob, room="a")
+    await manager.connect("eve", eve, room="b")
+    manager.join_room("amy", "a")
+    manager.join_room("bob", "a")
+    manager.join_room("eve", "b")
+
+    report = await manager.broadcast({"type": "message"}, exclude_client="amy", room="a")
+
+    assert report.delivered == ["bob"]
+    assert (amy.sent, len(bob.sent), eve.sent) == ([], 1, [])
+
+
+async def test_stuck_clients_do_not_hold_the_broadcast() -> None:
+    manager = make_manager(send_timeout=0.2)
+    evicted: list[str] = []
+
+    async def on_evict(connection: WebSocketConnection) -> None:
+        evicted.append(connection.client_id)
+
+    manager.on_evict = on_evict
+    for n in range(10):
+        await manager.connect(f"stuck{n}", FakeWebSocket(hang=True))
+
+    started = time.perf_counter()
+    report = await manager.broadcast({"type": "message"})
+    # One send timeout, not one per client to close as well
+    assert time.perf_counter() - started < 0.5
+    assert len(report.timed_out) == 10
+    assert manager.get_connection_count() == 0
+
+    await asyncio.sleep(0.4)
+    assert sorted(evicted) == sorted(report.timed_out)
+
+
+async def test_shutdown_waits_for_background_evictions() -> None:
+    manager = make_manager(send_timeout=0.05)
+    websocket = FakeWebSocket(fail=True)
+    await manager.connect("gone", websocket)
+
+    await manager.broadcast({"type": "message"})
+    await manager.graceful_shutdown(timeout=1.0)
+
+    assert websocket.closed == (1000, "")
+    assert not manager._evictions
+
+
+async def broadcast_each(manager: SimpleWebSocketConnectionManager, count: int) -> list:
+    """Broadcast ``count`` messages, letting the writers run after each."""
+    reports = []
+    for n in range(count):
+        reports.append(await manager.broadcast({"type": "message", "n": n}))
+        await asyncio.sleep(0.01)
+    return reports
+
+
+async def test_queued_broadcast_reports_drops() -> None:
+    manager = make_manager(queue_high_water=3, queue_low_water=1)
+    websocket = FakeWebSocket(hang=True)
+    await manager.connect("slow", websocket)
+    await asyncio.sleep(0.01)
+
+    reports = await broadcast_each(manager, 4)
+
+    # The writer holds the first frame; the queue overflows on the fourth put
+    assert [report.dropped for report in reports] == [[], [], [], ["slow"]]
+    assert all(report.delivered == ["slow"] for report in reports)
+
+
+async def test_slow_consumer_is_evicted_without_blocking_the_producer() -> None:
+    manager = make_manager(
+        queue_high_water=2, queue_low_water=1, overflow_policy="disconnect", send_timeout=0.3
+    )
+    evicted: list[str] = []
+
+    async def on_evict(connection: WebSocketConnection) -> None:
+        evicted.append(connection.client_id)
+
+    manager.on_evict = on_evict
+    slow, fast = FakeWebSocket(hang=True), FakeWebSocket()
+    await manager.connect("slow", slow)
+    await manager.connect("fast", fast)
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    reports = await broadcast_each(manager, 3)
+    assert not await manager.send_frame("slow", '{"type":"message"}')
+    # Closing the stuck socket takes a full send timeout, off the producer path
+    assert time.perf_counter() - started < 0.25
+    assert reports[-1].failed == ["slow"]
+    assert manager.get_connection("slow") is None
+    assert manager.get_connection("fast") is not None
+
+    assert len(fast.sent) == 3
+    await asyncio.sleep(0.5)
+    assert evicted == ["slow"]
+
+
+async def test_writer_failures_are_counted_not_logged_as_errors(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    manager = make_manager(queue_high_water=10, queue_low_water=5)
+    for n in range(5):
+        await manager.connect(f"gone{n}", FakeWebSocket(fail=True))
+
+    with caplog.at_level(logging.DEBUG, logger="portfolio_backend.chat"):
+        await manager.broadcast({"type": "message"})
+        await asyncio.sleep(0.05)
+
+    assert manager.metrics.send_failures.value == 5
+    assert manager.get_connection_count() == 0
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
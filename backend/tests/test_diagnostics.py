@@ -0,0 +1,74 @@
+"""Tests for the event loop stall detector."""
+
+import asyncio
+import threading
+import time
+
+from portfolio_backend.diagnostics import StallDetector
+from portfolio_backend.metrics import MetricsRegistry
+
+
+def block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_stall_is_recorded_with_its_stack() -> None:
+    registry = MetricsRegistry()
+    detector = StallDetector(threshold=0.05, registry=registry)
+    detector.start()
+    try:
+        await asyncio.sleep(0.05)
+        block_loop(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        detector.stop()
+
+    [stall] = detector.recent()
+    assert not stall["ongoing"]
+    assert 0.15 < stall["duration"] < 0.4
+    assert any("block_loop" in frame for frame in stall["stack"])
+    assert "event_loop_stalls_total 1\n" in registry.render()
+
+
+async def test_short_pauses_are_not_stalls() -> None:
+    detector = StallDetector(threshold=0.2)
+    detector.start()
+    try:
+        for _ in range(5):
+            block_loop(0.02)
+            await asyncio.sleep(0.02)
+    finally:
+        detector.stop()
+
+    assert detector.recent() == []
+    assert detector.count == 0
+
+
+async def test_reading_while_the_watchdog_appends() -> None:
+    detector = StallDetector(threshold=0.02, history=3)
+    detector.start()
+    done = threading.Event()
+    errors: list[BaseException] = []
+
+    def read() -> None:
+        while not done.is_set():
+            try:
+                detector.recent()
+            except BaseException as e:
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(6):
+            block_loop(0.08)
+            await asyncio.sleep(0.03)
+    finally:
+        done.set()
+        reader.join()
+        detector.stop()
+
+    assert errors == []
+    assert detector.count >= 4
+    assert len(detector.recent()) == 3
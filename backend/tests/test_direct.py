@@ -0,0 +1,70 @@
+"""Tests for direct messages and kicks."""
+
+import asyncio
+from pathlib import Path
+
+from portfolio_backend.chat import KICK_CLOSE_CODE, REPLACED_CLOSE_CODE
+
+from .fakes import FakeWebSocket
+from .test_backplane import make_worker
+from .test_rooms import start_manager
+
+
+async def test_direct_messages_reach_both_users_only() -> None:
+    manager = await start_manager()
+    amy, amy_tab, bob, eve = (FakeWebSocket() for _ in range(4))
+    await manager.connect("c1", amy, "amy")
+    await manager.connect("c2", amy_tab, "amy")
+    await manager.connect("c3", bob, "bob")
+    await manager.connect("c4", eve, "eve")
+
+    message = await manager.send_direct_message("amy", "bob", "psst")
+
+    for websocket in (amy, amy_tab, bob):
+        assert [p["data"] for p in websocket.payloads() if p["type"] == "dm"] == [message]
+    assert "dm" not in eve.types()
+    # Not part of any room's history
+    assert len(manager.message_history) == 0
+    await manager.graceful_shutdown(timeout=1.0)
+
+
+async def test_kick_closes_every_connection_of_a_user() -> None:
+    manager = await start_manager()
+    amy, amy_tab, bob = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect("c1", amy, "amy")
+    await manager.connect("c2", amy_tab, "amy")
+    await manager.connect("c3", bob, "bob")
+
+    await manager.kick_user("amy")
+    await asyncio.sleep(0.05)
+
+    assert amy.closed == amy_tab.closed == (KICK_CLOSE_CODE, "Kicked")
+    assert bob.closed is None
+    assert not manager.is_user_online("amy")
+    notices = [p["data"]["content"] for p in bob.payloads() if p["type"] == "system"]
+    assert notices.count("amy left the chat") == 2
+    await manager.graceful_shutdown(timeout=1.0)
+
+
+async def test_replacing_a_session_spares_the_new_connection(tmp_path: Path) -> None:
+    path = tmp_path / "bp.sock"
+    first, second = make_worker(path), make_worker(path)
+    await first.start()
+    await second.start()
+    old, new = FakeWebSocket(), FakeWebSocket()
+    await first.connect("c1", old, "amy")
+    await asyncio.sleep(0.05)
+
+    # The kick comes back through the broker after the new client connected
+    await second.kick_user(
+        "amy", code=REPLACED_CLOSE_CODE, reason="Signed in elsewhere", exclude_client="c2"
+    )
+    await second.connect("c2", new, "amy")
+    await asyncio.sleep(0.1)
+
+    assert old.closed == (REPLACED_CLOSE_CODE, "Signed in elsewhere")
+    assert new.closed is None
+    assert second.ws_manager.get_connection("c2") is not None
+
+    await first.graceful_shutdown(timeout=1.0)
+    await second.graceful_shutdown(timeout=1.0)
@@ -0,0 +1,92 @@
+"""Tests for the heartbeat timer wheel and heartbeat eviction."""
+
+import asyncio
+from types import SimpleNamespace
+
+from portfolio_backend.chat import HEARTBEAT_TIMEOUT_CLOSE_CODE, ChatManager
+from portfolio_backend.heartbeat import TimerWheel
+
+from .fakes import FakeWebSocket
+
+
+def test_timer_expires_on_its_tick() -> None:
+    wheel: TimerWheel[str] = TimerWheel(tick=1.0, slots=8, levels=2, now=0.0)
+    wheel.schedule("a", 3.0)
+    wheel.schedule("b", 5.5)
+
+    assert wheel.advance(2.9) == []
+    assert wheel.advance(3.0) == ["a"]
+    assert "a" not in wheel
+    # Deadlines round up to the next tick
+    assert wheel.advance(5.9) == []
+    assert wheel.advance(6.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_reschedule_and_cancel() -> None:
+    wheel: TimerWheel[str] = TimerWheel(tick=1.0, slots=8, levels=2, now=0.0)
+    wheel.schedule("a", 2.0)
+    wheel.schedule("a", 4.0)
+    wheel.schedule("b", 2.0)
+
+    assert wheel.cancel("b")
+    assert not wheel.cancel("b")
+    assert wheel.advance(3.0) == []
+    assert wheel.advance(4.0) == ["a"]
+
+
+def test_past_deadline_fires_on_next_tick() -> None:
+    wheel: TimerWheel[str] = TimerWheel(tick=1.0, slots=8, levels=2, now=0.0)
+    wheel.advance(10.0)
+    wheel.schedule("late", 1.0)
+
+    assert wheel.advance(11.0) == ["late"]
+
+
+def test_timers_cascade_from_higher_levels() -> None:
+    wheel: TimerWheel[int] = TimerWheel(tick=1.0, slots=4, levels=3, now=0.0)
+    deadlines = {key: float(key * 3 + 1) for key in range(20)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+
+    fired: dict[int, float] = {}
+    for now in range(1, 62):
+        for key in wheel.advance(float(now)):
+            fired[key] = now
+    assert fired == deadlines
+
+
+def test_timers_beyond_the_horizon_go_round_again() -> None:
+    # Horizon is 2 * 2 = 4 ticks
+    wheel: TimerWheel[str] = TimerWheel(tick=1.0, slots=2, levels=2, now=0.0)
+    wheel.schedule("far", 11.0)
+
+    fired = [now for now in range(1, 15) if wheel.advance(float(now))]
+    assert fired == [11]
+
+
+async def test_unresponsive_clients_are_evicted() -> None:
+    config = SimpleNamespace(
+        heartbeat_interval=0.05, heartbeat_timeout=0.15, heartbeat_tick=0.01, queue_high_water=0
+    )
+    manager = ChatManager(config, presence_interval=0)
+    await manager.start()
+    amy, bob = FakeWebSocket(), FakeWebSocket()
+    await manager.connect("amy", amy, "amy")
+    await manager.connect("bob", bob, "bob")
+
+    # Only bob answers the pings
+    for _ in range(30):
+        await asyncio.sleep(0.01)
+        await manager.ws_manager.handle_pong("bob")
+
+    assert "ping" in amy.types()
+    assert amy.closed == (HEARTBEAT_TIMEOUT_CLOSE_CODE, "")
+    assert bob.closed is None
+    assert manager.get_connection_count() == 1
+    # The eviction is announced like a departure
+    assert any(
+        payload["type"] == "system" and payload["data"]["content"] == "amy left the chat"
+        for payload in bob.payloads()
+    )
+    await manager.graceful_shutdown()
@@ -0,0 +1,148 @@
+"""Tests for the in-memory message history and the history page cache."""
+
+from portfolio_backend.chat import ChatMessage
+from portfolio_backend.history import HistoryPageCache, MessageHistory
+
+
+def make_message(seq: int = 0, room: str = "general") -> ChatMessage:
+    return ChatMessage(
+        id=f"m{seq}", username="amy", content=f"message {seq}", timestamp=0.0, seq=seq, room=room
+    )
+
+
+def make_history(seqs: list[int], capacity: int = 5) -> MessageHistory:
+    history = MessageHistory(capacity=capacity, replay_size=capacity)
+    for seq in seqs:
+        history.append(make_message(seq))
+    return history
+
+
+def seqs_of(messages: list[ChatMessage]) -> list[int]:
+    return [message.seq for message in messages]
+
+
+def test_ring_keeps_the_newest_messages() -> None:
+    history = make_history([2, 4, 6, 8, 10, 12, 14])
+
+    assert seqs_of(list(history)) == [6, 8, 10, 12, 14]
+    assert history.first_seq == 6
+    assert history.last_seq == 14
+    assert history[-1].seq == 14
+
+
+def test_append_numbers_and_ignores_duplicates() -> None:
+    history = MessageHistory(capacity=3)
+    first = make_message()
+
+    assert history.append(first)
+    assert first.seq == 1
+    assert history.append(make_message(5))
+    assert not history.append(make_message(5))
+    assert not history.append(make_message(3))
+    assert seqs_of(list(history)) == [1, 5]
+
+
+def test_resolve_cursor() -> None:
+    history = make_history([2, 4, 6, 8, 10, 12])
+
+    assert history.resolve_cursor("7") == 7
+    assert history.resolve_cursor("m8") == 8
+    # Evicted from the ring, so its ID is forgotten
+    assert history.resolve_cursor("m2") is None
+    assert history.resolve_cursor("unknown") is None
+
+
+def test_before_pages_backwards() -> None:
+    history = make_history([2, 4, 6, 8, 10])
+
+    assert seqs_of(history.before(None, 2)) == [8, 10]
+    assert seqs_of(history.before(8, 2)) == [4, 6]
+    # A cursor between two sequence numbers
+    assert seqs_of(history.before(7, 2)) == [4, 6]
+    assert seqs_of(history.before(4, 2)) == [2]
+    assert history.before(2, 2) == []
+    assert history.before(8, 0) == []
+
+
+def test_since() -> None:
+    history = make_history([2, 4, 6, 8, 10, 12], capacity=4)
+
+    assert seqs_of(history.since(7) or []) == [8, 10, 12]
+    assert history.since(12) == []
+    # Messages after seq 3 were dropped; a snapshot is needed
+    assert history.since(3) is None
+
+
+def test_clear_keeps_numbering() -> None:
+    history = make_history([1, 2, 3])
+    history.clear()
+    message = make_message()
+
+    assert len(history) == 0
+    assert history.since(2) is None
+    assert history.append(message)
+    assert message.seq == 4
+
+
+def test_history_frame_is_cached_until_append() -> None:
+    history = make_history([1, 2])
+    frame = history.history_frame()
+
+    assert history.history_frame() is frame
+    history.append(make_message(3))
+    assert history.history_frame() is not frame
+    assert '"message 3"' in history.history_frame()
+
+
+def test_page_cache_hits_and_misses() -> None:
+    cache = HistoryPageCache(capacity=4)
+
+    assert cache.get(("a", None, 10)) is None
+    cache.put(("a", None, 10), "page")
+    assert cache.get(("a", None, 10)) == "page"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_page_cache_invalidates_one_room() -> None:
+    cache = HistoryPageCache(capacity=4)
+    cache.put(("a", None, 10), "a1")
+    cache.put(("a", 5, 10), "a2")
+    cache.put(("b", None, 10), "b1")
+
+    cache.invalidate("a")
+    assert cache.get(("a", None, 10)) is None
+    assert cache.get(("a", 5, 10)) is None
+    assert cache.get(("b", None, 10)) == "b1"
+    assert len(cache) == 1
+    cache.invalidate("unknown")
+
+
+def test_page_cache_evicts_least_recently_used() -> None:
+    cache = HistoryPageCache(capacity=2)
+    cache.put(("a", None, 10), "a")
+    cache.put(("b", None, 10), "b")
+    cache.get(("a", None, 10))
+    cache.put(("c", None, 10), "c")
+
+    assert cache.get(("b", None, 10)) is None
+    assert cache.get(("a", None, 10)) == "a"
+    # The evicted page's room bookkeeping is gone too
+    cache.invalidate("b")
+    assert len(cache) == 2
+
+
+def test_page_cache_disabled() -> None:
+    cache = HistoryPageCache(capacity=0)
+    cache.put(("a", None, 10), "a")
+
+    assert cache.get(("a", None, 10)) is None
+
+
+def test_restore_sends_old_cursors_a_snapshot() -> None:
+    history = MessageHistory(capacity=5)
+
+    assert history.restore([make_message(seq) for seq in (10, 12, 14)]) == 3
+    assert seqs_of(history.since(12) or []) == [14]
+    assert seqs_of(history.since(9) or []) == [10, 12, 14]
+    # Messages before seq 10 may have been trimmed from the recovered tail
+    assert history.since(5) is None
@@ -0,0 +1,165 @@
+"""Tests for the durable history log."""
+
+import os
+from pathlib import Path
+
+from portfolio_backend.historylog import RECORD_HEADER, RoomIndex, SegmentLog
+
+
+def payload(seq: int) -> bytes:
+    return f'{{"seq":{seq}}}'.encode()
+
+
+def open_log(directory: Path, **kwargs: int) -> SegmentLog:
+    log = SegmentLog(str(directory), index_interval=4, **kwargs)
+    log.open()
+    return log
+
+
+def read_all(log: SegmentLog) -> list[bytes]:
+    return [bytes(view) for view in log.read(log.first_seq, 1000)]
+
+
+async def test_append_and_read(tmp_path: Path) -> None:
+    log = open_log(tmp_path)
+    for seq in range(1, 11):
+        assert log.append(seq, payload(seq))
+
+    assert not log.append(10, payload(10))
+    assert (log.first_seq, log.last_seq) == (1, 10)
+    assert [bytes(view) for view in log.read(7, 2)] == [payload(7), payload(8)]
+    assert log.read(11, 5) == []
+    await log.close()
+
+
+async def test_gaps_start_new_segments(tmp_path: Path) -> None:
+    log = open_log(tmp_path)
+    for seq in (5, 6, 9, 10):
+        log.append(seq, payload(seq))
+
+    assert [segment.base_seq for segment in log.segments] == [5, 9]
+    # Reading from a missing seq starts at the next record present
+    assert [bytes(view) for view in log.read(7, 2)] == [payload(9), payload(10)]
+    await log.close()
+
+
+async def test_reopen_recovers_records(tmp_path: Path) -> None:
+    log = open_log(tmp_path, segment_bytes=100)
+    for seq in range(1, 21):
+        log.append(seq, payload(seq))
+    await log.close()
+
+    reopened = SegmentLog(str(tmp_path), segment_bytes=100)
+    assert reopened.open() == 20
+    assert len(reopened.segments) > 1
+    assert read_all(reopened) == [payload(seq) for seq in range(1, 21)]
+    assert reopened.append(21, payload(21))
+    await reopened.close()
+
+
+async def test_torn_tail_is_truncated(tmp_path: Path) -> None:
+    log = open_log(tmp_path)
+    for seq in range(1, 6):
+        log.append(seq, payload(seq))
+    await log.close()
+    path = log.segments[-1].path
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        # A record cut short in the middle of its payload
+        f.write(RECORD_HEADER.pack(100, 0, 6) + b'{"seq":')
+
+    reopened = SegmentLog(str(tmp_path))
+    assert reopened.open() == 5
+    assert os.path.getsize(path) == intact
+    assert reopened.append(6, payload(6))
+    assert read_all(reopened) == [payload(seq) for seq in range(1, 7)]
+    await reopened.close()
+
+
+async def test_corrupt_record_ends_the_segment(tmp_path: Path) -> None:
+    log = open_log(tmp_path)
+    for seq in range(1, 6):
+        log.append(seq, payload(seq))
+    await log.close()
+    path = log.segments[-1].path
+    with open(path, "r+b") as f:
+        # Flip a payload byte of the third record
+        offset = 2 * (RECORD_HEADER.size + len(payload(1))) + RECORD_HEADER.size
+        f.seek(offset)
+        f.write(b"X")
+
+    reopened = SegmentLog(str(tmp_path))
+    assert reopened.open() == 2
+    assert reopened.last_seq == 2
+    await reopened.close()
+
+
+async def test_compaction_by_size(tmp_path: Path) -> None:
+    log = open_log(tmp_path, segment_bytes=60, max_bytes=150)
+    for seq in range(1, 21):
+        log.append(seq, payload(seq))
+
+    deleted = log.compact()
+    assert deleted > 0
+    assert log.size <= 150 or len(log.segments) == 1
+    assert log.last_seq == 20
+    assert log.first_seq > 1
+    assert read_all(log)[-1] == payload(20)
+    assert len(os.listdir(tmp_path)) == len(log.segments) + 1
+    await log.close()
+
+
+async def test_compaction_by_age_keeps_the_active_segment(tmp_path: Path) -> None:
+    log = SegmentLog(str(tmp_path), segment_bytes=60, max_age=10.0)
+    log.open()
+    for seq in range(1, 11):
+        log.append(seq, payload(seq))
+    newest = max(segment.mtime for segment in log.segments)
+    sealed = len(log.segments) - 1
+
+    assert sealed > 0
+    assert log.compact(now=newest + 5.0) == 0
+    assert log.compact(now=newest + 60.0) == sealed
+    assert len(log.segments) == 1
+    assert log.last_seq == 10
+    await log.close()
+
+
+async def test_second_opener_is_read_only(tmp_path: Path) -> None:
+    log = open_log(tmp_path)
+    log.append(1, payload(1))
+    log.flush()
+
+    reader = SegmentLog(str(tmp_path))
+    reader.open()
+    assert not reader.writable
+    assert not reader.append(2, payload(2))
+    assert read_all(reader) == [payload(1)]
+    await reader.close()
+    await log.close()
+
+
+async def test_close_waits_for_the_group_commit(tmp_path: Path) -> None:
+    log = SegmentLog(str(tmp_path), fsync_interval=0.0)
+    log.open()
+    log.start()
+    log.append(1, payload(1))
+    await log.close()
+
+    assert log._inflight is None
+    assert not log.writable
+
+
+def test_room_index() -> None:
+    index = RoomIndex()
+    for seq, room in enumerate(["a", "b", "a", "a", "b", "a"], start=1):
+        index.add(room, seq)
+
+    assert index.before("a", None, 2, first_seq=1) == [4, 6]
+    assert index.before("a", 4, 10, first_seq=1) == [1, 3]
+    assert index.before("b", None, 10, first_seq=1) == [2, 5]
+    assert index.before("c", None, 10, first_seq=1) == []
+    assert index.last("a") == 6
+    # Records compacted out of the log are forgotten
+    assert index.first("a", first_seq=2) == 3
+    assert index.before("a", None, 10, first_seq=4) == [4, 6]
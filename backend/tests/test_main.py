@@ -0,0 +1,88 @@
+"""Tests for the HTTP history endpoint and its ETag revalidation."""
+
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from portfolio_backend.main import app, etag_matches
+
+
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    # The app's chat manager drains at shutdown and is not restarted, so the
+    # tests share one lifespan
+    with TestClient(app) as client:
+        yield client
+
+
+def send(client: TestClient, room: str, content: str) -> None:
+    with client.websocket_connect(f"/ws/chat?username=amy&room={room}") as ws:
+        ws.send_json({"type": "message", "content": content})
+        while True:
+            frame = ws.receive_json()
+            if frame["type"] == "message":
+                return
+
+
+def test_etag_matches() -> None:
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('W/"a-1"', '"a-1"')
+    assert etag_matches('"x", "a-1"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
+
+
+def test_history_is_revalidated_with_the_etag(client: TestClient) -> None:
+    room = "etag"
+    first = client.get("/api/history", params={"room": room})
+    assert first.status_code == 200
+    assert first.json()["messages"] == []
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/api/history", params={"room": room}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    send(client, room, "hello")
+    fresh = client.get("/api/history", params={"room": room}, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert [message["content"] for message in fresh.json()["messages"]] == ["hello"]
+
+
+def test_history_pages(client: TestClient) -> None:
+    room = "pages"
+    for n in range(5):
+        send(client, room, f"m{n}")
+
+    page = client.get("/api/history", params={"room": room, "limit": 3}).json()
+    assert [message["content"] for message in page["messages"]] == ["m2", "m3", "m4"]
+    older = client.get(
+        "/api/history", params={"room": room, "limit": 3, "before": page["next_cursor"]}
+    ).json()
+    assert [message["content"] for message in older["messages"]] == ["m0", "m1"]
+    assert older["next_cursor"] is None
+
+
+def test_history_rejects_unknown_cursor(client: TestClient) -> None:
+    response = client.get("/api/history", params={"room": "pages", "before": "nope"})
+
+    assert response.status_code == 400
+
+
+def test_queue_stats_are_totals_only(client: TestClient) -> None:
+    with client.websocket_connect("/ws/chat?username=amy&room=queues") as ws:
+        ws.receive_json()
+        stats = client.get("/api/stats/queues").json()
+
+    assert set(stats) == {"queues", "queued_frames", "max_depth", "dropped", "overflows"}
+    assert stats["queues"] >= 1
+    assert "amy" not in str(stats)
+
+
+def test_queue_clients_need_diagnostics(client: TestClient) -> None:
+    assert client.get("/debug/queues").status_code == 404
@@ -0,0 +1,71 @@
+"""Tests for the Prometheus text output."""
+
+import pytest
+
+from portfolio_backend.metrics import ChatMetrics, Histogram, MetricsRegistry
+
+
+def test_render_families_and_labels() -> None:
+    registry = MetricsRegistry()
+    errors = registry.counter("sends_total", "Sends", labels={"reason": "error"})
+    registry.counter("sends_total", "Sends", labels={"reason": "timeout"}, read=lambda: 7)
+    registry.gauge("connections", "Open connections", read=lambda: 2.5)
+    errors.inc(3)
+
+    assert registry.render() == (
+        "# HELP sends_total Sends\n"
+        "# TYPE sends_total counter\n"
+        'sends_total{reason="error"} 3\n'
+        'sends_total{reason="timeout"} 7\n'
+        "# HELP connections Open connections\n"
+        "# TYPE connections gauge\n"
+        "connections 2.5\n"
+    )
+
+
+def test_family_kinds_must_match() -> None:
+    registry = MetricsRegistry()
+    registry.counter("events", "Events")
+    with pytest.raises(ValueError):
+        registry.gauge("events", "Events")
+
+
+def test_histogram_buckets_and_max() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[2:7] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 4.05",
+        "latency_seconds_count 4",
+    ]
+    assert lines[-1] == "latency_seconds_max 3"
+    # The max covers the interval since the previous scrape
+    assert registry.render().splitlines()[-1] == "latency_seconds_max 0"
+
+
+def test_histogram_quantile() -> None:
+    histogram = Histogram("latency_seconds", "Latency", buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) == 0.0
+
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 4.0
+
+    histogram.observe(100.0)
+    assert histogram.quantile(1.0) == 4.0
+
+
+def test_chat_metrics_render() -> None:
+    metrics = ChatMetrics()
+    metrics.messages_received.inc()
+
+    text = metrics.registry.render()
+    assert "chat_messages_received_total 1\n" in text
+    assert text.count("# TYPE chat_send_failures_total counter") == 1
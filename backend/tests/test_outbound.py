@@ -0,0 +1,110 @@
+"""Tests for the per-connection outbound queues."""
+
+import asyncio
+
+import pytest
+
+from portfolio_backend.outbound import (
+    POLICY_COALESCE,
+    POLICY_DISCONNECT,
+    PUT_CLOSED,
+    PUT_DROPPED,
+    PUT_OVERFLOW,
+    PUT_QUEUED,
+    OutboundQueue,
+)
+
+
+async def drain(queue: OutboundQueue) -> list:
+    queue.close(drain=True)
+    frames = []
+    while (frame := await queue.get()) is not None:
+        frames.append(frame)
+    return frames
+
+
+def test_unknown_policy() -> None:
+    with pytest.raises(ValueError):
+        OutboundQueue(policy="block")
+
+
+async def test_drop_oldest_trims_to_low_water() -> None:
+    queue = OutboundQueue(high_water=4, low_water=2)
+
+    assert [queue.put(str(n)) for n in range(3)] == [PUT_QUEUED] * 3
+    assert queue.put("3") == PUT_DROPPED
+    assert queue.dropped == 2
+    assert queue.overflows == 1
+    assert await drain(queue) == ["2", "3"]
+
+
+async def test_coalesce_keeps_newest_frame_per_key() -> None:
+    queue = OutboundQueue(high_water=5, low_water=3, policy=POLICY_COALESCE)
+    queue.put("count 1", key="count")
+    queue.put("hello")
+    queue.put("count 2", key="count")
+    queue.put("bye")
+
+    assert queue.put("count 3", key="count") == PUT_DROPPED
+    assert await drain(queue) == ["hello", "bye", "count 3"]
+
+
+async def test_coalesce_then_drops_oldest() -> None:
+    queue = OutboundQueue(high_water=3, low_water=1, policy=POLICY_COALESCE)
+    for frame in ("a", "b", "c"):
+        queue.put(frame)
+
+    assert await drain(queue) == ["c"]
+    assert queue.dropped == 2
+
+
+def test_disconnect_policy() -> None:
+    queue = OutboundQueue(high_water=2, low_water=1, policy=POLICY_DISCONNECT)
+
+    assert queue.put("a") == PUT_QUEUED
+    assert queue.put("b") == PUT_OVERFLOW
+    assert queue.dropped == 0
+
+
+async def test_closed_queue() -> None:
+    queue = OutboundQueue()
+    queue.put("a")
+    queue.close()
+
+    assert queue.put("b") == PUT_CLOSED
+    assert await queue.get() is None
+    assert await queue.get_batch(10, 1024, 0.0) == []
+
+
+async def test_get_waits_for_a_frame() -> None:
+    queue = OutboundQueue()
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    queue.put("a")
+
+    assert await asyncio.wait_for(getter, 1.0) == "a"
+
+
+async def test_get_batch_respects_limits_and_coalesces() -> None:
+    queue = OutboundQueue()
+    queue.put("count 1", key="count")
+    queue.put("aaaa")
+    queue.put("count 2", key="count")
+    queue.put("bbbb")
+
+    assert await queue.get_batch(3, 1024, 0.0) == ["aaaa", "count 2"]
+    assert await queue.get_batch(10, 2, 0.0) == ["bbbb"]
+
+
+async def test_get_batch_lingers_for_more_frames() -> None:
+    queue = OutboundQueue()
+    queue.put("a")
+
+    async def produce() -> None:
+        await asyncio.sleep(0.01)
+        queue.put("b")
+        queue.put("c")
+
+    producer = asyncio.create_task(produce())
+    assert await queue.get_batch(3, 1024, 1.0) == ["a", "b", "c"]
+    await producer
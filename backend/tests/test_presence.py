@@ -0,0 +1,82 @@
+"""Tests for debounced presence updates."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Dict
+
+from portfolio_backend.chat import ChatManager
+from portfolio_backend.presence import PresenceChange, PresenceDebouncer
+
+from .fakes import FakeWebSocket
+
+CONFIG = SimpleNamespace(heartbeat_interval=0, queue_high_water=0)
+
+
+async def test_changes_are_aggregated_per_tick() -> None:
+    flushes: list[Dict[str, PresenceChange]] = []
+
+    async def flush(changes: Dict[str, PresenceChange]) -> None:
+        flushes.append(changes)
+
+    debouncer = PresenceDebouncer(flush, interval=0.05)
+    debouncer.start()
+    for _ in range(5):
+        await debouncer.record("a", joined=1)
+    await debouncer.record("a", left=2)
+    await debouncer.record("b")
+    assert debouncer.pending == 2
+
+    await asyncio.sleep(0.08)
+    await debouncer.stop()
+
+    assert flushes == [{"a": PresenceChange(5, 2), "b": PresenceChange(0, 0)}]
+
+
+async def test_zero_interval_flushes_immediately() -> None:
+    flushes: list[Dict[str, PresenceChange]] = []
+
+    async def flush(changes: Dict[str, PresenceChange]) -> None:
+        flushes.append(changes)
+
+    debouncer = PresenceDebouncer(flush, interval=0)
+    await debouncer.record("a", joined=1)
+    await debouncer.record("a", left=1)
+
+    assert flushes == [{"a": PresenceChange(1, 0)}, {"a": PresenceChange(0, 1)}]
+    assert debouncer.pending == 0
+
+
+def user_counts(websocket: FakeWebSocket) -> list[dict]:
+    return [p["data"] for p in websocket.payloads() if p["type"] == "user_count"]
+
+
+async def test_join_wave_sends_one_summary() -> None:
+    manager = ChatManager(CONFIG, presence_interval=0.05)
+    await manager.start()
+    first = FakeWebSocket()
+    await manager.connect("c0", first, "user0")
+    await asyncio.sleep(0.08)
+
+    for n in range(1, 10):
+        await manager.connect(f"c{n}", FakeWebSocket(), f"user{n}")
+    await asyncio.sleep(0.08)
+    await manager.graceful_shutdown(timeout=1.0)
+
+    # The immediate count on connect, then one summary per tick
+    assert user_counts(first) == [
+        {"count": 1},
+        {"count": 1, "joined": 1, "left": 0},
+        {"count": 10, "joined": 9, "left": 0},
+    ]
+
+
+async def test_large_rooms_get_no_join_notices() -> None:
+    manager = ChatManager(CONFIG, presence_interval=0, presence_notice_limit=2)
+    await manager.start()
+    first = FakeWebSocket()
+    for n, websocket in enumerate([first, FakeWebSocket(), FakeWebSocket()]):
+        await manager.connect(f"c{n}", websocket, f"user{n}")
+    await manager.graceful_shutdown(timeout=1.0)
+
+    notices = [p["data"]["content"] for p in first.payloads() if p["type"] == "system"]
+    assert notices == ["user1 joined the chat"]
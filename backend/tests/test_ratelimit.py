@@ -0,0 +1,124 @@
+"""Tests for the token bucket and the message rate limiter."""
+
+import time
+
+from portfolio_backend.ratelimit import (
+    RATE_ALLOW,
+    RATE_DISCONNECT,
+    RATE_LIMITED,
+    RATE_OVERLOADED,
+    MessageRateLimiter,
+    TokenBucket,
+)
+
+
+def test_bucket_refills_lazily() -> None:
+    bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+
+    assert bucket.consume(now=0.0)
+    assert bucket.consume(now=0.0)
+    assert not bucket.consume(now=0.0)
+    assert bucket.wait_time(now=0.0) == 0.5
+    assert bucket.consume(now=0.5)
+    # Refills stop at the burst size
+    assert bucket.consume(2, now=100.0)
+    assert not bucket.consume(now=100.0)
+
+
+def test_bucket_available_takes_nothing() -> None:
+    bucket = TokenBucket(rate=1.0, burst=1, now=0.0)
+
+    assert bucket.available(now=0.0)
+    assert bucket.available(now=0.0)
+    assert bucket.consume(now=0.0)
+    assert not bucket.available(now=0.0)
+
+
+def test_bucket_without_rate_never_refills() -> None:
+    bucket = TokenBucket(rate=0.0, burst=1, now=0.0)
+
+    assert bucket.consume(now=0.0)
+    assert not bucket.consume(now=1000.0)
+    assert bucket.wait_time(now=1000.0) == 0.0
+
+
+def test_client_limit() -> None:
+    limiter = MessageRateLimiter(client_rate=1.0, client_burst=2, username_rate=0.0)
+    limiter.register("c1", "amy")
+    now = time.monotonic()
+
+    assert limiter.check("c1", now).outcome == RATE_ALLOW
+    assert limiter.check("c1", now).outcome == RATE_ALLOW
+    decision = limiter.check("c1", now)
+    assert decision.outcome == RATE_LIMITED
+    assert 0 < decision.retry_after <= 1.0
+    assert limiter.check("c1", now + 1.0).allowed
+    # Unknown clients are not limited
+    assert limiter.check("c2", now).allowed
+
+
+def test_username_bucket_is_shared() -> None:
+    limiter = MessageRateLimiter(client_rate=0.0, username_rate=1.0, username_burst=2)
+    limiter.register("c1", "amy")
+    limiter.register("c2", "amy")
+    limiter.register("c3", "bob")
+    now = time.monotonic()
+
+    assert limiter.check("c1", now).allowed
+    assert limiter.check("c2", now).allowed
+    assert limiter.check("c1", now).outcome == RATE_LIMITED
+    assert limiter.check("c3", now).allowed
+
+    # The bucket lives as long as any of the username's clients
+    limiter.release("c1")
+    assert limiter.check("c2", now).outcome == RATE_LIMITED
+    limiter.release("c2")
+    limiter.register("c4", "amy")
+    assert limiter.check("c4", now).allowed
+
+
+def test_rejected_message_takes_no_tokens() -> None:
+    limiter = MessageRateLimiter(
+        client_rate=1.0, client_burst=5, username_rate=1.0, username_burst=1
+    )
+    limiter.register("c1", "amy")
+    limiter.register("c2", "amy")
+    now = time.monotonic()
+
+    assert limiter.check("c1", now).allowed
+    for _ in range(3):
+        assert limiter.check("c1", now).outcome == RATE_LIMITED
+    # c1's own bucket was only charged for the allowed message
+    assert limiter._clients["c1"].bucket is not None
+    assert limiter._clients["c1"].bucket.tokens == 4
+
+
+def test_global_limit_is_not_a_strike() -> None:
+    limiter = MessageRateLimiter(
+        client_rate=0.0, username_rate=0.0, global_rate=1.0, global_burst=1, max_strikes=1
+    )
+    limiter.register("c1", "amy")
+    now = time.monotonic()
+
+    assert limiter.check("c1", now).allowed
+    assert limiter.check("c1", now).outcome == RATE_OVERLOADED
+    assert limiter.check("c1", now).outcome == RATE_OVERLOADED
+    assert limiter.overloaded == 2
+    assert limiter.disconnected == 0
+
+
+def test_strikes_disconnect_and_are_forgiven() -> None:
+    limiter = MessageRateLimiter(
+        client_rate=0.001, client_burst=1, username_rate=0.0, max_strikes=3, strike_window=5.0
+    )
+    limiter.register("c1", "amy")
+    now = time.monotonic()
+
+    assert limiter.check("c1", now).allowed
+    assert limiter.check("c1", now + 1).outcome == RATE_LIMITED
+    assert limiter.check("c1", now + 2).outcome == RATE_LIMITED
+    # A quiet spell longer than the window resets the count
+    assert limiter.check("c1", now + 10).outcome == RATE_LIMITED
+    assert limiter.check("c1", now + 11).outcome == RATE_LIMITED
+    assert limiter.check("c1", now + 12).outcome == RATE_DISCONNECT
+    assert limiter.disconnected == 1
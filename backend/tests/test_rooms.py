@@ -0,0 +1,62 @@
+"""Tests for chat rooms and idle room expiry."""
+
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from portfolio_backend.backplane import EVENT_PRESENCE
+from portfolio_backend.chat import ChatManager
+
+from .fakes import FakeWebSocket
+
+# Frames are sent directly rather than through outbound queues
+CONFIG = SimpleNamespace(heartbeat_interval=0, queue_high_water=0)
+
+
+async def start_manager(**options: Any) -> ChatManager:
+    manager = ChatManager(CONFIG, presence_interval=0, **options)
+    await manager.start()
+    return manager
+
+
+async def test_messages_stay_in_their_room() -> None:
+    manager = await start_manager()
+    amy, bob = FakeWebSocket(), FakeWebSocket()
+    await manager.connect("c1", amy, "amy", room="a")
+    await manager.connect("c2", bob, "bob", room="b")
+
+    await manager.send_message("c1", "amy", "hello a", room="a")
+
+    assert "hello a" in str(amy.payloads())
+    assert "hello a" not in str(bob.payloads())
+    assert [message.content for message in manager.get_room("a").history] == ["hello a"]
+    assert len(manager.get_room("b").history) == 0
+    assert manager.get_user_count("a") == 1
+
+
+async def test_idle_empty_rooms_expire() -> None:
+    manager = await start_manager(room_ttl=10.0)
+    await manager.send_message("c1", "amy", "hello", room="quiet")
+    await manager.connect("c2", FakeWebSocket(), "bob", room="busy")
+    now = time.monotonic()
+
+    assert manager._sweep_rooms(now + 5) == 0
+    assert manager._sweep_rooms(now + 11) == 1
+    assert set(manager.rooms) == {"busy"}
+
+
+async def test_rooms_with_members_on_other_workers_are_kept() -> None:
+    manager = await start_manager(room_ttl=10.0)
+    await manager.send_message("c1", "amy", "hello", room="quiet")
+    await manager._on_backplane_event(
+        {"kind": EVENT_PRESENCE, "node": "other", "counts": {"quiet": 1}}
+    )
+    now = time.monotonic()
+
+    assert manager._sweep_rooms(now + 11) == 0
+    assert [message.content for message in manager.get_room("quiet").history] == ["hello"]
+
+    await manager._on_backplane_event(
+        {"kind": EVENT_PRESENCE, "node": "other", "counts": {"quiet": 0}}
+    )
+    assert manager._sweep_rooms(now + 11) == 1
@@ -0,0 +1,77 @@
+"""Tests for message, username and room validation."""
+
+import pytest
+
+from portfolio_backend.security import (
+    REASON_DANGEROUS,
+    REASON_EMPTY,
+    REASON_TOO_LONG,
+    MessageValidator,
+)
+
+
+def test_valid_message_is_stripped_and_escaped() -> None:
+    verdict = MessageValidator.validate_message("  fish & chips > 3 <b>  ")
+
+    assert verdict.ok
+    assert verdict.value == "fish &amp; chips &gt; 3 &lt;b&gt;"
+
+
+@pytest.mark.parametrize(
+    ("message", "rule"),
+    [
+        ("<script>alert(1)</script>", r"<script"),
+        ("<SCRIPT src=x>", r"<script"),
+        ("see javascript:alert(1)", r"javascript:"),
+        ('<a onclick = "x">', r"on\w+\s*="),
+        ("<iframe src=x>", r"<iframe"),
+        ('<img alt="" src="x">', r"<img[^>]*src"),
+    ],
+)
+def test_danger_check_sees_the_raw_text(message: str, rule: str) -> None:
+    # Tag patterns never matched once the text had been HTML-escaped
+    verdict = MessageValidator.validate_message(message)
+
+    assert not verdict.ok
+    assert verdict.reason == REASON_DANGEROUS
+    assert verdict.rule == rule
+    assert verdict.value is None
+
+
+@pytest.mark.parametrize(
+    ("message", "reason"),
+    [("", REASON_EMPTY), ("   ", REASON_EMPTY), ("x" * 11, REASON_TOO_LONG)],
+)
+def test_rejections(message: str, reason: str) -> None:
+    verdict = MessageValidator.validate_message(message, max_length=10)
+
+    assert not verdict.ok
+    assert verdict.reason == reason
+
+
+def test_validate_many_keeps_order() -> None:
+    verdicts = MessageValidator.validate_many(["a", "<script>", ""])
+
+    assert [verdict.ok for verdict in verdicts] == [True, False, False]
+    assert verdicts[0].value == "a"
+
+
+def test_find_dangerous_agrees_with_is_dangerous() -> None:
+    for text in ("hello", "onload=1", "<embed>", "JavaScript:x"):
+        assert MessageValidator.is_dangerous(text) == (
+            MessageValidator.find_dangerous(text) is not None
+        )
+
+
+@pytest.mark.parametrize(
+    ("username", "expected"),
+    [("amy_1", "amy_1"), (" bob ", "bob"), ("a b", None), ("<x>", None), ("", None)],
+)
+def test_sanitize_username(username: str, expected: str) -> None:
+    assert MessageValidator.sanitize_username(username) == expected
+
+
+def test_sanitize_room() -> None:
+    assert MessageValidator.sanitize_room("room-1") == "room-1"
+    assert MessageValidator.sanitize_room("room/1") is None
+    assert MessageValidator.sanitize_room("r" * 51) is None
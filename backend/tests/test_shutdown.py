@@ -0,0 +1,83 @@
+"""Tests for the graceful shutdown drain."""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import websockets
+
+from portfolio_backend.chat import GOING_AWAY_CLOSE_CODE
+
+from .fakes import FakeWebSocket
+from .test_connections import make_manager
+
+
+async def test_queued_frames_are_flushed_before_the_reconnect_hint() -> None:
+    manager = make_manager(
+        queue_high_water=10, queue_low_water=5, reconnect_delay_min=1.0, reconnect_delay_max=2.0
+    )
+    websocket = FakeWebSocket()
+    await manager.connect("amy", websocket)
+    await manager.broadcast({"type": "message"})
+
+    report = await manager.graceful_shutdown(timeout=1.0)
+
+    assert report.closed == ["amy"]
+    assert websocket.types() == ["message", "reconnect"]
+    assert 1.0 <= websocket.payloads()[-1]["retry_after"] <= 2.0
+    assert websocket.closed is not None and websocket.closed[0] == GOING_AWAY_CLOSE_CODE
+    with pytest.raises(ConnectionRefusedError):
+        await manager.connect("bob", FakeWebSocket())
+
+
+async def test_stuck_connections_do_not_hold_the_shutdown() -> None:
+    manager = make_manager(send_timeout=5.0, reconnect_delay_min=0.1, reconnect_delay_max=0.1)
+    await manager.connect("stuck", FakeWebSocket(hang=True))
+    await manager.connect("ok", FakeWebSocket())
+
+    report = await manager.graceful_shutdown(timeout=0.2)
+
+    assert (report.closed, report.timed_out) == (["ok"], ["stuck"])
+
+
+async def test_workers_drain_on_sigterm(tmp_path: Path) -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(
+        os.environ,
+        HOST="127.0.0.1",
+        PORT=str(port),
+        SERVER_WORKERS="2",
+        BACKPLANE="unix",
+        BACKPLANE_SOCKET_PATH=str(tmp_path / "bp.sock"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "portfolio_backend.main"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                client = await websockets.connect(f"ws://127.0.0.1:{port}/ws/chat?username=amy")
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        else:
+            pytest.fail("server did not start")
+        assert json.loads(await client.recv())["type"] == "history"
+
+        server.send_signal(signal.SIGTERM)
+        types = [json.loads(frame)["type"] async for frame in client]
+
+        assert types[-1] == "reconnect"
+        assert client.close_code == GOING_AWAY_CLOSE_CODE
+        assert await asyncio.to_thread(server.wait, 20) == 0
+    finally:
+        server.kill()
@@ -7,29 +7,45 @@ export interface ChatMessage {
   username: string;
   content: string;
   timestamp: number;
+  seq?: number;
+  room?: string;
+  // Set on direct messages: the recipient's username
+  to?: string;
 }
 
 export interface WebSocketMessage {
-  type: 'message' | 'system' | 'history' | 'user_count' | 'error' | 'pong';
+  type: 'message' | 'dm' | 'system' | 'history' | 'user_count' | 'error' | 'ping' | 'pong' | 'batch' | 'reconnect';
   data?: any;
   message?: string;
+  delta?: boolean;
+  retry_after?: number;
 }
 
+// Close codes after which reconnecting would only be closed again
+const NO_RECONNECT_CODES = new Set([4403, 4409]);
+
 export class ChatWebSocket {
   private ws: WebSocket | null = null;
   private url: string;
   private username: string;
+  private room: string | null;
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 5;
   private reconnectDelay = 1000;
+  // Delay (ms) the server asked for before it closed the connection
+  private reconnectHint: number | null = null;
+  private lastSeq: number | null = null;
+  // Frames are handled in arrival order even when some need decompressing
+  private receiveChain: Promise<void> = Promise.resolve();
   private heartbeatInterval: NodeJS.Timeout | null = null;
   private messageHandlers: Set<(msg: WebSocketMessage) => void> = new Set();
   private errorHandlers: Set<(error: string) => void> = new Set();
   private statusHandlers: Set<(status: 'connected' | 'disconnected' | 'error') => void> = new Set();
 
-  constructor(url: string, username: string) {
+  constructor(url: string, username: string, room: string | null = null) {
     this.url = url;
     this.username = username;
+    this.room = room;
   }
 
   /**
@@ -40,8 +56,20 @@ export class ChatWebSocket {
       try {
         const wsUrl = new URL(this.url);
         wsUrl.searchParams.append('username', this.username);
+        if (this.room !== null) {
+          wsUrl.searchParams.append('room', this.room);
+        }
+        if (typeof DecompressionStream !== 'undefined') {
+          // Large frames (such as history) then arrive deflate-compressed
+          wsUrl.searchParams.append('compression', 'deflate');
+        }
+        if (this.lastSeq !== null) {
+          // Resume from the last seen message instead of a full replay
+          wsUrl.searchParams.append('since', String(this.lastSeq));
+        }
 
         this.ws = new WebSocket(wsUrl.toString());
+        this.ws.binaryType = 'arraybuffer';
 
         this.ws.onopen = () => {
           console.log('WebSocket connected');
@@ -52,7 +80,11 @@ export class ChatWebSocket {
         };
 
         this.ws.onmessage = (event) => {
-          this.handleMessage(event.data);
+          const data: string | ArrayBuffer = event.data;
+          this.receiveChain = this.receiveChain
+            .then(() => (typeof data === 'string' ? data : this.inflate(data)))
+            .then(text => this.handleMessage(text))
+            .catch(error => console.error('Failed to decompress message:', error));
         };
 
         this.ws.onerror = (event) => {
@@ -62,10 +94,15 @@ export class ChatWebSocket {
           reject(new Error('WebSocket connection failed'));
         };
 
-        this.ws.onclose = () => {
+        this.ws.onclose = (event) => {
           console.log('WebSocket disconnected');
           this.stopHeartbeat();
           this.notifyStatus('disconnected');
+          if (NO_RECONNECT_CODES.has(event.code)) {
+            // Kicked, or the username signed in elsewhere
+            this.notifyError(event.reason || 'Disconnected by server');
+            return;
+          }
           this.attemptReconnect();
         };
       } catch (error) {
@@ -106,6 +143,28 @@ export class ChatWebSocket {
     }
   }
 
+  /**
+   * Send a direct message to every connection of another user.
+   */
+  sendDirectMessage(to: string, content: string): boolean {
+    if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+      this.notifyError('Not connected');
+      return false;
+    }
+
+    try {
+      this.ws.send(JSON.stringify({
+        type: 'dm',
+        to: to,
+        content: content,
+      }));
+      return true;
+    } catch (error) {
+      this.notifyError('Failed to send message');
+      return false;
+    }
+  }
+
   /**
    * Subscribe to messages.
    */
@@ -142,12 +201,48 @@ export class ChatWebSocket {
   private handleMessage(data: string): void {
     try {
       const message: WebSocketMessage = JSON.parse(data);
-      this.messageHandlers.forEach(handler => handler(message));
+      if (message.type === 'batch') {
+        // Several events packed into one frame by the server, oldest first
+        (message.data ?? []).forEach((item: WebSocketMessage) => this.dispatch(item));
+        return;
+      }
+      this.dispatch(message);
     } catch (error) {
       console.error('Failed to parse message:', error);
     }
   }
 
+  private async inflate(data: ArrayBuffer): Promise<string> {
+    const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream('deflate'));
+    return new Response(stream).text();
+  }
+
+  private dispatch(message: WebSocketMessage): void {
+    if (message.type === 'ping') {
+      this.sendPong();
+      return;
+    }
+    if (message.type === 'reconnect') {
+      // Server is shutting down; it picks a random delay so clients spread out
+      this.reconnectHint = (message.retry_after ?? 0) * 1000;
+      return;
+    }
+    this.trackSeq(message);
+    this.messageHandlers.forEach(handler => handler(message));
+  }
+
+  private trackSeq(message: WebSocketMessage): void {
+    const messages: ChatMessage[] =
+      message.type === 'history' ? message.data ?? [] :
+      message.type === 'message' && message.data ? [message.data] : [];
+
+    for (const msg of messages) {
+      if (typeof msg.seq === 'number' && (this.lastSeq === null || msg.seq > this.lastSeq)) {
+        this.lastSeq = msg.seq;
+      }
+    }
+  }
+
   private notifyError(error: string): void {
     this.errorHandlers.forEach(handler => handler(error));
   }
@@ -162,16 +257,20 @@ export class ChatWebSocket {
     }
 
     this.heartbeatInterval = setInterval(() => {
-      if (this.isConnected()) {
-        try {
-          this.ws?.send(JSON.stringify({ type: 'pong' }));
-        } catch (error) {
-          console.error('Failed to send pong:', error);
-        }
-      }
+      this.sendPong();
     }, 30000); // Send pong every 30 seconds
   }
 
+  private sendPong(): void {
+    if (this.isConnected()) {
+      try {
+        this.ws?.send(JSON.stringify({ type: 'pong' }));
+      } catch (error) {
+        console.error('Failed to send pong:', error);
+      }
+    }
+  }
+
   private stopHeartbeat(): void {
     if (this.heartbeatInterval) {
       clearInterval(this.heartbeatInterval);
@@ -185,8 +284,12 @@ export class ChatWebSocket {
       return;
     }
 
-    this.reconnectAttempts++;
-    const delay = this.reconnectDelay * Math.pow(2, this.reconnectAttempts - 1);
+    const hint = this.reconnectHint;
+    this.reconnectHint = null;
+    if (hint === null) {
+      this.reconnectAttempts++;
+    }
+    const delay = hint ?? this.reconnectDelay * Math.pow(2, this.reconnectAttempts - 1);
 
     console.log(`Reconnecting in ${delay}ms (attempt ${this.reconnectAttempts})`);
 